@@ -0,0 +1,111 @@
+import zipfile
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from .ocr import SUPPORTED_EXTENSIONS
+
+
+# ---------------------------------------------------------------------------
+# BULK INGEST — ZIPs and folders of thousands of resumes.
+#
+# Campus drives arrive as ZIPs of 2,000-5,000 CVs. Going through
+# st.file_uploader one file at a time isn't practical, and the old
+# run_screening() held every file.getvalue() in memory for the whole run
+# (plus a second full copy in playground.py's file_map).
+#
+# A ResumeSource looks like an UploadedFile to the rest of the app (.name,
+# .getvalue()) but only reads its bytes when asked: a ZIP member is
+# decompressed on demand, a folder entry is read from disk on demand. The
+# screening pass reads, extracts (into the persistent extraction cache) and
+# drops each file's bytes before moving on, so peak memory stays flat no
+# matter how many resumes the batch has.
+# ---------------------------------------------------------------------------
+MAX_ENTRY_BYTES = 25 * 1024 * 1024  # skip absurd members (zip bombs, videos)
+
+
+class ResumeSource:
+    """A resume whose bytes are loaded lazily, on every getvalue() call."""
+
+    def __init__(self, name: str, loader, size: int = 0):
+        self.name = name
+        self.size = size
+        self._loader = loader
+
+    def getvalue(self) -> bytes:
+        return self._loader()
+
+    def __repr__(self) -> str:
+        return f"ResumeSource({self.name!r}, {self.size} bytes)"
+
+
+def _is_resume_name(name: str) -> bool:
+    base = Path(name).name
+    if not base or base.startswith((".", "~$")):
+        return False
+    return base.lower().endswith(SUPPORTED_EXTENSIONS)
+
+
+def _unique_name(name: str, seen: set[str]) -> str:
+    """Keep Source File unique when two uploads, ZIP members or folders
+    hold the same file name."""
+    if name not in seen:
+        seen.add(name)
+        return name
+    stem, suffix = Path(name).stem, Path(name).suffix
+    n = 2
+    while f"{stem} ({n}){suffix}" in seen:
+        n += 1
+    unique = f"{stem} ({n}){suffix}"
+    seen.add(unique)
+    return unique
+
+
+def iter_zip_sources(zip_file, seen: set[str] | None = None) -> Iterator[ResumeSource]:
+    """Yield lazy sources for every resume inside a ZIP (path or file-like)."""
+    seen = set() if seen is None else seen
+    archive = zipfile.ZipFile(zip_file)
+    for info in archive.infolist():
+        if info.is_dir() or "__MACOSX/" in info.filename:
+            continue
+        if not _is_resume_name(info.filename):
+            continue
+        if info.file_size > MAX_ENTRY_BYTES:
+            print(f"[bulk_ingest] skipped oversized member {info.filename} ({info.file_size} bytes)")
+            continue
+        name = _unique_name(Path(info.filename).name, seen)
+        yield ResumeSource(name, lambda info=info: archive.read(info), info.file_size)
+
+
+def iter_directory_sources(folder, seen: set[str] | None = None) -> Iterator[ResumeSource]:
+    """Yield lazy sources for every resume under a folder, recursively."""
+    seen = set() if seen is None else seen
+    for path in sorted(Path(folder).rglob("*")):
+        if not path.is_file() or not _is_resume_name(path.name):
+            continue
+        size = path.stat().st_size
+        if size > MAX_ENTRY_BYTES:
+            print(f"[bulk_ingest] skipped oversized file {path} ({size} bytes)")
+            continue
+        name = _unique_name(path.name, seen)
+        yield ResumeSource(name, lambda path=path: path.read_bytes(), size)
+
+
+def expand_uploads(uploads: Iterable) -> tuple[list, list[str]]:
+    """Flatten uploaded files: ZIPs become one lazy source per resume inside,
+    everything else is passed through. Every source gets a distinct name
+    (a repeated name becomes "cv (2).pdf"), since screening jobs and the
+    results table tell files apart by name. Returns (sources, errors)."""
+    seen: set[str] = set()
+    expanded, errors = [], []
+    for upload in uploads or []:
+        if str(getattr(upload, "name", "")).lower().endswith(".zip"):
+            try:
+                expanded.extend(iter_zip_sources(upload, seen))
+            except zipfile.BadZipFile:
+                errors.append(f"{upload.name}: not a valid ZIP archive")
+            continue
+        name = _unique_name(upload.name, seen)
+        if name != upload.name:
+            upload = ResumeSource(name, upload.getvalue, getattr(upload, "size", 0))
+        expanded.append(upload)
+    return expanded, errors
@@ -0,0 +1,132 @@
+import threading
+from datetime import datetime
+
+import pandas as pd
+
+from .constants import DATA_DIR
+from .local_db import connect
+
+
+# ---------------------------------------------------------------------------
+# EMAIL SEND LOG (SQLite)
+#
+# The send log used to be sent_emails_<sender>.xlsx. send_bulk_emails()
+# re-read the whole workbook for every recipient to check for duplicates,
+# and every sent email read and rewrote it again — a 500-email campaign
+# spent most of its time parsing and writing Excel.
+#
+# The log is now one table keyed UNIQUE (sender, recipient, role), with
+# recipient and role compared case-insensitively as before. A campaign
+# loads the recipients already emailed for its role as a set once, the
+# outbox checks each delivery with a point lookup on the UNIQUE index, and
+# each send is a single-row upsert. An existing workbook is imported the
+# first time its sender is seen and renamed to .xlsx.migrated.
+# ---------------------------------------------------------------------------
+EMAIL_LOG_DB_PATH = DATA_DIR / "email_log.sqlite3"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS email_log (
+    id        INTEGER PRIMARY KEY AUTOINCREMENT,
+    sender    TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    role_key  TEXT NOT NULL,
+    role      TEXT NOT NULL DEFAULT '',
+    subject   TEXT NOT NULL DEFAULT '',
+    sent_at   TEXT NOT NULL,
+    UNIQUE (sender, recipient, role_key)
+);
+"""
+
+_MIGRATE_LOCK = threading.Lock()
+_MIGRATED_SENDERS = set()
+
+
+def _db():
+    return connect(EMAIL_LOG_DB_PATH, _SCHEMA)
+
+
+def _norm(value) -> str:
+    return str(value or "").strip().lower()
+
+
+def _upsert_sql() -> str:
+    return (
+        "INSERT INTO email_log (sender, recipient, role_key, role, subject, sent_at) "
+        "VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (sender, recipient, role_key) DO UPDATE SET "
+        "subject = excluded.subject, sent_at = excluded.sent_at"
+    )
+
+
+def _migrate_excel_log(sender: str, path) -> None:
+    """One-time import of sent_emails_<sender>.xlsx."""
+    if sender in _MIGRATED_SENDERS:
+        return
+    with _MIGRATE_LOCK:
+        if sender in _MIGRATED_SENDERS:
+            return
+        if path.exists():
+            try:
+                df = pd.read_excel(path)
+                rows = []
+                if "Email" in df.columns and "Role" in df.columns:
+                    for rec in df.fillna("").to_dict("records"):
+                        if not _norm(rec.get("Email")):
+                            continue
+                        rows.append((
+                            sender,
+                            _norm(rec.get("Email")),
+                            _norm(rec.get("Role")),
+                            str(rec.get("Role", "")).strip(),
+                            str(rec.get("Subject", "")),
+                            str(rec.get("Sent At", "")) or datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                        ))
+                conn = _db()
+                with conn:
+                    conn.executemany(_upsert_sql(), rows)
+                path.rename(path.with_name(path.name + ".migrated"))
+                print(f"✅ Migrated {len(rows)} sent-email rows from {path}")
+            except Exception as e:
+                # Leave the workbook in place and retry on the next call.
+                print(f"❌ Email log migration from {path} failed: {e}")
+                return
+        _MIGRATED_SENDERS.add(sender)
+
+
+def emailed_recipients(sender: str, role: str, legacy_path=None) -> set[str]:
+    """Lower-cased recipients `sender` already emailed about `role`."""
+    sender = _norm(sender)
+    if legacy_path is not None:
+        _migrate_excel_log(sender, legacy_path)
+    return {
+        row[0]
+        for row in _db().execute(
+            "SELECT recipient FROM email_log WHERE sender = ? AND role_key = ?",
+            (sender, _norm(role)),
+        )
+    }
+
+
+def already_logged(sender: str, recipient: str, role: str) -> bool:
+    """Whether `sender` already emailed `recipient` about `role`."""
+    row = _db().execute(
+        "SELECT 1 FROM email_log WHERE sender = ? AND recipient = ? AND role_key = ?",
+        (_norm(sender), _norm(recipient), _norm(role)),
+    ).fetchone()
+    return row is not None
+
+
+def log_sent_email(sender: str, recipient: str, subject: str, role: str) -> None:
+    conn = _db()
+    with conn:
+        conn.execute(
+            _upsert_sql(),
+            (
+                _norm(sender),
+                _norm(recipient),
+                _norm(role),
+                str(role or "").strip(),
+                subject or "",
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            ),
+        )
@@ -1,15 +1,16 @@
 import html
-import random
 import re
 import smtplib
-import time
-from datetime import datetime
+from functools import lru_cache
 from email.message import EmailMessage
 from email.utils import formataddr
 
 import pandas as pd
 
 from .constants import DATA_DIR, DEFAULT_COMPANY
+from .email_log import emailed_recipients
+from .outbox import enqueue_messages, register_sender
+from .smtp_delivery import SmtpSessionPool
 
 
 def safe_filename_part(value: str) -> str:
@@ -46,23 +47,6 @@ def email_log_path(user_key: str):
     return DATA_DIR / f"sent_emails_{safe_filename_part(user_key)}.xlsx"
 
 
-def already_emailed(user_key: str, email: str, role: str) -> bool:
-    path = email_log_path(user_key)
-    if not path.exists() or not email:
-        return False
-    try:
-        df = pd.read_excel(path)
-        if "Email" not in df.columns or "Role" not in df.columns:
-            return False
-        same = df[
-            (df["Email"].astype(str).str.lower().str.strip() == email.lower().strip())
-            & (df["Role"].astype(str).str.lower().str.strip() == role.lower().strip())
-        ]
-        return not same.empty
-    except Exception:
-        return False
-
-
 def build_email_body(
     candidate: pd.Series,
     role: str,
@@ -120,122 +104,169 @@ def build_email_body(
 
     return "\n".join(lines)
 
-def render_template_variables(text: str, candidate: pd.Series, role: str) -> str:
-    variables = {
-        "{first_name}": first_name(str(candidate.get("Name", ""))),
-        "{full_name}": str(candidate.get("Name", "")),
-        "{role}": role,
-        "{email}": str(candidate.get("Email", "")),
-        "{phone}": str(candidate.get("Phone", "")),
-        "{experience}": str(candidate.get("Experience", "")),
-        "{score}": str(candidate.get("Final Score", "")),
-        "{verdict}": str(candidate.get("Verdict", "")),
+# ---------------------------------------------------------------------------
+# TEMPLATES
+#
+# Filling in a template used to run eight str.replace() passes over the
+# body (and again over the subject) for every candidate. A template is now
+# split once around its {variables} by compile_template() and cached;
+# render_compiled() fills a row in with a single join over the pieces.
+# ---------------------------------------------------------------------------
+TEMPLATE_VARIABLES = ("first_name", "full_name", "role", "email", "phone", "experience", "score", "verdict")
+_PLACEHOLDER_RE = re.compile(r"\{(" + "|".join(TEMPLATE_VARIABLES) + r")\}")
+
+
+@lru_cache(maxsize=64)
+def compile_template(text: str) -> tuple[str, ...]:
+    """Literal, variable name, literal, ..., literal."""
+    return tuple(_PLACEHOLDER_RE.split(text))
+
+
+def render_compiled(parts: tuple[str, ...], variables: dict) -> str:
+    out = list(parts)
+    out[1::2] = [variables[name] for name in parts[1::2]]
+    return "".join(out)
+
+
+def template_variables(candidate, role: str) -> dict:
+    name = str(candidate.get("Name", ""))
+    return {
+        "first_name": first_name(name),
+        "full_name": name,
+        "role": role,
+        "email": str(candidate.get("Email", "")),
+        "phone": str(candidate.get("Phone", "")),
+        "experience": str(candidate.get("Experience", "")),
+        "score": str(candidate.get("Final Score", "")),
+        "verdict": str(candidate.get("Verdict", "")),
     }
-    rendered = text
-    for key, value in variables.items():
-        rendered = rendered.replace(key, value)
-    return rendered
 
 
-def append_email_log(sender_email: str, recipient_email: str, subject: str, role: str) -> None:
-    entry = pd.DataFrame(
-        [
-            {
-                "Email": recipient_email,
-                "Subject": subject,
-                "Role": role,
-                "Sent At": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            }
-        ]
-    )
-    path = email_log_path(sender_email)
-    if path.exists():
-        old = pd.read_excel(path)
-        entry = pd.concat([old, entry], ignore_index=True)
-    entry.to_excel(path, index=False)
-
-
-def send_email(
-    server,
-    sender_email: str,
-    sender_name: str,
-    recipient_email: str,
-    subject: str,
-    body: str,
-    role: str,
-) -> tuple[bool, str]:
-    try:
-        msg = EmailMessage()
-        msg["From"] = formataddr((sender_name or sender_email, sender_email))
-        msg["To"] = recipient_email
-        msg["Subject"] = subject
-
-        safe_body = html.escape(body).replace("\n", "<br>")
-        html_body = f"""
+_HTML_HEAD = """
         <html>
         <body style="font-family:Arial,sans-serif;font-size:14px;line-height:1.6;">
-        {safe_body}
+        """
+_HTML_TAIL = """
         </body>
         </html>
         """
-        msg.set_content(body)
-        msg.add_alternative(html_body, subtype="html")
-
-        time.sleep(random.uniform(1.0, 2.4))
-        server.send_message(msg)
-        append_email_log(sender_email, recipient_email, subject, role)
-        return True, "Sent"
-    except Exception as exc:
-        return False, str(exc)
 
 
+def build_email_message(
+    sender_email: str,
+    sender_name: str,
+    recipient_email: str,
+    subject: str,
+    body: str,
+) -> EmailMessage:
+    msg = EmailMessage()
+    msg["From"] = formataddr((sender_name or sender_email, sender_email))
+    msg["To"] = recipient_email
+    msg["Subject"] = subject
+    msg.set_content(body)
+    msg.add_alternative(_HTML_HEAD + html.escape(body).replace("\n", "<br>") + _HTML_TAIL, subtype="html")
+    return msg
 
 
-def send_bulk_emails(
+def render_campaign_messages(
     selected_df: pd.DataFrame,
     role: str,
     sender_email: str,
-    sender_password: str,
     sender_name: str,
     company_name: str,
     subject: str,
     questions: list[str],
     extra_note: str,
     custom_body: str = "",
-) -> list[dict]:
-    results = []
-    sender_email = str(sender_email or "").strip().lower()
-    sender_password = normalize_app_password(sender_password)
-
+) -> tuple[list[dict], list[dict]]:
+    """Personalised messages for the selection, plus result rows for the
+    candidates that can't be emailed (duplicates, missing addresses)."""
+    # Loaded once per campaign; rendered recipients are added to it so the
+    # same address isn't sent twice from one selection.
     try:
-        server = smtplib.SMTP("smtp.gmail.com", 587, timeout=20)
-        server.ehlo()
-        server.starttls()
-        server.ehlo()
-        server.login(sender_email, sender_password)
-    except smtplib.SMTPAuthenticationError as exc:
-        return [{"Name": "", "Email": sender_email, "Success": False, "Message": gmail_auth_error_message(sender_email, exc)}]
+        emailed = emailed_recipients(sender_email, role, email_log_path(sender_email))
     except Exception as exc:
-        return [{"Name": "", "Email": "", "Success": False, "Message": str(exc)}]
+        print(f"[render_campaign_messages] send log unavailable: {exc}")
+        emailed = set()
+
+    subject_parts = compile_template(subject)
+    body_parts = compile_template(custom_body) if custom_body.strip() else None
 
-    for _, candidate in selected_df.iterrows():
+    messages, rejected = [], []
+    for candidate in selected_df.to_dict("records"):
         name = str(candidate.get("Name", "Candidate"))
         recipient = str(candidate.get("Email", "")).strip()
-        if already_emailed(sender_email, recipient, role):
-            results.append({"Name": name, "Email": recipient, "Success": False, "Message": "Skipped duplicate candidate"})
+        if recipient and recipient.lower() in emailed:
+            rejected.append({"Name": name, "Email": recipient, "Success": False, "Message": "Skipped duplicate candidate"})
             continue
         if "@" not in recipient:
-            results.append({"Name": name, "Email": recipient, "Success": False, "Message": "Missing email"})
+            rejected.append({"Name": name, "Email": recipient, "Success": False, "Message": "Missing email"})
             continue
 
-        if custom_body.strip():
-            body = render_template_variables(custom_body, candidate, role)
+        variables = template_variables(candidate, role)
+        if body_parts is not None:
+            body = render_compiled(body_parts, variables)
         else:
             body = build_email_body(candidate, role, sender_name, company_name, questions, extra_note)
 
-        personalized_subject = render_template_variables(subject, candidate, role)
-        ok, message = send_email(server, sender_email, sender_name, recipient, personalized_subject, body, role)
-        results.append({"Name": name, "Email": recipient, "Success": ok, "Message": message})
+        emailed.add(recipient.lower())
+        messages.append({
+            "name": name,
+            "recipient": recipient,
+            "subject": render_compiled(subject_parts, variables),
+            "body": body,
+        })
+    return messages, rejected
 
-    server.quit()
+
+def _login_check(sender_email: str, sender_password: str) -> list[dict]:
+    """Log in once so bad credentials are reported before anything is sent
+    or queued; returns an error result row, or [] when the login worked."""
+    pool = SmtpSessionPool(sender_email, sender_password, size=1)
+    try:
+        pool.open()
+    except smtplib.SMTPAuthenticationError as exc:
+        return [{"Name": "", "Email": sender_email, "Success": False, "Message": gmail_auth_error_message(sender_email, exc)}]
+    except Exception as exc:
+        return [{"Name": "", "Email": "", "Success": False, "Message": str(exc)}]
+    finally:
+        pool.close()
+    return []
+
+
+def queue_bulk_emails(
+    selected_df: pd.DataFrame,
+    role: str,
+    sender_email: str,
+    sender_password: str,
+    sender_name: str,
+    company_name: str,
+    subject: str,
+    questions: list[str],
+    extra_note: str,
+    custom_body: str = "",
+) -> list[dict]:
+    """Render the campaign into the outbox and return straight away; the
+    outbox worker delivers it (see core/outbox.py). Success means queued."""
+    sender_email = str(sender_email or "").strip().lower()
+    sender_password = normalize_app_password(sender_password)
+    login_error = _login_check(sender_email, sender_password)
+    if login_error:
+        return login_error
+
+    messages, results = render_campaign_messages(
+        selected_df, role, sender_email, sender_name, company_name, subject, questions, extra_note, custom_body
+    )
+    queued = enqueue_messages(sender_email, sender_name, role, messages)
+    register_sender(sender_email, sender_password)
+
+    accepted = {recipient.lower() for recipient in queued["queued"]}
+    for message in messages:
+        ok = message["recipient"].lower() in accepted
+        results.append({
+            "Name": message["name"],
+            "Email": message["recipient"],
+            "Success": ok,
+            "Message": "Queued" if ok else "Already queued",
+        })
     return results
@@ -0,0 +1,98 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+
+from .constants import CACHE_DIR
+from .local_db import connect, evict_lru
+
+
+# ---------------------------------------------------------------------------
+# CONTENT-ADDRESSED EXTRACTION CACHE
+#
+# read_uploaded_file() used to be memoized with st.cache_data(max_entries=250):
+# in-process only, per Streamlit worker, gone on every restart, and holding
+# up to 250 resumes' worth of bytes in RAM. Re-uploading a resume we'd
+# already parsed yesterday paid for pdfplumber (and OCR) all over again.
+#
+# Results now live in one SQLite file under data/cache, keyed by the
+# sha256 of the file bytes + file extension + extractor version. Every
+# worker and every restart shares it, only the extracted text and metadata
+# are stored (never the file bytes), and the file is trimmed back under
+# CACHE_MAX_BYTES by evicting the least recently used entries.
+#
+# Bump the extractor version in ocr.py whenever extraction output changes;
+# old entries then simply stop matching and age out.
+# ---------------------------------------------------------------------------
+CACHE_PATH = Path(CACHE_DIR) / "extraction_cache.sqlite3"
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS extraction_cache (
+    cache_key   TEXT PRIMARY KEY,
+    text        TEXT NOT NULL,
+    read_error  TEXT NOT NULL,
+    meta        TEXT NOT NULL,
+    size_bytes  INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_extraction_cache_access
+    ON extraction_cache (last_access);
+"""
+
+
+def _db():
+    return connect(CACHE_PATH, _SCHEMA)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data or b"").hexdigest()
+
+
+def cache_key(file_name: str, digest: str, version: str) -> str:
+    """Key for a file whose content_hash() is `digest`."""
+    extension = Path(file_name or "").suffix.lower()
+    return f"{digest}:{extension}:{version}"
+
+
+def get_cached(key: str) -> tuple[str, str, dict] | None:
+    try:
+        conn = _db()
+        row = conn.execute(
+            "SELECT text, read_error, meta FROM extraction_cache WHERE cache_key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute(
+                "UPDATE extraction_cache SET last_access = ? WHERE cache_key = ?",
+                (time.time(), key),
+            )
+        return row["text"], row["read_error"], json.loads(row["meta"])
+    except Exception as e:
+        print(f"[extraction_cache] read failed: {e}")
+        return None
+
+
+def put_cached(key: str, text: str, read_error: str, meta: dict) -> None:
+    try:
+        meta_json = json.dumps(meta or {}, default=str)
+        size = len(text.encode("utf-8", errors="ignore")) + len(read_error) + len(meta_json)
+        conn = _db()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO extraction_cache "
+                "(cache_key, text, read_error, meta, size_bytes, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, text, read_error, meta_json, size, time.time()),
+            )
+        _evict_if_needed(conn)
+    except Exception as e:
+        print(f"[extraction_cache] write failed: {e}")
+
+
+def _evict_if_needed(conn, max_bytes: int = CACHE_MAX_BYTES) -> None:
+    evicted = evict_lru(conn, "extraction_cache", max_bytes)
+    if evicted:
+        print(f"[extraction_cache] evicted {evicted} entries")
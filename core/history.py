@@ -4,10 +4,52 @@ import numpy as np
 import json
 import os
 import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
 from typing import Optional
 
 from .constants import DATA_DIR
+from .local_history import (
+    delete_local_history,
+    jd_hash,
+    local_jd_text,
+    local_row_keys,
+    load_local_history,
+    local_history_jd,
+    local_history_summary,
+    update_local_feedback,
+    update_local_feedback_bulk,
+    update_local_feedback_by_id,
+    upsert_history,
+)
+from .history_writer import (
+    WRITE_RETRIES,
+    build_history_records,
+    discard_spooled_history,
+    flush_history_spool,
+    insert_history_records,
+    jd_ref_supported,
+    pending_history_writes,
+    resume_spooled_history,
+    spool_history_records,
+    start_background_flush,
+)
+from .learning_state import (
+    forget_learning,
+    invalidate_learning,
+    record_feedback,
+    record_screenings,
+)
 from .parser import profile_key
+from .search_index import (
+    SEARCH_MAX_RESULTS,
+    drop_from_index,
+    index_history_rows,
+    needs_sync,
+    search_profile_keys,
+    sync_index,
+)
 from .utils import safe_filename_part
 
 try:
@@ -89,6 +131,36 @@ def history_path(user_key: str):
     return DATA_DIR / f"candidate_history_{safe_filename_part(user_key)}.xlsx"
 
 
+_MIGRATE_LOCK = threading.Lock()
+_MIGRATED_USERS = set()
+
+
+def _migrate_excel_history(user_key: str) -> None:
+    """One-time move of candidate_history_<user>.xlsx into the SQLite store.
+    The workbook is renamed to .xlsx.migrated afterwards, never deleted."""
+    if user_key in _MIGRATED_USERS:
+        return
+    with _MIGRATE_LOCK:
+        if user_key in _MIGRATED_USERS:
+            return
+        path = history_path(user_key)
+        if path.exists():
+            try:
+                df = pd.read_excel(path)
+                if not df.empty:
+                    df = _ensure_profile_key(_clean_phone_column(df))
+                    if "Profile Key" in df.columns and "Role" in df.columns:
+                        df = df.drop_duplicates(subset=["Profile Key", "Role"], keep="last")
+                    upsert_history(df, user_key)
+                path.rename(path.with_name(path.name + ".migrated"))
+                print(f"✅ Migrated {len(df)} history rows from {path}")
+            except Exception as e:
+                # Leave the workbook in place and retry on the next call.
+                print(f"❌ History migration from {path} failed: {e}")
+                return
+        _MIGRATED_USERS.add(user_key)
+
+
 def jd_library_path(user_key: str):
     DATA_DIR.mkdir(exist_ok=True)
     return DATA_DIR / f"jd_library_{safe_filename_part(user_key)}.xlsx"
@@ -109,61 +181,460 @@ def _ensure_profile_key(df: pd.DataFrame) -> pd.DataFrame:
 
 # ─── Candidate History functions ────────────────────────────────────────────
 
-def load_history(user_key: str) -> pd.DataFrame:
+# ---------------------------------------------------------------------------
+# HISTORY READS — projected, filtered, paginated.
+#
+# load_history() used to select("*") every row the user ever screened: the
+# 4,000-char JD on each one, every reason and keyword list, no limit. The
+# History tab then showed tail(150) of it and the metric cards counted the
+# rest in pandas — tens of megabytes for a recruiter with 20k rows.
+#
+#   - Only HISTORY_LIST_COLUMNS are fetched; JD and Reason never come
+#     along. The History tab gets the JD for a role from get_history_jd(),
+#     one row, when it needs it.
+#   - Role / date filters and the row limit run server-side.
+#   - Pages are fetched by keyset (id < last id) rather than offset, so deep
+#     pages cost the same as the first one.
+#   - history_summary() feeds the metric cards and the role filter from one
+#     RPC call, or from count-only (head) queries if the RPC isn't deployed:
+#
+#       create or replace function history_summary(p_user_key text)
+#       returns json language sql stable as $$
+#         select json_build_object(
+#           'total', count(*),
+#           'strong_fit', count(*) filter (where verdict = 'Strong Fit'),
+#           'roles', coalesce(
+#               json_agg(distinct role) filter (where role <> ''), '[]'::json)
+#         )
+#         from screening_history where user_key = p_user_key;
+#       $$;
+#
+#       create index if not exists screening_history_user_id
+#           on screening_history (user_key, id desc);
+#       create index if not exists screening_history_user_role_id
+#           on screening_history (user_key, role, id desc);
+#
+# Rows come back oldest first on both backends, so tail() is the newest.
+# ---------------------------------------------------------------------------
+HISTORY_LIST_COLUMNS = (
+    "id", "created_at", "profile_key", "role", "name", "email", "phone",
+    "experience", "education", "final_score", "verdict", "feedback", "client",
+    "industry_match", "candidate_industry", "matched_keywords",
+    "missing_keywords", "skills", "source_file",
+)
+HISTORY_PAGE_SIZE = 1000  # PostgREST's default max-rows
+
+SUPABASE_RENAME_MAP = {
+    "id": "Row ID",
+    "final_score": "Final Score",
+    "industry_match": "Industry Match",
+    "candidate_industry": "Candidate Industry",
+    "matched_keywords": "Matched Keywords",
+    "missing_keywords": "Missing Keywords",
+    "source_file": "Source File",
+    "profile_key": "Profile Key",
+    "name": "Name",
+    "email": "Email",
+    "phone": "Phone",
+    "experience": "Experience",
+    "education": "Education",
+    "verdict": "Verdict",
+    "feedback": "Feedback",
+    "role": "Role",
+    "jd": "JD",
+    "jd_ref": "JD Ref",
+    "client": "Client",
+    "skills": "Skills",
+    "reason": "Reason",
+    "created_at": "Screened At",
+}
+
+
+# ---------------------------------------------------------------------------
+# JD TEXTS — stored once, referenced by hash.
+#
+# save_history used to copy the JD (up to 4,000 chars) onto every candidate
+# row, so a 300-resume run stored it 300 times and every detailed history
+# read carried all the copies. The JD now goes into jd_texts once, keyed by
+# its SHA-256, and history rows only hold that key in jd_ref:
+#
+#   create table if not exists jd_texts (
+#       jd_hash    text primary key,
+#       jd         text not null,
+#       created_at timestamptz not null default now()
+#   );
+#   alter table screening_history
+#       add column if not exists jd_ref text not null default '';
+#
+#   -- one-off: move the existing copies out of screening_history
+#   insert into jd_texts (jd_hash, jd)
+#       select distinct encode(sha256(convert_to(jd, 'UTF8')), 'hex'), jd
+#       from screening_history where jd <> ''
+#   on conflict (jd_hash) do nothing;
+#   update screening_history
+#      set jd_ref = encode(sha256(convert_to(jd, 'UTF8')), 'hex'), jd = ''
+#    where jd <> '';
+#
+# The local store migrates itself (local_history._dedupe_jds). Until
+# jd_texts and the jd_ref column exist in Supabase, save_history keeps
+# writing the JD inline (history_writer falls back on the first write
+# that finds jd_ref missing); reads resolve either form. get_history_jd() fetches a role's JD text on
+# demand, by reference.
+# ---------------------------------------------------------------------------
+_JD_TEXT_CACHE: dict[str, str] = {}  # content-addressed, never stale
+_JD_TEXT_CACHE_MAX = 512
+_JD_TEXT_LOCK = threading.Lock()
+
+
+def _store_supabase_jd(jd_text: str) -> str:
+    """Put the JD in jd_texts; returns its ref, or "" if that isn't possible."""
+    if not jd_text:
+        return ""
+    ref = jd_hash(jd_text)
+    with _JD_TEXT_LOCK:
+        if ref in _JD_TEXT_CACHE:
+            return ref  # already stored (or read back) by this process
+    try:
+        supabase.table("jd_texts").upsert(
+            {"jd_hash": ref, "jd": jd_text},
+            on_conflict="jd_hash",
+            ignore_duplicates=True,
+        ).execute()
+    except Exception as e:
+        print(f"⚠️ jd_texts unavailable, storing JD inline: {e}")
+        return ""
+    _remember_jd_text(ref, jd_text)
+    return ref
+
+
+def _remember_jd_text(ref: str, text: str) -> None:
+    with _JD_TEXT_LOCK:
+        if len(_JD_TEXT_CACHE) >= _JD_TEXT_CACHE_MAX:
+            _JD_TEXT_CACHE.clear()
+        _JD_TEXT_CACHE[ref] = text
+
+
+def jd_text_for_ref(ref: str) -> str:
+    """The JD text a history row's "JD Ref" points to."""
+    if not ref:
+        return ""
+    with _JD_TEXT_LOCK:
+        if ref in _JD_TEXT_CACHE:
+            return _JD_TEXT_CACHE[ref]
+
+    text = ""
     if supabase:
         try:
-            response = (
-                supabase.table("screening_history")
-                .select("*")
-                .eq("user_key", user_key)
-                .order("created_at", desc=True)
-                .execute()
+            data = (
+                supabase.table("jd_texts").select("jd").eq("jd_hash", ref).limit(1).execute().data
             )
-            if response.data:
-                df = pd.DataFrame(response.data)
-                rename_map = {
-                    "id": "Row ID",
-                    "final_score": "Final Score",
-                    "industry_match": "Industry Match",
-                    "candidate_industry": "Candidate Industry",
-                    "matched_keywords": "Matched Keywords",
-                    "missing_keywords": "Missing Keywords",
-                    "source_file": "Source File",
-                    "profile_key": "Profile Key",
-                    "name": "Name",
-                    "email": "Email",
-                    "phone": "Phone",
-                    "experience": "Experience",
-                    "education": "Education",
-                    "verdict": "Verdict",
-                    "feedback": "Feedback",
-                    "role": "Role",
-                    "jd": "JD",
-                    "client": "Client",
-                    "skills": "Skills",
-                    "reason": "Reason",
-                    "created_at": "Screened At",
-                }
-                df = df.rename(columns=rename_map)
+            text = str(data[0].get("jd") or "") if data else ""
+        except Exception as e:
+            print(f"Supabase jd_texts read error: {e}")
+    if not text:
+        text = local_jd_text(ref)
+    if text:
+        _remember_jd_text(ref, text)
+    return text
+
+
+def _fetch_supabase_history(
+    user_key: str,
+    columns,
+    role: Optional[str] = None,
+    since: Optional[str] = None,
+    limit: Optional[int] = None,
+    profile_keys: Optional[tuple] = None,
+) -> list[dict]:
+    """Newest-first keyset pagination over screening_history."""
+    select = ",".join(dict.fromkeys(("id", *columns)))
+    rows: list[dict] = []
+    last_id = None
+    while True:
+        page_size = HISTORY_PAGE_SIZE if limit is None else min(HISTORY_PAGE_SIZE, limit - len(rows))
+        if page_size <= 0:
+            break
+        query = supabase.table("screening_history").select(select).eq("user_key", user_key)
+        if role:
+            query = query.eq("role", role)
+        if since:
+            query = query.gte("created_at", since)
+        if profile_keys:
+            query = query.in_("profile_key", list(profile_keys))
+        if last_id is not None:
+            query = query.lt("id", last_id)
+        page = query.order("id", desc=True).limit(page_size).execute().data or []
+        rows.extend(page)
+        if len(page) < page_size:
+            break
+        last_id = page[-1]["id"]
+    return rows
+
+
+def _load_history_uncached(
+    user_key: str,
+    role: Optional[str] = None,
+    since: Optional[str] = None,
+    limit: Optional[int] = None,
+    profile_keys: Optional[tuple] = None,
+) -> pd.DataFrame:
+    if supabase:
+        try:
+            rows = _fetch_supabase_history(
+                user_key, HISTORY_LIST_COLUMNS, role, since, limit, profile_keys
+            )
+            if rows:
+                rows.reverse()
+                df = pd.DataFrame(rows).rename(columns=SUPABASE_RENAME_MAP)
                 return _clean_phone_column(df)
             return pd.DataFrame()
         except Exception as e:
             print(f"Supabase load_history error: {e}")
 
-    path = history_path(user_key)
-    if path.exists():
-        return _clean_phone_column(pd.read_excel(path))
-    return pd.DataFrame()
+    _migrate_excel_history(user_key)
+    return _clean_phone_column(
+        load_local_history(
+            user_key,
+            role=role,
+            since=since,
+            limit=limit,
+            profile_keys=profile_keys,
+        )
+    )
 
 
-def save_history(df: pd.DataFrame, role: str, user_key: str, jd_text: str = "") -> bool:
-    """
-    Save screening results to Supabase (screening_history) and to local Excel.
-    Returns True if at least one of them succeeds.
+def _history_summary_uncached(user_key: str) -> dict:
+    if supabase:
+        try:
+            data = supabase.rpc("history_summary", {"p_user_key": user_key}).execute().data
+            if isinstance(data, list):
+                data = data[0] if data else {}
+            if isinstance(data, dict) and "total" in data:
+                return {
+                    "total": int(data.get("total") or 0),
+                    "strong_fit": int(data.get("strong_fit") or 0),
+                    "roles": sorted(r for r in (data.get("roles") or []) if r),
+                }
+        except Exception as e:
+            print(f"Supabase history_summary RPC unavailable, using counts: {e}")
+
+        try:
+            def _count(**filters) -> int:
+                query = (
+                    supabase.table("screening_history")
+                    .select("id", count="exact", head=True)
+                    .eq("user_key", user_key)
+                )
+                for column, value in filters.items():
+                    query = query.eq(column, value)
+                return int(query.execute().count or 0)
+
+            roles = {
+                str(row.get("role") or "")
+                for row in _fetch_supabase_history(user_key, ("role",))
+            }
+            return {
+                "total": _count(),
+                "strong_fit": _count(verdict="Strong Fit"),
+                "roles": sorted(r for r in roles if r),
+            }
+        except Exception as e:
+            print(f"Supabase history_summary error: {e}")
+
+    _migrate_excel_history(user_key)
+    return local_history_summary(user_key)
+
+
+def _history_jd_uncached(user_key: str, role: str) -> str:
+    if supabase:
+        try:
+            data = (
+                supabase.table("screening_history")
+                .select("jd_ref,jd")
+                .eq("user_key", user_key)
+                .eq("role", role)
+                .or_("jd_ref.neq.,jd.neq.")
+                .order("id", desc=True)
+                .limit(1)
+                .execute()
+                .data
+            )
+            if not data:
+                return ""
+            return str(data[0].get("jd") or "") or jd_text_for_ref(str(data[0].get("jd_ref") or ""))
+        except Exception as e:
+            print(f"Supabase get_history_jd by ref failed, reading inline JD: {e}")
+        try:
+            data = (
+                supabase.table("screening_history")
+                .select("jd")
+                .eq("user_key", user_key)
+                .eq("role", role)
+                .neq("jd", "")
+                .order("id", desc=True)
+                .limit(1)
+                .execute()
+                .data
+            )
+            return str(data[0].get("jd") or "") if data else ""
+        except Exception as e:
+            print(f"Supabase get_history_jd error: {e}")
+
+    _migrate_excel_history(user_key)
+    return local_history_jd(user_key, role)
+
+
+# ---------------------------------------------------------------------------
+# PER-USER HISTORY CACHE
+#
+# The same history was fetched again and again: get_learning_adjustments()
+# on every screening, the History tab on every Streamlit rerun (any widget
+# click), search_candidates() on every lookup. Reads are now memoized per
+# process — shared by every session on this worker — under a per-user
+# version stamp:
+#
+#   - save_history / clear_history / clear_role_history bump the version,
+#     which orphans every cached read for that user;
+#   - update_feedback / update_feedback_by_id patch the Feedback column of
+#     the cached frames in place instead, so triage doesn't force a reload;
+#   - entries also expire after HISTORY_CACHE_TTL seconds, which bounds how
+#     stale a read can be after a write from another worker process.
+#
+# Frames are handed out as copies; callers are free to mutate them.
+# ---------------------------------------------------------------------------
+HISTORY_CACHE_TTL = 120  # seconds
+HISTORY_CACHE_MAX_ENTRIES = 256
+
+_CACHE_LOCK = threading.Lock()
+_HISTORY_VERSIONS: dict[str, int] = {}
+_HISTORY_CACHE: "OrderedDict[tuple, tuple[float, object]]" = OrderedDict()
+
+
+def history_version(user_key: str) -> int:
+    with _CACHE_LOCK:
+        return _HISTORY_VERSIONS.get(user_key, 0)
+
+
+def _invalidate_history(user_key: str) -> None:
+    with _CACHE_LOCK:
+        _HISTORY_VERSIONS[user_key] = _HISTORY_VERSIONS.get(user_key, 0) + 1
+        for key in [k for k in _HISTORY_CACHE if k[0] == user_key]:
+            del _HISTORY_CACHE[key]
+
+
+if supabase:
+    resume_spooled_history(supabase, _invalidate_history)
+
+
+def _copy(value):
+    return value.copy() if isinstance(value, (pd.DataFrame, dict)) else value
+
+
+def _cached_read(user_key: str, kind: str, args: tuple, loader):
+    with _CACHE_LOCK:
+        key = (user_key, _HISTORY_VERSIONS.get(user_key, 0), kind, args)
+        hit = _HISTORY_CACHE.get(key)
+        if hit is not None and time.monotonic() - hit[0] < HISTORY_CACHE_TTL:
+            _HISTORY_CACHE.move_to_end(key)
+            return _copy(hit[1])
+
+    value = loader()
+    with _CACHE_LOCK:
+        # Drop the result if a write landed while we were loading.
+        if key[1] == _HISTORY_VERSIONS.get(user_key, 0):
+            _HISTORY_CACHE[key] = (time.monotonic(), value)
+            while len(_HISTORY_CACHE) > HISTORY_CACHE_MAX_ENTRIES:
+                _HISTORY_CACHE.popitem(last=False)
+    return _copy(value)
+
+
+def _patch_cached_feedback(
+    feedback: str,
+    user_key: Optional[str] = None,
+    profile_key_value: Optional[str] = None,
+    role: Optional[str] = None,
+    row_ids=None,
+) -> None:
+    with _CACHE_LOCK:
+        for key, (_stored_at, frame) in _HISTORY_CACHE.items():
+            if key[2] != "rows" or frame.empty or "Feedback" not in frame.columns:
+                continue
+            if user_key is not None and key[0] != user_key:
+                continue
+            if row_ids is not None:
+                if "Row ID" not in frame.columns:
+                    continue
+                mask = pd.to_numeric(frame["Row ID"], errors="coerce").isin(row_ids)
+            else:
+                if "Profile Key" not in frame.columns or "Role" not in frame.columns:
+                    continue
+                mask = (
+                    (frame["Profile Key"].astype(str).str.strip() == profile_key_value)
+                    & (frame["Role"].astype(str).str.strip() == role)
+                )
+            if mask.any():
+                frame.loc[mask, "Feedback"] = feedback
+
+
+def load_history(
+    user_key: str,
+    role: Optional[str] = None,
+    since: Optional[str] = None,
+    limit: Optional[int] = None,
+    profile_keys=None,
+) -> pd.DataFrame:
+    """A user's screening history, oldest first. `role` / `since` (ISO date)
+    / `profile_keys` filter and `limit` keeps only the newest rows — all
+    applied by the store. JD and Reason aren't loaded; see get_history_jd()."""
+    if profile_keys is not None:
+        profile_keys = tuple(sorted({str(k) for k in profile_keys if k}))
+        if not profile_keys:
+            return pd.DataFrame()
+    return _cached_read(
+        user_key,
+        "rows",
+        (role, since, limit, profile_keys),
+        lambda: _load_history_uncached(user_key, role, since, limit, profile_keys),
+    )
+
 
-    NOTE: uses plain insert() (not upsert) so it does not depend on a
-    unique constraint on (user_key, profile_key, role). Re-screening the
-    same candidate/role will create a new row rather than update the old one.
+def history_summary(user_key: str) -> dict:
+    """{"total", "strong_fit", "roles": [sorted role names]} without loading
+    the history itself."""
+    return _cached_read(
+        user_key, "summary", (), lambda: _history_summary_uncached(user_key)
+    )
+
+
+def get_history_jd(user_key: str, role: str) -> str:
+    """The most recent non-empty JD saved with a screening for `role`."""
+    if not role:
+        return ""
+    return _cached_read(
+        user_key, "jd", (role,), lambda: _history_jd_uncached(user_key, role)
+    )
+
+
+def save_history(
+    df: pd.DataFrame,
+    role: str,
+    user_key: str,
+    jd_text: str = "",
+    background: bool = False,
+) -> bool:
+    """
+    Save screening results to Supabase (screening_history) and to the local
+    SQLite store. Returns True if at least one of them succeeds.
+
+    Supabase rows go through the history writer (history_writer.py): spooled
+    locally, then sent in idempotent, retried chunks. With background=True
+    this returns once the rows are spooled and the background thread sends
+    them; otherwise it waits for this batch's chunks.
+
+    NOTE: Supabase rows are inserted, not upserted on (user_key,
+    profile_key, role). Re-screening the same candidate/role will create a
+    new row rather than update the old one. The local store does have that
+    constraint and upserts.
     """
     if df is None or df.empty:
         print("[save_history] skipped: empty df")
@@ -178,72 +649,82 @@ def save_history(df: pd.DataFrame, role: str, user_key: str, jd_text: str = "")
     supabase_ok = False
 
     if supabase:
-        records = []
-        for _, row in to_save.iterrows():
-            records.append({
-                "user_key": user_key,
-                "role": str(role),
-                "profile_key": str(row.get("Profile Key", "")),
-                "name": str(row.get("Name", "")),
-                "email": str(row.get("Email", "")),
-                "phone": str(row.get("Phone", "")),
-                "experience": float(row.get("Experience", 0) or 0),
-                "education": str(row.get("Education", "")),
-                "final_score": float(row.get("Final Score", 0) or 0),
-                "verdict": str(row.get("Verdict", "")),
-                "industry_match": str(row.get("Industry Match", "")),
-                "candidate_industry": str(row.get("Candidate Industry", "")),
-                "matched_keywords": str(row.get("Matched Keywords", "")),
-                "missing_keywords": str(row.get("Missing Keywords", "")),
-                "skills": str(row.get("Skills", "")),
-                "reason": str(row.get("Reason", "")),
-                "feedback": str(row.get("Feedback", "Pending") or "Pending"),
-                "client": str(row.get("Client", "") or row.get("client_company", "")),
-                "source_file": str(row.get("Source File", "")),
-                "jd": (jd_text or "")[:4000],
-            })
-
+        jd_ref = _store_supabase_jd(jd_text or "") if jd_ref_supported() else ""
+        records = build_history_records(to_save, role, user_key, jd_text, jd_ref)
         try:
-            supabase.table("screening_history").insert(records).execute()
-            print(f"✅ save_history Supabase ok — {len(records)} rows")
-            supabase_ok = True
+            batch_id = spool_history_records(records, user_key)
         except Exception as e:
-            print(f"❌ save_history Supabase failed: {e}")
+            print(f"⚠️ save_history spool unavailable, sending directly: {e}")
+            batch_id = None
+
+        if batch_id is None:
+            try:
+                insert_history_records(supabase, records)
+                print(f"✅ save_history Supabase ok — {len(records)} rows")
+                supabase_ok = True
+            except Exception as e:
+                print(f"❌ save_history Supabase failed: {e}")
+        elif background:
+            start_background_flush(supabase, _invalidate_history)
+            print(f"✅ save_history Supabase queued — {len(records)} rows")
+            supabase_ok = True
+        else:
+            _sent, failed = flush_history_spool(supabase, batch_id, retries=WRITE_RETRIES)
+            if failed:
+                print("⚠️ save_history Supabase incomplete — the rest stays spooled and is retried")
+                start_background_flush(supabase, _invalidate_history)
+            else:
+                print(f"✅ save_history Supabase ok — {len(records)} rows")
+            supabase_ok = not failed
 
-    # Local Excel save (always try, independent of Supabase result)
+    # Local save (always try, independent of Supabase result)
     local_ok = False
     try:
-        DATA_DIR.mkdir(exist_ok=True)
-        path = history_path(user_key)
-        existing = pd.DataFrame()
-        if path.exists():
-            existing = pd.read_excel(path)
-
-        combined = pd.concat([existing, to_save], ignore_index=True)
-        if "Profile Key" in combined.columns and "Role" in combined.columns:
-            combined = combined.drop_duplicates(subset=["Profile Key", "Role"], keep="last")
-
-        combined.to_excel(path, index=False)
-        print(f"✅ save_history local ok → {path}")
+        _migrate_excel_history(user_key)
+        saved = upsert_history(to_save, user_key)
+        print(f"✅ save_history local ok — {saved} rows")
         local_ok = True
     except Exception as e:
         print(f"❌ save_history local failed: {e}")
 
+    if supabase_ok or local_ok:
+        try:
+            index_history_rows(to_save, user_key)
+        except Exception as e:
+            print(f"⚠️ save_history search index update failed: {e}")
+        try:
+            record_screenings(to_save, user_key)
+        except Exception as e:
+            print(f"⚠️ save_history learning state update failed: {e}")
+
+    _invalidate_history(user_key)
     return supabase_ok or local_ok
 
 
 def clear_history(user_key: str) -> None:
     if supabase:
+        try:
+            discard_spooled_history(user_key)
+        except Exception as e:
+            print(f"⚠️ clear_history spool error: {e}")
         try:
             supabase.table("screening_history").delete().eq("user_key", user_key).execute()
             print(f"✅ All history deleted from Supabase for {user_key}")
         except Exception as e:
             print(f"❌ Supabase clear_history error: {e}")
 
-    path = history_path(user_key)
-    if path.exists():
-        path.unlink()
-        print(f"✅ Local history file deleted: {path}")
+    _migrate_excel_history(user_key)
+    try:
+        deleted = delete_local_history(user_key)
+        print(f"✅ Local history deleted: {deleted} rows")
+    except Exception as e:
+        print(f"❌ Local clear_history error: {e}")
+    try:
+        drop_from_index(user_key)
+        forget_learning(user_key)
+    except Exception as e:
+        print(f"⚠️ clear_history search index / learning state error: {e}")
+    _invalidate_history(user_key)
 
 
 def clear_role_history(user_key: str, role: str) -> None:
@@ -251,6 +732,10 @@ def clear_role_history(user_key: str, role: str) -> None:
         return
 
     if supabase:
+        try:
+            discard_spooled_history(user_key, role)
+        except Exception as e:
+            print(f"⚠️ clear_role_history spool error: {e}")
         try:
             supabase.table("screening_history")\
                 .delete()\
@@ -261,17 +746,18 @@ def clear_role_history(user_key: str, role: str) -> None:
         except Exception as e:
             print(f"❌ Supabase clear_role_history error: {e}")
 
-    path = history_path(user_key)
-    if path.exists():
-        try:
-            df = pd.read_excel(path)
-            if "Role" in df.columns:
-                df = df[df["Role"].astype(str) != str(role)]
-                df = _clean_phone_column(df)
-                df.to_excel(path, index=False)
-                print(f"✅ Deleted local history for role: {role}")
-        except Exception as e:
-            print(f"❌ Local clear_role_history error: {e}")
+    _migrate_excel_history(user_key)
+    try:
+        delete_local_history(user_key, role)
+        print(f"✅ Deleted local history for role: {role}")
+    except Exception as e:
+        print(f"❌ Local clear_role_history error: {e}")
+    try:
+        drop_from_index(user_key, role)
+        forget_learning(user_key, role)
+    except Exception as e:
+        print(f"⚠️ clear_role_history search index / learning state error: {e}")
+    _invalidate_history(user_key)
 
 
 def mark_batch_duplicates(rows: list[dict]) -> list[dict]:
@@ -284,25 +770,44 @@ def mark_batch_duplicates(rows: list[dict]) -> list[dict]:
     return rows
 
 
-def search_candidates(user_key: str, query: str) -> pd.DataFrame:
-    hist = load_history(user_key)
-    if hist.empty or not query.strip():
-        return hist.iloc[0:0] if not hist.empty else pd.DataFrame()
-
-    q = query.strip().lower()
-    search_cols = [c for c in ["Name", "Email", "Phone", "Profile Key"] if c in hist.columns]
+def search_candidates(user_key: str, query: str, limit: int = SEARCH_MAX_RESULTS) -> pd.DataFrame:
+    """Every history row of the candidates matching `query` (name, email,
+    phone, profile key, role, skills, keywords), best match first and each
+    candidate's rows newest first. Served by the search index; only the
+    matching candidates' rows are loaded."""
+    if not (query or "").strip():
+        return pd.DataFrame()
 
-    if not search_cols:
-        return hist.iloc[0:0]
-
-    mask = pd.Series(False, index=hist.index)
-    for col in search_cols:
-        mask |= hist[col].astype(str).str.lower().str.contains(q, na=False)
-
-    matches = hist[mask].copy()
+    try:
+        if needs_sync(user_key):
+            sync_index(load_history(user_key), user_key)
+        keys = search_profile_keys(user_key, query, limit)
+    except Exception as e:
+        print(f"⚠️ search index unavailable, scanning history: {e}")
+        matches = filter_history_by_search(load_history(user_key), query)
+        if "Screened At" in matches.columns:
+            matches = matches.sort_values("Screened At", ascending=False)
+        return matches
+
+    if not keys:
+        return pd.DataFrame()
+    matches = load_history(user_key, profile_keys=keys)
+    if matches.empty or "Profile Key" not in matches.columns:
+        return matches
+
+    rank = {key: i for i, key in enumerate(keys)}
+    matches = matches.assign(
+        _rank=matches["Profile Key"].astype(str).str.strip().map(rank)
+    )
+    sort_cols, ascending = ["_rank"], [True]
     if "Screened At" in matches.columns:
-        matches = matches.sort_values("Screened At", ascending=False)
-    return matches
+        sort_cols.append("Screened At")
+        ascending.append(False)
+    return (
+        matches.sort_values(sort_cols, ascending=ascending, kind="stable")
+        .drop(columns="_rank")
+        .reset_index(drop=True)
+    )
 
 
 def filter_history_by_search(hist: pd.DataFrame, query: str) -> pd.DataFrame:
@@ -472,6 +977,23 @@ def get_jd(user_key: str, role: str) -> str:
     return str(match.iloc[-1].get("JD Text", ""))
 
 
+def _learn_feedback(user_key: str, changes: list[dict]) -> None:
+    """Feed applied feedback changes to the learning state; changes that
+    can't be tied to a (profile key, role) force a rebuild instead."""
+    try:
+        known = [
+            (c["profile_key"], c["role"], c["feedback"])
+            for c in changes
+            if c.get("profile_key") and c.get("role")
+        ]
+        if len(known) < len(changes):
+            invalidate_learning(user_key)
+        elif known:
+            record_feedback(user_key, known)
+    except Exception as e:
+        print(f"⚠️ learning state feedback update failed: {e}")
+
+
 def update_feedback(user_key: str, profile_key_value: str, role: str, feedback: str) -> bool:
     if not profile_key_value or not role:
         print(f"⚠️ update_feedback: missing profile_key ('{profile_key_value}') or role ('{role}')")
@@ -492,6 +1014,11 @@ def update_feedback(user_key: str, profile_key_value: str, role: str, feedback:
             )
             if result.data:
                 print(f"✅ Feedback updated in Supabase: {feedback}")
+                _patch_cached_feedback(feedback, user_key, profile_key_value, role)
+                _learn_feedback(
+                    user_key,
+                    [{"profile_key": profile_key_value, "role": role, "feedback": feedback}],
+                )
                 return True
             else:
                 # Update ran but matched ZERO rows — this is the real bug.
@@ -507,38 +1034,27 @@ def update_feedback(user_key: str, profile_key_value: str, role: str, feedback:
             print(f"❌ Supabase update_feedback error: {e}")
             return False
 
-    # Local Excel fallback — only reached if supabase client is None
-    path = history_path(user_key)
-    if path.exists():
-        try:
-            df = pd.read_excel(path)
-            if "Profile Key" not in df.columns or "Role" not in df.columns:
-                return False
-
-            mask = (
-                (df["Profile Key"].astype(str).str.strip() == profile_key_value)
-                & (df["Role"].astype(str).str.strip() == role)
-            )
-            if not mask.any():
-                print(f"⚠️ Local update_feedback: no row matched profile_key='{profile_key_value}' role='{role}'")
-                return False
-
-            if "Feedback" not in df.columns:
-                df["Feedback"] = "Pending"
-
-            df.loc[mask, "Feedback"] = feedback
-            df = _clean_phone_column(df)
-            df.to_excel(path, index=False)
-            return True
-        except Exception as e:
-            print(f"❌ Local update_feedback error: {e}")
+    # Local fallback — only reached if supabase client is None
+    try:
+        _migrate_excel_history(user_key)
+        if not update_local_feedback(user_key, profile_key_value, role, feedback):
+            print(f"⚠️ Local update_feedback: no row matched profile_key='{profile_key_value}' role='{role}'")
             return False
+        _patch_cached_feedback(feedback, user_key, profile_key_value, role)
+        _learn_feedback(
+            user_key,
+            [{"profile_key": profile_key_value, "role": role, "feedback": feedback}],
+        )
+        return True
+    except Exception as e:
+        print(f"❌ Local update_feedback error: {e}")
+        return False
 
-    return False
-
-def update_feedback_by_id(row_id, feedback: str) -> bool:
+def update_feedback_by_id(user_key: str, row_id, feedback: str) -> bool:
     """
-    Update feedback using the Supabase primary key directly.
+    Update feedback using the row's primary key directly (Supabase id, or
+    the local store's id when Supabase isn't configured). Only rows owned
+    by `user_key` are touched.
     Bypasses profile_key/role matching entirely — immune to
     whitespace, casing, or hidden-column drift in st.data_editor.
     """
@@ -552,10 +1068,23 @@ def update_feedback_by_id(row_id, feedback: str) -> bool:
                 supabase.table("screening_history")
                 .update({"feedback": feedback})
                 .eq("id", int(row_id))
+                .eq("user_key", user_key)
                 .execute()
             )
             if result.data:
                 print(f"✅ Feedback updated by id={row_id}: {feedback}")
+                _patch_cached_feedback(feedback, user_key, row_ids={int(row_id)})
+                _learn_feedback(
+                    user_key,
+                    [
+                        {
+                            "profile_key": str(row.get("profile_key", "") or "").strip(),
+                            "role": str(row.get("role", "") or "").strip(),
+                            "feedback": feedback,
+                        }
+                        for row in result.data
+                    ],
+                )
                 return True
             print(f"⚠️ Supabase update matched 0 rows for id={row_id}")
             return False
@@ -563,7 +1092,137 @@ def update_feedback_by_id(row_id, feedback: str) -> bool:
             print(f"❌ Supabase update_feedback_by_id error: {e}")
             return False
 
-    return False
+    try:
+        if not update_local_feedback_by_id(user_key, int(row_id), feedback):
+            return False
+        _patch_cached_feedback(feedback, user_key, row_ids={int(row_id)})
+        keys = local_row_keys(int(row_id))
+        if keys:
+            _owner, profile_key_value, role = keys
+            _learn_feedback(
+                user_key, [{"profile_key": profile_key_value, "role": role, "feedback": feedback}]
+            )
+        return True
+    except Exception as e:
+        print(f"❌ Local update_feedback_by_id error: {e}")
+        return False
+
+def _normalize_row_id(row_id):
+    if row_id is None or (isinstance(row_id, float) and pd.isna(row_id)):
+        return None
+    try:
+        return int(row_id)
+    except (TypeError, ValueError):
+        return None
+
+
+def update_feedback_bulk(user_key: str, changes: list[dict]) -> list[dict]:
+    """
+    Apply a batch of feedback edits (the History tab's "Save feedback") in
+    as few writes as possible: on Supabase one UPDATE ... WHERE id IN (...)
+    per distinct feedback value (and per role for rows without an id), on
+    the local store a single transaction.
+
+    Each change is {"feedback", "row_id"} or {"feedback", "profile_key",
+    "role"}; any other keys (e.g. "name") are passed through. Returns the
+    changes in order, each with "ok" and "error" added.
+    """
+    results = []
+    for change in changes or []:
+        result = dict(change)
+        result["row_id"] = _normalize_row_id(change.get("row_id"))
+        result["profile_key"] = str(change.get("profile_key", "") or "").strip()
+        result["role"] = str(change.get("role", "") or "").strip()
+        result["ok"] = False
+        result["error"] = ""
+        if result["row_id"] is None and not (result["profile_key"] and result["role"]):
+            result["error"] = "missing row id, or profile key and role"
+        results.append(result)
+
+    pending = [r for r in results if not r["error"]]
+    if not pending:
+        return results
+
+    if supabase:
+        by_id = defaultdict(list)
+        by_key = defaultdict(list)
+        for r in pending:
+            if r["row_id"] is not None:
+                by_id[r["feedback"]].append(r)
+            else:
+                by_key[(r["feedback"], r["role"])].append(r)
+
+        for feedback, group in by_id.items():
+            try:
+                data = (
+                    supabase.table("screening_history")
+                    .update({"feedback": feedback})
+                    .eq("user_key", user_key)
+                    .in_("id", [r["row_id"] for r in group])
+                    .execute()
+                    .data
+                ) or []
+                updated = {int(row["id"]): row for row in data if row.get("id") is not None}
+                for r in group:
+                    r["ok"] = r["row_id"] in updated
+                    if r["ok"] and not (r["profile_key"] and r["role"]):
+                        row = updated[r["row_id"]]
+                        r["profile_key"] = str(row.get("profile_key", "") or "").strip()
+                        r["role"] = str(row.get("role", "") or "").strip()
+            except Exception as e:
+                print(f"❌ Supabase update_feedback_bulk error: {e}")
+                for r in group:
+                    r["error"] = str(e)
+
+        for (feedback, role), group in by_key.items():
+            try:
+                data = (
+                    supabase.table("screening_history")
+                    .update({"feedback": feedback})
+                    .eq("user_key", user_key)
+                    .eq("role", role)
+                    .in_("profile_key", [r["profile_key"] for r in group])
+                    .execute()
+                    .data
+                ) or []
+                updated = {str(row.get("profile_key", "")) for row in data}
+                for r in group:
+                    r["ok"] = r["profile_key"] in updated
+            except Exception as e:
+                print(f"❌ Supabase update_feedback_bulk error: {e}")
+                for r in group:
+                    r["error"] = str(e)
+    else:
+        try:
+            _migrate_excel_history(user_key)
+            for r, ok in zip(pending, update_local_feedback_bulk(user_key, pending)):
+                r["ok"] = ok
+        except Exception as e:
+            print(f"❌ Local update_feedback_bulk error: {e}")
+            for r in pending:
+                r["error"] = str(e)
+
+    for r in pending:
+        if not r["ok"] and not r["error"]:
+            r["error"] = "no matching row"
+
+    # Patch cached reads once for the whole batch.
+    ids_by_feedback = defaultdict(set)
+    for r in pending:
+        if not r["ok"]:
+            continue
+        if r["row_id"] is not None:
+            ids_by_feedback[r["feedback"]].add(r["row_id"])
+        else:
+            _patch_cached_feedback(r["feedback"], user_key, r["profile_key"], r["role"])
+    for feedback, ids in ids_by_feedback.items():
+        _patch_cached_feedback(feedback, user_key, row_ids=ids)
+    _learn_feedback(user_key, [r for r in pending if r["ok"]])
+
+    saved = sum(1 for r in pending if r["ok"])
+    print(f"✅ update_feedback_bulk: {saved}/{len(results)} rows updated")
+    return results
+
 
 def confirm_delete_all_history(user_key: str):
     clear_history(user_key)
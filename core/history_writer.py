@@ -0,0 +1,360 @@
+import json
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+from .constants import DATA_DIR
+from .local_db import connect
+
+
+# ---------------------------------------------------------------------------
+# HISTORY WRITER — chunked, idempotent, retried, optionally in background.
+#
+# save_history() used to send a whole batch as one insert(records) call,
+# built row by row with iterrows(). Big batches ran into PostgREST payload
+# limits and failed all-or-nothing, a network blip lost the batch, and the
+# recruiter watched a spinner while it happened. supabase_db.py carried a
+# second copy of the same loop.
+#
+# Every Supabase history write now goes through here:
+#
+#   - records are built column-wise from the frame (build_history_records);
+#   - they are written to a local SQLite spool first, in chunks of
+#     WRITE_CHUNK_ROWS, so nothing is lost if the process dies mid-save;
+#   - each row carries an ingest_key (batch id + position) and chunks are
+#     sent as upserts ignoring duplicates on it, so a chunk retried after a
+#     timeout that actually succeeded doesn't create duplicate rows:
+#
+#       alter table screening_history
+#           add column if not exists ingest_key text;
+#       create unique index if not exists screening_history_ingest_key
+#           on screening_history (ingest_key);
+#
+#     (until that's deployed chunks fall back to plain inserts);
+#   - a chunk that fails is retried with exponential backoff; whatever is
+#     still spooled is drained by a background thread, also after restarts.
+#
+# With background=True the caller returns as soon as the batch is spooled.
+# ---------------------------------------------------------------------------
+HISTORY_SPOOL_PATH = DATA_DIR / "history_spool.sqlite3"
+WRITE_CHUNK_ROWS = 250
+WRITE_RETRIES = 3  # attempts per chunk while the caller waits
+RETRY_BACKOFF = 1.0  # seconds, doubled on each attempt
+SPOOL_MAX_BACKOFF = 600  # seconds between background attempts, at most
+SPOOL_LEASE = 120  # seconds a claimed chunk is hidden from other flushers
+
+TEXT_FIELDS = {
+    "profile_key": "Profile Key",
+    "name": "Name",
+    "email": "Email",
+    "phone": "Phone",
+    "education": "Education",
+    "verdict": "Verdict",
+    "industry_match": "Industry Match",
+    "candidate_industry": "Candidate Industry",
+    "matched_keywords": "Matched Keywords",
+    "missing_keywords": "Missing Keywords",
+    "skills": "Skills",
+    "reason": "Reason",
+    "source_file": "Source File",
+}
+NUMERIC_FIELDS = {"experience": "Experience", "final_score": "Final Score"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history_spool (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    batch_id        TEXT NOT NULL,
+    user_key        TEXT NOT NULL,
+    payload         TEXT NOT NULL,
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    lease_until     REAL NOT NULL DEFAULT 0,
+    last_error      TEXT NOT NULL DEFAULT '',
+    created_at      REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_spool_due
+    ON history_spool (next_attempt_at, id);
+"""
+
+
+def _db():
+    return connect(HISTORY_SPOOL_PATH, _SCHEMA)
+
+
+def _text_column(df: pd.DataFrame, column: str) -> pd.Series:
+    if column not in df.columns:
+        return pd.Series("", index=df.index)
+    return df[column].fillna("").astype(str).replace("nan", "")
+
+
+def build_history_records(
+    df: pd.DataFrame,
+    role: str,
+    user_key: str,
+    jd_text: str = "",
+    jd_ref: str = "",
+    batch_id: str | None = None,
+) -> list[dict]:
+    """screening_history rows for a results frame, built column-wise."""
+    if df is None or df.empty:
+        return []
+    batch_id = batch_id or uuid.uuid4().hex
+    columns = {
+        "user_key": user_key,
+        "role": str(role),
+        "ingest_key": [f"{batch_id}:{i}" for i in range(len(df))],
+    }
+    for field, column in TEXT_FIELDS.items():
+        columns[field] = _text_column(df, column).to_numpy()
+    for field, column in NUMERIC_FIELDS.items():
+        values = df[column] if column in df.columns else pd.Series(0, index=df.index)
+        columns[field] = pd.to_numeric(values, errors="coerce").fillna(0).astype(float).to_numpy()
+    feedback = _text_column(df, "Feedback")
+    columns["feedback"] = feedback.where(feedback != "", "Pending").to_numpy()
+    client = _text_column(df, "Client")
+    columns["client"] = client.where(client != "", _text_column(df, "client_company")).to_numpy()
+    if jd_ref:
+        columns["jd_ref"], columns["jd"] = jd_ref, ""
+    else:
+        columns["jd"] = (jd_text or "")[:4000]
+    return pd.DataFrame(columns, index=range(len(df))).to_dict("records")
+
+
+# ---------------------------------------------------------------------------
+# Sending
+# ---------------------------------------------------------------------------
+_PLAIN_INSERT = False  # set once the ingest_key column turns out to be missing
+_INLINE_JD = False  # set once the jd_ref column turns out to be missing
+
+
+def jd_ref_supported() -> bool:
+    """False once a write showed screening_history has no jd_ref column."""
+    return not _INLINE_JD
+
+
+def _inline_jds(client, rows: list[dict]) -> list[dict]:
+    """Swap jd_ref back for the JD text, for a schema without jd_ref."""
+    refs = sorted({row["jd_ref"] for row in rows if row.get("jd_ref")})
+    texts = {}
+    if refs:
+        data = client.table("jd_texts").select("jd_hash,jd").in_("jd_hash", refs).execute().data
+        texts = {item["jd_hash"]: item["jd"] for item in data or []}
+    inlined = []
+    for row in rows:
+        ref = row.get("jd_ref", "")
+        row = {k: v for k, v in row.items() if k != "jd_ref"}
+        if ref and not row.get("jd"):
+            row["jd"] = (texts.get(ref) or "")[:4000]
+        inlined.append(row)
+    return inlined
+
+
+def _send_chunk(client, rows: list[dict]) -> None:
+    global _PLAIN_INSERT, _INLINE_JD
+    if _INLINE_JD:
+        rows = _inline_jds(client, rows)
+    try:
+        if not _PLAIN_INSERT:
+            client.table("screening_history").upsert(
+                rows, on_conflict="ingest_key", ignore_duplicates=True
+            ).execute()
+        else:
+            plain = [{k: v for k, v in row.items() if k != "ingest_key"} for row in rows]
+            client.table("screening_history").insert(plain).execute()
+    except Exception as e:
+        # A column that isn't deployed fails every chunk the same way, so
+        # retrying would loop forever: fall back once and resend.
+        if not _INLINE_JD and "jd_ref" in str(e):
+            print(f"⚠️ [history_writer] jd_ref not deployed, storing JDs inline: {e}")
+            _INLINE_JD = True
+        elif not _PLAIN_INSERT and "ingest_key" in str(e):
+            print(f"⚠️ [history_writer] ingest_key not deployed, using plain inserts: {e}")
+            _PLAIN_INSERT = True
+        else:
+            raise
+        _send_chunk(client, rows)
+
+
+def insert_history_records(client, records: list[dict], retries: int = WRITE_RETRIES) -> int:
+    """Send records straight away in retried chunks, without the spool.
+    Returns the number of rows sent; raises on the first chunk that keeps
+    failing."""
+    sent = 0
+    for start in range(0, len(records), WRITE_CHUNK_ROWS):
+        chunk = records[start:start + WRITE_CHUNK_ROWS]
+        for attempt in range(retries):
+            try:
+                _send_chunk(client, chunk)
+                break
+            except Exception:
+                if attempt == retries - 1:
+                    raise
+                time.sleep(RETRY_BACKOFF * 2 ** attempt)
+        sent += len(chunk)
+    return sent
+
+
+# ---------------------------------------------------------------------------
+# Spool
+# ---------------------------------------------------------------------------
+def spool_history_records(records: list[dict], user_key: str) -> str:
+    """Persist records locally in chunks; returns the batch id."""
+    batch_id = records[0]["ingest_key"].split(":")[0] if records else uuid.uuid4().hex
+    now = time.time()
+    conn = _db()
+    with conn:
+        conn.executemany(
+            "INSERT INTO history_spool (batch_id, user_key, payload, created_at) VALUES (?, ?, ?, ?)",
+            [
+                (batch_id, user_key, json.dumps(records[i:i + WRITE_CHUNK_ROWS], default=str), now)
+                for i in range(0, len(records), WRITE_CHUNK_ROWS)
+            ],
+        )
+    _WAKE.set()
+    return batch_id
+
+
+def _claim(batch_id: str | None):
+    now = time.time()
+    where = "next_attempt_at <= ? AND lease_until <= ?"
+    params = [now, now]
+    if batch_id is not None:
+        where += " AND batch_id = ?"
+        params.append(batch_id)
+    conn = _db()
+    with conn:
+        return conn.execute(
+            f"UPDATE history_spool SET lease_until = ? WHERE id = ("
+            f"SELECT id FROM history_spool WHERE {where} ORDER BY id LIMIT 1"
+            ") RETURNING id, user_key, payload, attempts",
+            [now + SPOOL_LEASE, *params],
+        ).fetchone()
+
+
+def flush_history_spool(client, batch_id: str | None = None, retries: int = 1) -> tuple[list[str], int]:
+    """Send due spooled chunks (only `batch_id`'s if given). Returns the
+    users whose rows were sent and how many chunks failed this round."""
+    flushed, failed = [], 0
+    while True:
+        item = _claim(batch_id)
+        if item is None:
+            return flushed, failed
+        chunk_id, user_key, payload, attempts = item
+        error = ""
+        for attempt in range(retries):
+            try:
+                _send_chunk(client, json.loads(payload))
+                error = ""
+                break
+            except Exception as e:
+                error = str(e)
+                if attempt < retries - 1:
+                    time.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+        conn = _db()
+        with conn:
+            if not error:
+                conn.execute("DELETE FROM history_spool WHERE id = ?", (chunk_id,))
+                flushed.append(user_key)
+                continue
+            attempts += 1
+            conn.execute(
+                "UPDATE history_spool SET attempts = ?, last_error = ?, lease_until = 0, "
+                "next_attempt_at = ? WHERE id = ?",
+                (
+                    attempts,
+                    error[:500],
+                    time.time() + min(SPOOL_MAX_BACKOFF, RETRY_BACKOFF * 2 ** (attempts + retries)),
+                    chunk_id,
+                ),
+            )
+        failed += 1
+        print(f"❌ [history_writer] chunk {chunk_id} failed (attempt {attempts}): {error}")
+        if batch_id is not None:
+            # The caller is waiting: leave the rest to the background thread.
+            return flushed, failed
+
+
+def pending_history_writes(user_key: str | None = None) -> int:
+    """Rows still waiting in the spool."""
+    sql, params = "SELECT payload FROM history_spool", ()
+    if user_key is not None:
+        sql, params = sql + " WHERE user_key = ?", (user_key,)
+    return sum(len(json.loads(row[0])) for row in _db().execute(sql, params))
+
+
+# ---------------------------------------------------------------------------
+# Background flusher
+# ---------------------------------------------------------------------------
+_WAKE = threading.Event()
+_FLUSHER_LOCK = threading.Lock()
+_FLUSHER = None
+
+
+def _next_due() -> float | None:
+    row = _db().execute("SELECT MIN(MAX(next_attempt_at, lease_until)) FROM history_spool").fetchone()
+    return row[0] if row and row[0] is not None else None
+
+
+def _flush_forever(client, on_flushed) -> None:
+    while True:
+        try:
+            flushed, _failed = flush_history_spool(client)
+            for user_key in dict.fromkeys(flushed):
+                if on_flushed is not None:
+                    on_flushed(user_key)
+            due = _next_due()
+            wait = SPOOL_MAX_BACKOFF if due is None else max(1.0, due - time.time())
+        except Exception as e:
+            print(f"❌ [history_writer] background flush error: {e}")
+            wait = 30.0
+        _WAKE.wait(timeout=min(wait, SPOOL_MAX_BACKOFF))
+        _WAKE.clear()
+
+
+def start_background_flush(client, on_flushed=None) -> None:
+    """Start this process' flusher thread (once). `on_flushed(user_key)` is
+    called after a user's spooled rows reach Supabase."""
+    global _FLUSHER
+    with _FLUSHER_LOCK:
+        if _FLUSHER is not None and _FLUSHER.is_alive():
+            _WAKE.set()
+            return
+        _FLUSHER = threading.Thread(
+            target=_flush_forever,
+            args=(client, on_flushed),
+            name="history-writer",
+            daemon=True,
+        )
+        _FLUSHER.start()
+
+
+def discard_spooled_history(user_key: str, role: str | None = None) -> None:
+    """Drop spooled rows that a history delete has made obsolete."""
+    conn = _db()
+    with conn:
+        if role is None:
+            conn.execute("DELETE FROM history_spool WHERE user_key = ?", (user_key,))
+            return
+        for chunk_id, payload in conn.execute(
+            "SELECT id, payload FROM history_spool WHERE user_key = ?", (user_key,)
+        ).fetchall():
+            rows = [row for row in json.loads(payload) if row.get("role") != str(role)]
+            if rows:
+                conn.execute(
+                    "UPDATE history_spool SET payload = ? WHERE id = ?",
+                    (json.dumps(rows, default=str), chunk_id),
+                )
+            else:
+                conn.execute("DELETE FROM history_spool WHERE id = ?", (chunk_id,))
+
+
+def resume_spooled_history(client, on_flushed=None) -> None:
+    """Start the flusher if an earlier process left rows in the spool."""
+    try:
+        if _db().execute("SELECT 1 FROM history_spool LIMIT 1").fetchone():
+            start_background_flush(client, on_flushed)
+    except Exception as e:
+        print(f"⚠️ [history_writer] can't read the spool: {e}")
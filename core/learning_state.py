@@ -0,0 +1,350 @@
+import math
+import time
+
+import pandas as pd
+
+from .constants import DATA_DIR
+from .local_db import connect
+
+
+# ---------------------------------------------------------------------------
+# MATERIALIZED LEARNING STATE
+#
+# get_learning_adjustments() used to load the user's whole history on every
+# screening run, iterrows() it into candidate_memory and recompute client
+# bias, industry counts, experience quantiles and keyword frequencies from
+# scratch — thousands of rows to produce a handful of numbers.
+#
+# Those numbers are now kept up to date as history changes:
+#
+#   learning_rows    one compact row per (user, profile key, role) with just
+#                    the fields learning needs; a change first takes the
+#                    row's old contribution back out, then adds the new one.
+#   learning_counts  counters per (user, client scope): positive / negative
+#                    decisions, and for positive rows the industries,
+#                    matched keywords and experience (to 0.1 yr — an exact
+#                    histogram the quartiles are read from).
+#
+# Every row counts in its own client's scope and in the all-clients scope.
+# save_history() and the feedback updates feed it incrementally. A user's
+# state is rebuilt from history when it is missing, when a change can't be
+# applied row by row, and after LEARNING_RESYNC seconds so feedback given on
+# another host is picked up.
+# ---------------------------------------------------------------------------
+LEARNING_DB_PATH = DATA_DIR / "learning.sqlite3"
+LEARNING_RESYNC = 3600  # seconds
+
+POSITIVE_FEEDBACK = {"Interviewed", "Shortlisted", "Hired"}
+NEGATIVE_FEEDBACK = {"Rejected", "Do Not Consider"}
+
+ALL_CLIENTS = "*"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS learning_rows (
+    user_key         TEXT NOT NULL,
+    profile_key      TEXT NOT NULL,
+    role             TEXT NOT NULL,
+    seq              INTEGER NOT NULL,
+    client           TEXT NOT NULL DEFAULT '',
+    feedback         TEXT NOT NULL DEFAULT 'Pending',
+    verdict          TEXT NOT NULL DEFAULT '',
+    industry         TEXT NOT NULL DEFAULT '',
+    experience       REAL,
+    matched_keywords TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (user_key, profile_key, role)
+);
+CREATE INDEX IF NOT EXISTS idx_learning_rows_decided
+    ON learning_rows (user_key, seq) WHERE feedback != 'Pending';
+CREATE TABLE IF NOT EXISTS learning_counts (
+    user_key TEXT NOT NULL,
+    client   TEXT NOT NULL,
+    kind     TEXT NOT NULL,
+    item     TEXT NOT NULL,
+    n        INTEGER NOT NULL,
+    PRIMARY KEY (user_key, client, kind, item)
+);
+CREATE TABLE IF NOT EXISTS learning_sync (
+    user_key  TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL
+);
+"""
+
+_ROW_FIELDS = (
+    "profile_key", "role", "client", "feedback", "verdict", "industry",
+    "experience", "matched_keywords",
+)
+
+
+def _db():
+    return connect(LEARNING_DB_PATH, _SCHEMA)
+
+
+def _text(value) -> str:
+    if value is None:
+        return ""
+    try:
+        if pd.isna(value):
+            return ""
+    except (TypeError, ValueError):
+        pass
+    return str(value).strip()
+
+
+def _experience(value):
+    number = pd.to_numeric(pd.Series([value]), errors="coerce").iloc[0]
+    return None if pd.isna(number) else round(float(number), 1)
+
+
+def _frame_rows(df: pd.DataFrame) -> list[dict]:
+    rows = []
+    for rec in df.to_dict("records"):
+        profile_key = _text(rec.get("Profile Key"))
+        if not profile_key:
+            continue
+        rows.append({
+            "profile_key": profile_key,
+            "role": _text(rec.get("Role")),
+            "client": _text(rec.get("Client")) or _text(rec.get("client_company")),
+            "feedback": _text(rec.get("Feedback")) or "Pending",
+            "verdict": _text(rec.get("Verdict")),
+            "industry": _text(rec.get("Candidate Industry")),
+            "experience": _experience(rec.get("Experience")),
+            "matched_keywords": _text(rec.get("Matched Keywords")),
+        })
+    return rows
+
+
+def _contributions(row: dict) -> list[tuple[str, str]]:
+    """(kind, item) counters one history row adds to each of its scopes."""
+    feedback = row["feedback"]
+    if feedback in NEGATIVE_FEEDBACK:
+        return [("decision", "negative")]
+    if feedback not in POSITIVE_FEEDBACK:
+        return []
+    out = [("decision", "positive")]
+    if row["industry"]:
+        out.append(("industry", row["industry"]))
+    if row["experience"] is not None:
+        out.append(("experience", f"{row['experience']:.1f}"))
+    for keyword in row["matched_keywords"].split(","):
+        if keyword.strip():
+            out.append(("keyword", keyword.strip()))
+    return out
+
+
+def _count(conn, user_key: str, row: dict, sign: int) -> None:
+    scopes = {ALL_CLIENTS, row["client"].lower()}
+    params = [
+        (user_key, scope, kind, item, sign)
+        for scope in scopes
+        for kind, item in _contributions(row)
+    ]
+    conn.executemany(
+        "INSERT INTO learning_counts (user_key, client, kind, item, n) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT (user_key, client, kind, item) DO UPDATE SET n = n + excluded.n",
+        params,
+    )
+
+
+def _existing(conn, user_key: str, profile_key: str, role: str) -> dict | None:
+    row = conn.execute(
+        f"SELECT {', '.join(_ROW_FIELDS)} FROM learning_rows "
+        "WHERE user_key = ? AND profile_key = ? AND role = ?",
+        (user_key, profile_key, role),
+    ).fetchone()
+    return dict(row) if row else None
+
+
+def _put(conn, user_key: str, row: dict, seq: int) -> None:
+    old = _existing(conn, user_key, row["profile_key"], row["role"])
+    if old is not None:
+        if row["feedback"] == "Pending":
+            # Same rule as the history store: a re-screen keeps the
+            # feedback already given.
+            row = {**row, "feedback": old["feedback"]}
+        _count(conn, user_key, old, -1)
+    conn.execute(
+        f"INSERT OR REPLACE INTO learning_rows (user_key, seq, {', '.join(_ROW_FIELDS)}) "
+        f"VALUES (?, ?, {', '.join('?' for _ in _ROW_FIELDS)})",
+        (user_key, seq, *(row[f] for f in _ROW_FIELDS)),
+    )
+    _count(conn, user_key, row, +1)
+
+
+def _next_seq(conn, user_key: str) -> int:
+    return conn.execute(
+        "SELECT COALESCE(MAX(seq), 0) + 1 FROM learning_rows WHERE user_key = ?", (user_key,)
+    ).fetchone()[0]
+
+
+def _drop(conn, user_key: str) -> None:
+    conn.execute("DELETE FROM learning_rows WHERE user_key = ?", (user_key,))
+    conn.execute("DELETE FROM learning_counts WHERE user_key = ?", (user_key,))
+    conn.execute("DELETE FROM learning_sync WHERE user_key = ?", (user_key,))
+
+
+def _prune(conn, user_key: str) -> None:
+    conn.execute("DELETE FROM learning_counts WHERE user_key = ? AND n <= 0", (user_key,))
+
+
+def _synced(conn, user_key: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM learning_sync WHERE user_key = ?", (user_key,)
+    ).fetchone() is not None
+
+
+# ---------------------------------------------------------------------------
+# Writes
+# ---------------------------------------------------------------------------
+def record_screenings(df: pd.DataFrame, user_key: str) -> None:
+    """Fold newly saved history rows into the state. Skipped while the
+    user's state hasn't been built yet — the first rebuild reads them."""
+    if df is None or df.empty:
+        return
+    rows = _frame_rows(df)
+    conn = _db()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if not _synced(conn, user_key):
+            return
+        seq = _next_seq(conn, user_key)
+        for offset, row in enumerate(rows):
+            _put(conn, user_key, row, seq + offset)
+        _prune(conn, user_key)
+
+
+def record_feedback(user_key: str, changes) -> None:
+    """Apply (profile_key, role, feedback) changes to the state."""
+    conn = _db()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if not _synced(conn, user_key):
+            return
+        for profile_key, role, feedback in changes:
+            old = _existing(conn, user_key, _text(profile_key), _text(role))
+            if old is None or old["feedback"] == feedback:
+                continue
+            _count(conn, user_key, old, -1)
+            conn.execute(
+                "UPDATE learning_rows SET feedback = ? "
+                "WHERE user_key = ? AND profile_key = ? AND role = ?",
+                (feedback, user_key, old["profile_key"], old["role"]),
+            )
+            _count(conn, user_key, {**old, "feedback": feedback}, +1)
+        _prune(conn, user_key)
+
+
+def forget_learning(user_key: str, role: str | None = None) -> None:
+    """Remove a user's state, or just one role's rows from it."""
+    conn = _db()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        if role is None:
+            _drop(conn, user_key)
+            return
+        rows = conn.execute(
+            f"SELECT {', '.join(_ROW_FIELDS)} FROM learning_rows WHERE user_key = ? AND role = ?",
+            (user_key, _text(role)),
+        ).fetchall()
+        for row in rows:
+            _count(conn, user_key, dict(row), -1)
+        conn.execute(
+            "DELETE FROM learning_rows WHERE user_key = ? AND role = ?", (user_key, _text(role))
+        )
+        _prune(conn, user_key)
+
+
+def invalidate_learning(user_key: str) -> None:
+    """Force a rebuild from history on the next read."""
+    conn = _db()
+    with conn:
+        conn.execute("DELETE FROM learning_sync WHERE user_key = ?", (user_key,))
+
+
+def needs_rebuild(user_key: str) -> bool:
+    row = _db().execute(
+        "SELECT synced_at FROM learning_sync WHERE user_key = ?", (user_key,)
+    ).fetchone()
+    return row is None or time.time() - row[0] > LEARNING_RESYNC
+
+
+def rebuild_learning(hist: pd.DataFrame, user_key: str) -> None:
+    """Recompute a user's state from their full history (oldest first)."""
+    rows = _frame_rows(hist) if hist is not None and not hist.empty else []
+    conn = _db()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _drop(conn, user_key)
+        for seq, row in enumerate(rows, start=1):
+            _put(conn, user_key, row, seq)
+        conn.execute(
+            "INSERT INTO learning_sync (user_key, synced_at) VALUES (?, ?)",
+            (user_key, time.time()),
+        )
+
+
+# ---------------------------------------------------------------------------
+# Reads
+# ---------------------------------------------------------------------------
+def _quantile(histogram: dict[float, int], q: float) -> float | None:
+    """pandas' default (linear) quantile over a value -> count histogram."""
+    total = sum(histogram.values())
+    if total <= 0:
+        return None
+    position = q * (total - 1)
+    lower_rank, upper_rank = math.floor(position), math.ceil(position)
+    lower = upper = None
+    seen = 0
+    for value in sorted(histogram):
+        seen += histogram[value]
+        if lower is None and seen > lower_rank:
+            lower = value
+        if seen > upper_rank:
+            upper = value
+            break
+    return lower + (upper - lower) * (position - lower_rank)
+
+
+def _top(counts: dict[str, int], n: int) -> list[str]:
+    return [item for item, _ in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[:n]]
+
+
+def learning_snapshot(user_key: str, client_company: str = "") -> dict:
+    """The learning inputs for one screening run: the decided-feedback map
+    by profile key and the counters for the client's scope."""
+    conn = _db()
+    memory = {}
+    for row in conn.execute(
+        f"SELECT {', '.join(_ROW_FIELDS)} FROM learning_rows "
+        "WHERE user_key = ? AND feedback != 'Pending' ORDER BY seq",
+        (user_key,),
+    ):
+        memory[row["profile_key"]] = {
+            "feedback": row["feedback"],
+            "role": row["role"],
+            "client": row["client"],
+            "verdict": row["verdict"],
+            "industry": row["industry"],
+            "experience": row["experience"],
+            "matched_keywords": row["matched_keywords"],
+        }
+
+    scope = client_company.strip().lower() or ALL_CLIENTS
+    counts = {"decision": {}, "industry": {}, "keyword": {}, "experience": {}}
+    for kind, item, n in conn.execute(
+        "SELECT kind, item, n FROM learning_counts WHERE user_key = ? AND client = ? AND n > 0",
+        (user_key, scope),
+    ):
+        counts[kind][item] = n
+
+    experience = {float(value): n for value, n in counts["experience"].items()}
+    low, high = _quantile(experience, 0.25), _quantile(experience, 0.75)
+    return {
+        "candidate_memory": memory,
+        "positive": counts["decision"].get("positive", 0),
+        "negative": counts["decision"].get("negative", 0),
+        "preferred_industries": _top(counts["industry"], 5),
+        "good_fit_keywords": _top(counts["keyword"], 10),
+        "min_experience_hint": None if low is None else round(low, 1),
+        "max_experience_hint": None if high is None else round(high, 1),
+    }
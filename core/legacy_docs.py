@@ -0,0 +1,218 @@
+import re
+import shutil
+import subprocess
+import tempfile
+import zipfile
+from io import BytesIO
+from pathlib import Path
+from xml.etree import ElementTree
+
+
+# ---------------------------------------------------------------------------
+# LEGACY DOCUMENT FORMATS — .doc, .rtf, .odt
+#
+# Older candidates still send Word 97 .doc files, RTF exports and
+# OpenOffice documents; these used to come back as "Unsupported file type."
+# They are turned into plain text here and then go through the same
+# extraction cache and quality repair as every other format.
+#
+#   .odt  a ZIP with content.xml — read with the standard library.
+#   .rtf  a small built-in RTF-to-text reader (no external tool needed).
+#   .doc  antiword (packages.txt), else LibreOffice's headless converter
+#         if it happens to be installed.
+#
+# Conversions are run inside the parse sandbox (see parse_sandbox.py), so
+# a converter that hangs is killed along with its worker.
+# ---------------------------------------------------------------------------
+CONVERT_TIMEOUT = 45  # seconds per external converter run
+
+
+class ConverterUnavailable(RuntimeError):
+    """No installed tool can convert this file type."""
+
+
+def _soffice() -> str | None:
+    return shutil.which("soffice") or shutil.which("libreoffice")
+
+
+def _antiword_text(data: bytes) -> str:
+    with tempfile.NamedTemporaryFile(suffix=".doc") as fh:
+        fh.write(data)
+        fh.flush()
+        result = subprocess.run(
+            ["antiword", "-w", "0", fh.name],
+            capture_output=True,
+            timeout=CONVERT_TIMEOUT,
+            check=True,
+        )
+    return result.stdout.decode("utf-8", errors="ignore")
+
+
+def _soffice_text(data: bytes, suffix: str) -> str:
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / f"resume{suffix}"
+        source.write_bytes(data)
+        subprocess.run(
+            [
+                _soffice(),
+                "--headless",
+                "--norestore",
+                # Private profile per run: concurrent conversions otherwise
+                # fight over the shared profile lock.
+                f"-env:UserInstallation=file://{tmp}/profile",
+                "--convert-to",
+                "txt:Text (encoded):UTF8",
+                "--outdir",
+                tmp,
+                str(source),
+            ],
+            capture_output=True,
+            timeout=CONVERT_TIMEOUT,
+            check=True,
+        )
+        return (Path(tmp) / "resume.txt").read_text(encoding="utf-8", errors="ignore")
+
+
+# ---------------------------------------------------------------------------
+# ODT
+# ---------------------------------------------------------------------------
+_ODT_TEXT_NS = "urn:oasis:names:tc:opendocument:xmlns:text:1.0"
+_ODT_PARAGRAPHS = {f"{{{_ODT_TEXT_NS}}}p", f"{{{_ODT_TEXT_NS}}}h"}
+_ODT_TAB = f"{{{_ODT_TEXT_NS}}}tab"
+_ODT_LINE_BREAK = f"{{{_ODT_TEXT_NS}}}line-break"
+_ODT_SPACE = f"{{{_ODT_TEXT_NS}}}s"
+
+
+def _odt_node_text(node) -> str:
+    parts = [node.text or ""]
+    for child in node:
+        if child.tag == _ODT_TAB:
+            parts.append("\t")
+        elif child.tag == _ODT_LINE_BREAK:
+            parts.append("\n")
+        elif child.tag == _ODT_SPACE:
+            parts.append(" " * int(child.get(f"{{{_ODT_TEXT_NS}}}c", "1")))
+        elif child.tag not in _ODT_PARAGRAPHS:
+            parts.append(_odt_node_text(child))
+        parts.append(child.tail or "")
+    return "".join(parts)
+
+
+def odt_to_text(data: bytes) -> str:
+    with zipfile.ZipFile(BytesIO(data)) as archive:
+        root = ElementTree.fromstring(archive.read("content.xml"))
+    lines = [_odt_node_text(node).strip() for node in root.iter() if node.tag in _ODT_PARAGRAPHS]
+    return "\n".join(line for line in lines if line)
+
+
+# ---------------------------------------------------------------------------
+# RTF
+# ---------------------------------------------------------------------------
+_RTF_TOKEN = re.compile(
+    r"\\([a-zA-Z]+)(-?\d+)? ?"   # control word (+ optional numeric arg)
+    r"|\\'([0-9a-fA-F]{2})"      # hex-escaped byte
+    r"|\\([^a-zA-Z])"            # control symbol
+    r"|([{}])"                   # group
+    r"|[\r\n]+"                  # raw newlines are not content in RTF
+    r"|([^\\{}\r\n]+)"           # plain text
+)
+# Destinations whose contents are never document text.
+_RTF_SKIP_DESTINATIONS = {
+    "fonttbl", "colortbl", "stylesheet", "info", "pict", "object", "header",
+    "footer", "headerl", "headerr", "footerl", "footerr", "themedata",
+    "colorschememapping", "datastore", "latentstyles", "listtable",
+    "listoverridetable", "rsidtbl", "generator", "xmlnstbl", "filetbl",
+    "revtbl", "fldinst", "bkmkstart", "bkmkend",
+}
+_RTF_NEWLINE_WORDS = {"par", "line", "sect", "page", "row"}
+_RTF_TAB_WORDS = {"tab", "cell"}
+
+
+def rtf_to_text(data: bytes) -> str:
+    source = data.decode("latin-1")
+    out = []
+    stack = []
+    ignorable = False
+    uc_skip = 1      # chars to drop after a \uN escape (its ANSI fallback)
+    pending_skip = 0
+
+    for match in _RTF_TOKEN.finditer(source):
+        word, arg, hexcode, symbol, brace, plain = match.groups()
+        if brace:
+            pending_skip = 0
+            if brace == "{":
+                stack.append((uc_skip, ignorable))
+            elif stack:
+                uc_skip, ignorable = stack.pop()
+        elif symbol:
+            pending_skip = 0
+            if symbol == "*":
+                ignorable = True
+            elif ignorable:
+                continue
+            elif symbol in "\\{}":
+                out.append(symbol)
+            elif symbol == "~":
+                out.append(" ")
+            elif symbol in "\r\n":
+                out.append("\n")
+        elif word:
+            pending_skip = 0
+            if word in _RTF_SKIP_DESTINATIONS:
+                ignorable = True
+            elif ignorable:
+                continue
+            elif word in _RTF_NEWLINE_WORDS:
+                out.append("\n")
+            elif word in _RTF_TAB_WORDS:
+                out.append("\t")
+            elif word == "uc":
+                uc_skip = int(arg or 1)
+            elif word == "u" and arg:
+                code = int(arg)
+                out.append(chr(code + 65536 if code < 0 else code))
+                pending_skip = uc_skip
+        elif hexcode:
+            if pending_skip:
+                pending_skip -= 1
+            elif not ignorable:
+                out.append(bytes.fromhex(hexcode).decode("cp1252", errors="ignore"))
+        elif plain:
+            if pending_skip:
+                dropped = min(pending_skip, len(plain))
+                plain = plain[dropped:]
+                pending_skip -= dropped
+            if not ignorable:
+                out.append(plain)
+
+    text = "".join(out)
+    return "\n".join(line.strip() for line in text.splitlines() if line.strip())
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+def legacy_document_text(file_name: str, data: bytes) -> str:
+    """Plain text of a .doc / .rtf / .odt file. Raises ConverterUnavailable
+    when nothing on this host can read the format."""
+    suffix = Path(file_name or "").suffix.lower()
+
+    # Plenty of ".doc" resumes are really RTF saved under the old extension.
+    if suffix == ".rtf" or data.lstrip()[:5] == b"{\\rtf":
+        return rtf_to_text(data)
+    if suffix == ".odt":
+        return odt_to_text(data)
+
+    if suffix == ".doc":
+        if shutil.which("antiword"):
+            try:
+                return _antiword_text(data)
+            except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as exc:
+                print(f"[legacy_docs] antiword failed: {exc}")
+        if _soffice():
+            return _soffice_text(data, suffix)
+        raise ConverterUnavailable(
+            "No converter for .doc files (install antiword or LibreOffice)."
+        )
+
+    raise ConverterUnavailable(f"Unsupported legacy format: {suffix or file_name}")
@@ -0,0 +1,68 @@
+import sqlite3
+import threading
+from pathlib import Path
+
+
+# ---------------------------------------------------------------------------
+# Shared SQLite plumbing for the local stores under data/.
+#
+# Streamlit runs every session in its own thread, and on a multi-worker
+# deploy several processes point at the same data/ directory. sqlite3
+# connections can't be shared across threads, so each thread keeps one
+# connection per database file. WAL mode lets readers keep going while a
+# writer commits, and the busy timeout makes concurrent writers queue
+# instead of failing with "database is locked".
+# ---------------------------------------------------------------------------
+_LOCAL = threading.local()
+
+
+def connect(path, schema: str = "", migrate=None) -> sqlite3.Connection:
+    """Return this thread's connection to `path`, creating it on first use.
+
+    `schema` (CREATE ... IF NOT EXISTS statements) and then `migrate(conn)`
+    run once per connection, before it is first handed out.
+    """
+    path = Path(path)
+    conns = getattr(_LOCAL, "conns", None)
+    if conns is None:
+        conns = _LOCAL.conns = {}
+        _LOCAL.ready = set()
+
+    key = str(path.resolve())
+    conn = conns.get(key)
+    if conn is None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(key, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        conns[key] = conn
+    if (schema or migrate) and key not in _LOCAL.ready:
+        if schema:
+            conn.executescript(schema)
+        if migrate is not None:
+            migrate(conn)
+        _LOCAL.ready.add(key)
+    return conn
+
+
+def evict_lru(conn, table: str, max_bytes: int, key_column: str = "cache_key") -> int:
+    """Trim a cache table (`size_bytes`, `last_access` columns) back under
+    `max_bytes`, least recently used first. Returns the rows deleted."""
+    total = conn.execute(f"SELECT COALESCE(SUM(size_bytes), 0) FROM {table}").fetchone()[0]
+    if total <= max_bytes:
+        return 0
+
+    # Trim to 90% so we don't evict again on the very next insert.
+    target = int(max_bytes * 0.9)
+    doomed = []
+    for row in conn.execute(f"SELECT {key_column}, size_bytes FROM {table} ORDER BY last_access ASC"):
+        if total <= target:
+            break
+        doomed.append((row[0],))
+        total -= row[1]
+
+    with conn:
+        conn.executemany(f"DELETE FROM {table} WHERE {key_column} = ?", doomed)
+    return len(doomed)
@@ -0,0 +1,389 @@
+import hashlib
+import json
+from datetime import datetime
+
+import pandas as pd
+
+from .constants import DATA_DIR
+from .local_db import connect
+
+
+# ---------------------------------------------------------------------------
+# LOCAL HISTORY STORE (SQLite)
+#
+# Local history used to be one candidate_history_<user>.xlsx per user.
+# Every save read the whole workbook, concatenated, ran drop_duplicates and
+# rewrote it; feedback updates and role deletes did the same. openpyxl gets
+# painfully slow past a few thousand rows, so saves went from instant to
+# several seconds as a recruiter's history grew.
+#
+# All users now share one WAL-mode SQLite file:
+#
+#   - UNIQUE (user_key, profile_key, role) replaces drop_duplicates: saving
+#     a batch is one upsert per row, whatever the size of the history;
+#   - (user_key, created_at) serves the History tab's newest-first reads;
+#   - feedback updates and role deletes touch only the matching rows.
+#
+# The columns Supabase also has are real columns here, with the same
+# names. Anything else on the screening frame (OCR Pages, adjustments, ...)
+# is kept per row as JSON in `extra`, so load_history() returns the same
+# columns the Excel file used to.
+#
+# JDs are stored once, in jd_texts keyed by the SHA-256 of the text; a
+# history row only carries that hash in `jd_ref` (its legacy `jd` column
+# stays empty). A 300-resume run used to write the same JD 300 times.
+# ---------------------------------------------------------------------------
+HISTORY_DB_PATH = DATA_DIR / "history.sqlite3"
+
+# DataFrame column -> SQL column (same names as Supabase's screening_history)
+HISTORY_COLUMNS = {
+    "Profile Key": "profile_key",
+    "Role": "role",
+    "Name": "name",
+    "Email": "email",
+    "Phone": "phone",
+    "Experience": "experience",
+    "Education": "education",
+    "Final Score": "final_score",
+    "Verdict": "verdict",
+    "Industry Match": "industry_match",
+    "Candidate Industry": "candidate_industry",
+    "Matched Keywords": "matched_keywords",
+    "Missing Keywords": "missing_keywords",
+    "Skills": "skills",
+    "Reason": "reason",
+    "Feedback": "feedback",
+    "Client": "client",
+    "Source File": "source_file",
+    "JD": "jd",
+}
+NUMERIC_COLUMNS = {"experience", "final_score"}
+# Assigned by the store. "Screened At" is only read back from the frame when
+# migrating rows that already carry one.
+GENERATED_COLUMNS = {"Row ID": "id", "Screened At": "created_at", "JD Ref": "jd_ref"}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS candidate_history (
+    id                 INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_key           TEXT NOT NULL,
+    profile_key        TEXT NOT NULL DEFAULT '',
+    role               TEXT NOT NULL DEFAULT '',
+    name               TEXT NOT NULL DEFAULT '',
+    email              TEXT NOT NULL DEFAULT '',
+    phone              TEXT NOT NULL DEFAULT '',
+    experience         REAL,
+    education          TEXT NOT NULL DEFAULT '',
+    final_score        REAL,
+    verdict            TEXT NOT NULL DEFAULT '',
+    industry_match     TEXT NOT NULL DEFAULT '',
+    candidate_industry TEXT NOT NULL DEFAULT '',
+    matched_keywords   TEXT NOT NULL DEFAULT '',
+    missing_keywords   TEXT NOT NULL DEFAULT '',
+    skills             TEXT NOT NULL DEFAULT '',
+    reason             TEXT NOT NULL DEFAULT '',
+    feedback           TEXT NOT NULL DEFAULT 'Pending',
+    client             TEXT NOT NULL DEFAULT '',
+    source_file        TEXT NOT NULL DEFAULT '',
+    jd                 TEXT NOT NULL DEFAULT '',
+    jd_ref             TEXT NOT NULL DEFAULT '',
+    created_at         TEXT NOT NULL,
+    extra              TEXT NOT NULL DEFAULT '{}'
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_history_user_profile_role
+    ON candidate_history (user_key, profile_key, role);
+CREATE INDEX IF NOT EXISTS idx_history_user_created
+    ON candidate_history (user_key, created_at);
+CREATE INDEX IF NOT EXISTS idx_history_user_role_created
+    ON candidate_history (user_key, role, created_at);
+CREATE TABLE IF NOT EXISTS jd_texts (
+    jd_hash    TEXT PRIMARY KEY,
+    jd         TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+"""
+
+
+def jd_hash(text: str) -> str:
+    """Content address of a JD. Matches Postgres'
+    encode(sha256(convert_to(jd, 'UTF8')), 'hex')."""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def _store_jd_texts(conn, texts) -> list[str]:
+    """Insert each distinct non-empty JD once; returns one ref per text."""
+    refs = []
+    stored = {}
+    for text in texts:
+        if not text:
+            refs.append("")
+            continue
+        if text not in stored:
+            stored[text] = jd_hash(text)
+            conn.execute(
+                "INSERT OR IGNORE INTO jd_texts (jd_hash, jd, created_at) VALUES (?, ?, ?)",
+                (stored[text], text, _now()),
+            )
+        refs.append(stored[text])
+    return refs
+
+
+def _dedupe_jds(conn) -> None:
+    """One-off: move the JD copied onto every row into jd_texts."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(candidate_history)")}
+    with conn:
+        if "jd_ref" not in columns:
+            conn.execute(
+                "ALTER TABLE candidate_history ADD COLUMN jd_ref TEXT NOT NULL DEFAULT ''"
+            )
+        texts = [
+            row[0]
+            for row in conn.execute(
+                "SELECT DISTINCT jd FROM candidate_history WHERE jd != '' AND jd_ref = ''"
+            )
+        ]
+        for text, ref in zip(texts, _store_jd_texts(conn, texts)):
+            conn.execute(
+                "UPDATE candidate_history SET jd_ref = ?, jd = '' WHERE jd = ? AND jd_ref = ''",
+                (ref, text),
+            )
+        conn.execute("PRAGMA user_version = 1")
+    if texts:
+        print(f"[local_history] moved {len(texts)} distinct JDs out of history rows")
+
+
+def _migrate(conn) -> None:
+    if conn.execute("PRAGMA user_version").fetchone()[0] < 1:
+        _dedupe_jds(conn)
+
+
+def _db():
+    return connect(HISTORY_DB_PATH, _SCHEMA, _migrate)
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _plain(value):
+    if value is None:
+        return None
+    try:
+        if pd.isna(value):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return value.item() if hasattr(value, "item") else value
+
+
+def _records(df: pd.DataFrame, user_key: str, created_at: str) -> tuple[list[str], list[tuple]]:
+    n = len(df)
+    columns = {"user_key": [user_key] * n}
+    for frame_col, sql_col in HISTORY_COLUMNS.items():
+        if frame_col not in df.columns:
+            columns[sql_col] = [None if sql_col in NUMERIC_COLUMNS else ""] * n
+        elif sql_col in NUMERIC_COLUMNS:
+            values = pd.to_numeric(df[frame_col], errors="coerce")
+            columns[sql_col] = [None if pd.isna(v) else float(v) for v in values]
+        else:
+            values = df[frame_col].fillna("").astype(str).str.strip()
+            columns[sql_col] = values.tolist()
+    columns["feedback"] = [fb or "Pending" for fb in columns["feedback"]]
+    columns["jd_ref"] = [""] * n  # filled in by upsert_history
+
+    if "Screened At" in df.columns:
+        stamps = df["Screened At"].fillna("").astype(str).str.slice(0, 19)
+        columns["created_at"] = [s or created_at for s in stamps]
+    else:
+        columns["created_at"] = [created_at] * n
+
+    extra_cols = [
+        c for c in df.columns if c not in HISTORY_COLUMNS and c not in GENERATED_COLUMNS
+    ]
+    if extra_cols:
+        columns["extra"] = [
+            json.dumps({k: _plain(v) for k, v in rec.items()}, default=str)
+            for rec in df[extra_cols].to_dict("records")
+        ]
+    else:
+        columns["extra"] = ["{}"] * n
+
+    names = list(columns)
+    return names, list(zip(*(columns[name] for name in names)))
+
+
+def upsert_history(df: pd.DataFrame, user_key: str) -> int:
+    """Insert or update one row per (profile key, role). A re-screen keeps
+    the feedback already given unless the new row carries its own."""
+    if df is None or df.empty:
+        return 0
+    conn = _db()
+    names, rows = _records(df, user_key, _now())
+    updates = ", ".join(
+        f"{name} = excluded.{name}"
+        for name in names
+        if name not in ("user_key", "profile_key", "role", "feedback")
+    )
+    sql = (
+        f"INSERT INTO candidate_history ({', '.join(names)}) "
+        f"VALUES ({', '.join('?' for _ in names)}) "
+        "ON CONFLICT (user_key, profile_key, role) DO UPDATE SET "
+        f"{updates}, "
+        "feedback = CASE WHEN excluded.feedback = 'Pending' "
+        "THEN candidate_history.feedback ELSE excluded.feedback END"
+    )
+    jd_at, ref_at = names.index("jd"), names.index("jd_ref")
+    with conn:
+        refs = _store_jd_texts(conn, [row[jd_at] for row in rows])
+        rows = [list(row) for row in rows]
+        for row, ref in zip(rows, refs):
+            row[jd_at], row[ref_at] = "", ref
+        conn.executemany(sql, rows)
+    return len(rows)
+
+
+DETAIL_COLUMNS = ("reason", "jd", "jd_ref")
+
+
+def load_local_history(
+    user_key: str,
+    role: str | None = None,
+    since: str | None = None,
+    limit: int | None = None,
+    profile_keys=None,
+) -> pd.DataFrame:
+    """A user's rows, oldest first (the Excel file's append order). `limit`
+    keeps the newest rows. JD and Reason aren't loaded."""
+    where, params = ["user_key = ?"], [user_key]
+    if role:
+        where.append("role = ?")
+        params.append(str(role))
+    if since:
+        where.append("created_at >= ?")
+        params.append(str(since))
+    if profile_keys:
+        profile_keys = list(profile_keys)
+        where.append(f"profile_key IN ({', '.join('?' for _ in profile_keys)})")
+        params.extend(str(k) for k in profile_keys)
+    select = ", ".join(
+        ["id", "user_key", *(c for c in HISTORY_COLUMNS.values() if c not in DETAIL_COLUMNS),
+         "created_at", "extra"]
+    )
+    sql = (
+        f"SELECT {select} FROM candidate_history WHERE {' AND '.join(where)} "
+        "ORDER BY created_at DESC, id DESC"
+    )
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    df = pd.read_sql_query(sql, _db(), params=params)
+    if df.empty:
+        return pd.DataFrame()
+    df = df.iloc[::-1].reset_index(drop=True)
+
+    extra = pd.DataFrame(
+        [json.loads(raw or "{}") for raw in df.pop("extra")], index=df.index
+    )
+    rename = {sql: col for col, sql in HISTORY_COLUMNS.items()}
+    rename.update({sql: col for col, sql in GENERATED_COLUMNS.items()})
+    df = df.drop(columns=["user_key"]).rename(columns=rename)
+    extra = extra.drop(columns=[c for c in extra.columns if c in df.columns])
+    return pd.concat([df, extra], axis=1) if not extra.empty else df
+
+
+def local_history_summary(user_key: str) -> dict:
+    conn = _db()
+    total, strong_fit = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(verdict = 'Strong Fit'), 0) "
+        "FROM candidate_history WHERE user_key = ?",
+        (user_key,),
+    ).fetchone()
+    roles = [
+        row[0]
+        for row in conn.execute(
+            "SELECT DISTINCT role FROM candidate_history "
+            "WHERE user_key = ? AND role != '' ORDER BY role",
+            (user_key,),
+        )
+    ]
+    return {"total": int(total), "strong_fit": int(strong_fit), "roles": roles}
+
+
+def local_history_jd(user_key: str, role: str) -> str:
+    row = _db().execute(
+        "SELECT COALESCE(t.jd, h.jd) FROM candidate_history h "
+        "LEFT JOIN jd_texts t ON t.jd_hash = h.jd_ref "
+        "WHERE h.user_key = ? AND h.role = ? AND (h.jd_ref != '' OR h.jd != '') "
+        "ORDER BY h.created_at DESC, h.id DESC LIMIT 1",
+        (user_key, str(role)),
+    ).fetchone()
+    return row[0] if row and row[0] else ""
+
+
+def local_jd_text(ref: str) -> str:
+    row = _db().execute("SELECT jd FROM jd_texts WHERE jd_hash = ?", (ref,)).fetchone()
+    return row[0] if row else ""
+
+
+def delete_local_history(user_key: str, role: str | None = None) -> int:
+    conn = _db()
+    with conn:
+        if role is None:
+            cur = conn.execute("DELETE FROM candidate_history WHERE user_key = ?", (user_key,))
+        else:
+            cur = conn.execute(
+                "DELETE FROM candidate_history WHERE user_key = ? AND role = ?",
+                (user_key, str(role)),
+            )
+    return cur.rowcount
+
+
+def update_local_feedback(user_key: str, profile_key_value: str, role: str, feedback: str) -> int:
+    conn = _db()
+    with conn:
+        cur = conn.execute(
+            "UPDATE candidate_history SET feedback = ? "
+            "WHERE user_key = ? AND profile_key = ? AND role = ?",
+            (feedback, user_key, profile_key_value, role),
+        )
+    return cur.rowcount
+
+
+def update_local_feedback_by_id(user_key: str, row_id: int, feedback: str) -> int:
+    conn = _db()
+    with conn:
+        cur = conn.execute(
+            "UPDATE candidate_history SET feedback = ? WHERE id = ? AND user_key = ?",
+            (feedback, int(row_id), user_key),
+        )
+    return cur.rowcount
+
+
+def local_row_keys(row_id: int) -> tuple[str, str, str] | None:
+    """(user_key, profile_key, role) of one stored row."""
+    row = _db().execute(
+        "SELECT user_key, profile_key, role FROM candidate_history WHERE id = ?", (int(row_id),)
+    ).fetchone()
+    return tuple(row) if row else None
+
+
+def update_local_feedback_bulk(user_key: str, changes: list[dict]) -> list[bool]:
+    """Apply many feedback changes in one transaction. Each change carries
+    "feedback" plus either "row_id" or "profile_key" + "role". Returns one
+    matched/not-matched flag per change, in order."""
+    results = []
+    conn = _db()
+    with conn:
+        for change in changes:
+            if change.get("row_id") is not None:
+                cur = conn.execute(
+                    "UPDATE candidate_history SET feedback = ? WHERE id = ? AND user_key = ?",
+                    (change["feedback"], int(change["row_id"]), user_key),
+                )
+            else:
+                cur = conn.execute(
+                    "UPDATE candidate_history SET feedback = ? "
+                    "WHERE user_key = ? AND profile_key = ? AND role = ?",
+                    (change["feedback"], user_key, change.get("profile_key", ""), change.get("role", "")),
+                )
+            results.append(cur.rowcount > 0)
+    return results
@@ -1,13 +1,17 @@
+import multiprocessing
+import os
 import re
 import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
 from io import BytesIO
 
-import streamlit as st
+from .extraction_cache import cache_key, content_hash, get_cached, put_cached
+from .legacy_docs import legacy_document_text
+from .parse_sandbox import ParseCrashed, ParseLimitExceeded, run_isolated
+from .pdf_backends import PDF_BACKENDS, extract_pdf_page_texts, looks_tabular, pdfplumber_page_texts
 
-try:
-    import pdfplumber
-except Exception:
-    pdfplumber = None
 try:
     from docx import Document
 except Exception:
@@ -20,6 +24,14 @@ try:
     from pdf2image import convert_from_bytes
 except Exception:
     convert_from_bytes = None
+try:
+    from PIL import Image
+except Exception:
+    Image = None
+try:
+    import resource
+except Exception:
+    resource = None
 
 
 # ---------------------------------------------------------------------------
@@ -45,8 +57,8 @@ if pytesseract is not None and platform.system() == "Windows":
 # the other for the full OCR duration (which is already your slowest path:
 # rasterizing + Tesseract). convert_from_bytes and pytesseract are safe to
 # run concurrently on independent byte inputs; nothing here needs a shared
-# lock. Removed entirely — @st.cache_data already prevents duplicate work
-# on the *same* file.
+# lock. Removed entirely — the extraction cache already prevents duplicate
+# work on the *same* file.
 # ---------------------------------------------------------------------------
 
 
@@ -190,87 +202,591 @@ def repair_letter_spaced_text(text: str) -> str:
     return "\n".join(out_lines)
 
 
-def ocr_pdf(data: bytes, max_pages: int = 8) -> str:
+# ---------------------------------------------------------------------------
+# PAGE-PARALLEL OCR
+#
+# The old ocr_pdf() rasterized every page in one convert_from_bytes() call
+# and then ran Tesseract on them one after another — one core busy, the
+# rest idle, on what is by far the slowest path in the app.
+#
+# Each page is now its own job on a process pool that lives for the whole
+# Streamlit process, so it is shared by every file and every session. A
+# worker rasterizes just its page (pdf2image's first_page/last_page) and
+# OCRs it; 8 pages of one file, or pages from several users at once, run
+# side by side on every core.
+#
+#   - Back-pressure: submissions take a slot from a bounded semaphore, so a
+#     300-page batch queues in the caller instead of piling thousands of
+#     page payloads into the pool's queue.
+#   - Per-page timeout: pdftoppm and tesseract are both killed by their own
+#     timeout inside the worker, and the caller stops waiting shortly after.
+#   - Tesseract's own OpenMP threading is pinned to 1 per worker; with one
+#     worker per core, letting each spawn more threads only oversubscribes.
+#   - Each worker (and the pdftoppm / tesseract it launches) runs under an
+#     RLIMIT_AS cap, so a page that rasterizes to an absurd size fails on
+#     its own instead of dragging the host into swap.
+#   - If the pool can't start or breaks, we fall back to the old inline path
+#     (with pdf2image's thread_count) rather than failing the file.
+#
+# ADAPTIVE DPI: every page used to be rasterized at a flat 250 DPI. Clean
+# scans read just as well at 150, at well under half the pixels (RAM) and
+# Tesseract time. A page now starts at the lowest rung of OCR_DPI_STEPS and
+# Tesseract's per-word confidence (image_to_data) decides whether it is
+# worth another pass: only a page whose mean confidence is below
+# OCR_MIN_CONFIDENCE, or whose text fails _extraction_quality_ok(), is
+# re-rasterized at the next rung. If no rung is good enough, the most
+# confident attempt wins. The DPI and confidence that were kept are
+# returned per page so the ladder can be tuned from real uploads.
+# ---------------------------------------------------------------------------
+OCR_DPI_STEPS = (150, 220, 300)
+OCR_MIN_CONFIDENCE = 75.0  # mean per-word Tesseract confidence, 0-100
+OCR_WORKERS = max(1, os.cpu_count() or 1)
+OCR_MAX_IN_FLIGHT = OCR_WORKERS * 2
+OCR_PAGE_TIMEOUT = 90  # seconds per page, rasterize + OCR
+OCR_CONFIG = "--psm 3 --oem 3"
+OCR_ADDRESS_SPACE_MB = 4096
+
+_OCR_POOL = None
+_OCR_POOL_LOCK = threading.Lock()
+_OCR_SLOTS = threading.BoundedSemaphore(OCR_MAX_IN_FLIGHT)
+
+
+def _ocr_worker_init() -> None:
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    if resource is not None:
+        limit = OCR_ADDRESS_SPACE_MB * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError):
+            pass
+
+
+def _get_ocr_pool() -> ProcessPoolExecutor:
+    global _OCR_POOL
+    with _OCR_POOL_LOCK:
+        if _OCR_POOL is None:
+            # spawn, not fork: the Streamlit server is multi-threaded and
+            # forking it mid-request is not safe.
+            _OCR_POOL = ProcessPoolExecutor(
+                max_workers=OCR_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_ocr_worker_init,
+            )
+        return _OCR_POOL
+
+
+def _reset_ocr_pool() -> None:
+    global _OCR_POOL
+    with _OCR_POOL_LOCK:
+        pool, _OCR_POOL = _OCR_POOL, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _submit_ocr_job(fn, *args):
+    """Submit one page job, blocking while the shared pool is saturated."""
+    _OCR_SLOTS.acquire()
+    try:
+        future = _get_ocr_pool().submit(fn, *args)
+    except BaseException:
+        _OCR_SLOTS.release()
+        raise
+    future.add_done_callback(lambda _f: _OCR_SLOTS.release())
+    return future
+
+
+def _ocr_image(image) -> tuple[str, float]:
+    """OCR one image. Returns (text, mean word confidence); the text keeps
+    Tesseract's line breaks so it reads like image_to_string() output."""
+    data = pytesseract.image_to_data(
+        image,
+        config=OCR_CONFIG,
+        timeout=OCR_PAGE_TIMEOUT,
+        output_type=pytesseract.Output.DICT,
+    )
+    lines: dict[tuple, list[str]] = {}
+    confidences = []
+    for i, word in enumerate(data.get("text", [])):
+        word = (word or "").strip()
+        try:
+            conf = float(data["conf"][i])
+        except (TypeError, ValueError):
+            conf = -1.0
+        if not word or conf < 0:
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(word)
+        confidences.append(conf)
+
+    text = "\n".join(" ".join(words) for words in lines.values())
+    confidence = round(sum(confidences) / len(confidences), 1) if confidences else 0.0
+    return text, confidence
+
+
+def _ocr_page_adaptive(rasterize, first_image=None) -> dict:
+    """Walk OCR_DPI_STEPS until a pass is confident and passes the quality
+    gate. `rasterize(dpi)` returns the page image at that DPI (or None);
+    `first_image` is an already-rasterized image at the lowest rung."""
+    best = None
+    for step, dpi in enumerate(OCR_DPI_STEPS):
+        image = first_image if step == 0 and first_image is not None else rasterize(dpi)
+        if image is None:
+            break
+        text, confidence = _ocr_image(image)
+        attempt = {"text": text, "dpi": dpi, "confidence": confidence}
+        if best is None or confidence > best["confidence"]:
+            best = attempt
+        if not text.strip():
+            # Blank page — more pixels won't conjure words out of nothing.
+            break
+        if confidence >= OCR_MIN_CONFIDENCE and _extraction_quality_ok(text):
+            return attempt
+    return best or {"text": "", "dpi": OCR_DPI_STEPS[0], "confidence": 0.0}
+
+
+def _ocr_pdf_page(data: bytes, page_number: int) -> dict:
+    """Rasterize and OCR a single page at adaptive DPI. Runs inside a pool
+    worker. Returns {"text", "dpi", "confidence"}."""
+
+    def rasterize(dpi):
+        images = convert_from_bytes(
+            data,
+            dpi=dpi,
+            first_page=page_number,
+            last_page=page_number,
+            grayscale=True,
+            timeout=OCR_PAGE_TIMEOUT,
+        )
+        return images[0] if images else None
+
+    return _ocr_page_adaptive(rasterize)
+
+
+def _ocr_pdf_pages_inline(data: bytes, pages: list[int]) -> dict[int, dict]:
+    results = {page: None for page in pages}
+    try:
+        # First rung for all pages in one call; escalations go page by page.
+        images = convert_from_bytes(
+            data,
+            dpi=OCR_DPI_STEPS[0],
+            first_page=min(pages),
+            last_page=max(pages),
+            grayscale=True,
+            thread_count=min(4, len(pages)),
+        )
+        for page, image in zip(range(min(pages), max(pages) + 1), images):
+            if page not in results:
+                continue
+            try:
+                results[page] = _ocr_page_adaptive(
+                    lambda dpi, page=page: (convert_from_bytes(
+                        data, dpi=dpi, first_page=page, last_page=page, grayscale=True
+                    ) or [None])[0],
+                    first_image=image,
+                )
+            except Exception as exc:
+                print(f"[ocr_pdf_pages] page {page} failed inline: {exc}")
+    except Exception:
+        pass
+    return results
+
+
+def _ocr_image_frame(data: bytes, frame: int) -> dict:
+    """OCR one frame (1-based) of an image file. Runs inside a pool worker.
+    Photos and scans arrive at whatever resolution they were taken at, so
+    there is no DPI ladder here — the image is OCR'd once, as is."""
+    with Image.open(BytesIO(data)) as image:
+        image.seek(frame - 1)
+        dpi = (image.info.get("dpi") or (0, 0))[0]
+        gray = image.convert("L")
+    text, confidence = _ocr_image(gray)
+    return {"text": text, "dpi": int(dpi or 0), "confidence": confidence}
+
+
+def _ocr_image_frames_inline(data: bytes, frames: list[int]) -> dict[int, dict]:
+    results = {frame: None for frame in frames}
+    for frame in frames:
+        try:
+            results[frame] = _ocr_image_frame(data, frame)
+        except Exception as exc:
+            print(f"[ocr_image_frames] frame {frame} failed inline: {exc}")
+    return results
+
+
+def ocr_image_frames(data: bytes, frames) -> dict[int, dict]:
+    """OCR the given 1-based frames of an image (one for PNG/JPEG, several
+    for multi-page TIFF) on the shared pool. Same result shape as
+    ocr_pdf_pages()."""
+    if Image is None:
+        return {frame: None for frame in frames}
+    return _run_ocr_jobs(_ocr_image_frame, _ocr_image_frames_inline, data, frames)
+
+
+def ocr_pdf_pages(data: bytes, pages) -> dict[int, dict]:
+    """OCR the given 1-based page numbers on the shared pool.
+    Returns {page_number: {"text", "dpi", "confidence"}}; pages that fail or
+    time out map to None."""
+    if convert_from_bytes is None:
+        return {page: None for page in pages}
+    return _run_ocr_jobs(_ocr_pdf_page, _ocr_pdf_pages_inline, data, pages)
+
+
+def _run_ocr_jobs(job, inline, data: bytes, pages) -> dict[int, dict]:
+    pages = sorted(set(pages))
+    results = {page: None for page in pages}
+    if not pages or pytesseract is None:
+        return results
+
+    try:
+        futures = {page: _submit_ocr_job(job, data, page) for page in pages}
+    except (BrokenProcessPool, OSError, RuntimeError) as exc:
+        print(f"[ocr] pool unavailable, OCR inline: {exc}")
+        _reset_ocr_pool()
+        return inline(data, pages)
+
+    # Each rung is bounded by OCR_PAGE_TIMEOUT inside the worker.
+    wait = OCR_PAGE_TIMEOUT * len(OCR_DPI_STEPS) + 10
+    for page, future in futures.items():
+        try:
+            result = future.result(timeout=wait)
+            result["text"] = (result.get("text") or "").strip()
+            results[page] = result
+        except FutureTimeoutError:
+            future.cancel()
+            print(f"[ocr] page {page} timed out after {wait}s")
+        except BrokenProcessPool as exc:
+            print(f"[ocr] pool broke on page {page}: {exc}")
+            _reset_ocr_pool()
+        except Exception as exc:
+            print(f"[ocr] page {page} failed: {exc}")
+    return results
+
+
+def ocr_pdf(data: bytes, max_pages: int = 8, page_count: int | None = None) -> str:
     """OCR fallback. max_pages now matches the text-extraction page cap
     below (was capped at 5 while the text path allowed 8 — inconsistent,
     and could silently drop OCR-worthy content on pages 6-8)."""
     if pytesseract is None or convert_from_bytes is None:
         return ""
-    try:
-        images = convert_from_bytes(data, dpi=250, first_page=1, last_page=max_pages)
-        text_parts = []
-        for image in images:
-            text_parts.append(
-                pytesseract.image_to_string(image, config="--psm 3 --oem 3")
-            )
-        return "\n".join(text_parts).strip()
-    except Exception:
-        return ""
+    last_page = min(page_count, max_pages) if page_count else max_pages
+    results = ocr_pdf_pages(data, range(1, last_page + 1))
+    return "\n".join(
+        (results[page] or {}).get("text", "") for page in sorted(results)
+    ).strip()
 
 
 MAX_PAGES = 8
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff")
+LEGACY_EXTENSIONS = (".doc", ".rtf", ".odt")
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".txt") + IMAGE_EXTENSIONS + LEGACY_EXTENSIONS
 
 
-@st.cache_data(show_spinner=False, max_entries=250)
-def read_uploaded_file(file_name: str, data: bytes) -> tuple[str, str]:
+def _choose_page_text(text: str, ocr_text: str) -> str:
+    # Prefer OCR text if it's meaningfully longer AND passes the same
+    # quality gate — don't swap in OCR output that's itself garbage just
+    # because it happens to be longer.
+    if len(ocr_text) > len(text) and _extraction_quality_ok(ocr_text):
+        return ocr_text
+    if not text.strip() and ocr_text.strip():
+        # Original extraction was empty; OCR text is our only option even
+        # if imperfect — better than nothing.
+        return ocr_text
+    return text
+
+
+# Bump whenever a change here alters extracted text, so the persistent
+# extraction cache stops serving results from the old logic.
+EXTRACTOR_VERSION = "7"
+
+
+# ---------------------------------------------------------------------------
+# LAZY PAGE READS
+#
+# Every PDF used to be read to MAX_PAGES before scoring. For long academic
+# CVs, or a resume with six scanned certificates stapled on, pages 3-8
+# almost never change the score but still cost a full parse — and OCR if
+# they are scans. By default pages are now read in order and the read stops
+# as soon as the text so far has contact details, work history and a skills
+# section (RESUME_SIGNALS). The same check runs between OCR waves, so
+# trailing scanned pages are only OCR'd while the signal is still missing.
+#
+# `page_budget` caps both paths; `full_read=True` ignores the early stop
+# and reads the whole budget — screening uses it to re-read borderline
+# candidates whose first read stopped early. The read mode is part of the
+# cache key, so a lazy read never answers a full-read request.
+# ---------------------------------------------------------------------------
+RESUME_SIGNALS = {
+    "contact": re.compile(
+        r"[A-Za-z0-9._%+\-]+@[A-Za-z0-9.\-]+\.[A-Za-z]{2,}|(?:\+?\d[\s().-]?){10,}"
+    ),
+    "work": re.compile(
+        r"(?im)^\s*(work\s+experience|professional\s+experience|experience|"
+        r"employment(\s+history)?|work\s+history|career\s+(history|summary)|"
+        r"internships?)\b|"
+        r"\b(19|20)\d{2}\s*[-\u2013\u2014to]+\s*(present|current|till\s*date|now|(19|20)\d{2})\b"
+    ),
+    "skills": re.compile(
+        r"(?im)^\s*(technical\s+|key\s+|core\s+)?(skills?|skill\s+set|"
+        r"competencies|technologies|tools)\b"
+    ),
+}
+OCR_WAVE_PAGES = max(2, OCR_WORKERS)
+
+
+def resume_signals(text: str) -> set[str]:
+    """Which RESUME_SIGNALS appear in `text`."""
+    return {name for name, pattern in RESUME_SIGNALS.items() if pattern.search(text or "")}
+
+
+def _has_enough_signal(page_texts) -> bool:
+    return len(resume_signals("\n".join(t for t in page_texts if t))) == len(RESUME_SIGNALS)
+
+
+def _empty_meta() -> dict:
+    return {
+        "page_count": 0,
+        "pages_read": 0,
+        "ocr_pages": [],
+        "ocr_failed_pages": [],
+        "ocr_page_stats": [],
+    }
+
+
+# ---------------------------------------------------------------------------
+# PER-PAGE SELECTIVE OCR
+#
+# Quality used to be judged on the whole document: one scanned cover page
+# or a couple of scanned certificates behind a perfectly good text CV made
+# the combined text fail the gate, and then EVERY page went through OCR.
+# Each page is now gated on its own text layer, only the failing pages are
+# sent to the OCR pool, and the text is stitched back in page order. The
+# pages that were actually replaced by OCR are reported in `ocr_pages`.
+# ---------------------------------------------------------------------------
+def _docx_text(data: bytes) -> str:
+    doc = Document(BytesIO(data))
+    text_parts = [p.text for p in doc.paragraphs if p.text.strip()]
+    for table in doc.tables:
+        for row in table.rows:
+            row_text = " ".join(
+                cell.text for cell in row.cells if cell.text.strip()
+            )
+            if row_text:
+                text_parts.append(row_text)
+    return "\n".join(text_parts).strip()
+
+
+def _read_mode_version(full_read: bool, page_budget: int) -> str:
+    return f"{EXTRACTOR_VERSION}:{'full' if full_read else 'lazy'}:{page_budget}"
+
+
+def extract_uploaded_file(
+    file_name: str,
+    data: bytes,
+    full_read: bool = False,
+    page_budget: int = MAX_PAGES,
+    digest: str = "",
+) -> tuple[str, str, dict]:
+    """Like read_uploaded_file(), plus extraction metadata:
+    {"page_count", "pages_read", "ocr_pages": [1-based page numbers],
+     "ocr_page_stats": [{"page", "dpi", "confidence"} per OCR'd page],
+     "read_mode": "lazy" | "full", "stopped_early": bool}.
+    Served from the persistent extraction cache when this exact file has
+    been seen before. Pass `digest` (content_hash(data)) if the caller
+    already has it."""
+    digest = digest or content_hash(data)
+    full_key = cache_key(file_name, digest, _read_mode_version(True, page_budget))
+    key = full_key if full_read else cache_key(
+        file_name, digest, _read_mode_version(False, page_budget)
+    )
+    # A full read is always a valid answer to a lazy request.
+    for candidate in dict.fromkeys((key, full_key)):
+        cached = get_cached(candidate)
+        if cached is not None:
+            return cached
+
+    text, read_error, meta = _extract_uploaded_file(
+        file_name, data, full_read=full_read, page_budget=page_budget
+    )
+    # Don't pin transient failures (worker crashes, OCR timeouts, missing
+    # libraries) into the cache — the next upload should retry them.
+    if not meta.pop("transient", False) and not meta.get("ocr_failed_pages"):
+        put_cached(key, text, read_error, meta)
+        if key != full_key and not meta.get("stopped_early"):
+            put_cached(full_key, text, read_error, meta)
+    return text, read_error, meta
+
+
+def _extract_uploaded_file(
+    file_name: str,
+    data: bytes,
+    full_read: bool = False,
+    page_budget: int = MAX_PAGES,
+) -> tuple[str, str, dict]:
     name = file_name.lower()
+    meta = _empty_meta()
+    meta["read_mode"] = "full" if full_read else "lazy"
+    should_stop = None if full_read else _has_enough_signal
     try:
         if name.endswith(".pdf"):
-            if pdfplumber is None:
-                return "", "pdfplumber is not installed."
+            if not PDF_BACKENDS:
+                meta["transient"] = True
+                return "", "No PDF reader is installed (pdfplumber).", meta
 
-            with pdfplumber.open(BytesIO(data)) as pdf:
-                total_pages = len(pdf.pages)
-                pages = pdf.pages[:MAX_PAGES]
-                text = "\n".join(page.extract_text() or "" for page in pages).strip()
+            page_texts, total_pages, backend = run_isolated(
+                extract_pdf_page_texts, data, page_budget, should_stop=should_stop
+            )
+
+            meta["page_count"] = total_pages
+            meta["pages_read"] = len(page_texts)
+            meta["pdf_backend"] = backend
+            meta["stopped_early"] = len(page_texts) < min(total_pages, page_budget)
 
             truncated_note = ""
-            if total_pages > MAX_PAGES:
+            if total_pages > page_budget and not meta["stopped_early"]:
                 truncated_note = (
-                    f" (Note: PDF has {total_pages} pages; only first {MAX_PAGES} were read.)"
+                    f" (Note: PDF has {total_pages} pages; only first {page_budget} were read.)"
                 )
 
-            if not _extraction_quality_ok(text):
-                ocr_text = ocr_pdf(data, max_pages=MAX_PAGES)
-                # Prefer OCR text if it's meaningfully longer AND passes
-                # the same quality gate — don't swap in OCR output that's
-                # itself garbage just because it happens to be longer.
-                if len(ocr_text) > len(text) and _extraction_quality_ok(ocr_text):
-                    text = ocr_text
-                elif not text.strip() and ocr_text.strip():
-                    # Original extraction was empty; OCR text is our only
-                    # option even if imperfect — better than nothing.
-                    text = ocr_text
-
+            weak_pages = [
+                number for number, page_text in enumerate(page_texts, start=1)
+                if not _extraction_quality_ok(page_text)
+            ]
+            table_pages = [
+                number for number, page_text in enumerate(page_texts, start=1)
+                if number not in weak_pages and looks_tabular(page_text)
+            ]
+            if (weak_pages or table_pages) and backend != "pdfplumber":
+                # Fast backend came back weak, or read a table cell by cell:
+                # give pdfplumber's layout-aware extraction a go before
+                # paying for OCR.
+                try:
+                    fallback_texts = run_isolated(
+                        pdfplumber_page_texts, data, weak_pages + table_pages
+                    )
+                except Exception as exc:
+                    print(f"[extract_uploaded_file] pdfplumber fallback failed: {exc}")
+                    if isinstance(exc, ParseCrashed):
+                        meta["transient"] = True
+                    fallback_texts = {}
+                for number, fallback in fallback_texts.items():
+                    if _extraction_quality_ok(fallback) or not page_texts[number - 1]:
+                        page_texts[number - 1] = fallback
+                meta["pdfplumber_pages"] = sorted(fallback_texts)
+                weak_pages = [
+                    number for number in weak_pages
+                    if not _extraction_quality_ok(page_texts[number - 1])
+                ]
+            if weak_pages:
+                ocr_results = {}
+                waves = [weak_pages] if full_read else [
+                    weak_pages[i : i + OCR_WAVE_PAGES]
+                    for i in range(0, len(weak_pages), OCR_WAVE_PAGES)
+                ]
+                for wave_index, wave in enumerate(waves):
+                    ocr_results.update(ocr_pdf_pages(data, wave))
+                    done = [
+                        text if number not in ocr_results else _choose_page_text(
+                            text, (ocr_results[number] or {}).get("text", "")
+                        )
+                        for number, text in enumerate(page_texts, start=1)
+                    ]
+                    if should_stop is not None and should_stop(done):
+                        skipped = [n for w in waves[wave_index + 1 :] for n in w]
+                        if skipped:
+                            meta["ocr_skipped_pages"] = skipped
+                            meta["stopped_early"] = True
+                        break
+                weak_pages = [number for number in weak_pages if number in ocr_results]
+                for number in weak_pages:
+                    result = ocr_results.get(number)
+                    if result is None:
+                        meta["ocr_failed_pages"].append(number)
+                        ocr_text = ""
+                    else:
+                        ocr_text = result["text"]
+                        meta["ocr_page_stats"].append({
+                            "page": number,
+                            "dpi": result["dpi"],
+                            "confidence": result["confidence"],
+                        })
+                    original = page_texts[number - 1]
+                    chosen = _choose_page_text(original, ocr_text)
+                    if chosen is not original:
+                        page_texts[number - 1] = chosen
+                        meta["ocr_pages"].append(number)
+
+            text = "\n".join(t for t in page_texts if t).strip()
             text = repair_letter_spaced_text(text)
 
             if not text.strip():
-                return "", "No readable text found (scanned/image-only PDF, OCR unavailable or failed)."
+                return "", "No readable text found (scanned/image-only PDF, OCR unavailable or failed).", meta
 
-            return text.strip(), truncated_note.strip()
+            return text.strip(), truncated_note.strip(), meta
 
         if name.endswith(".docx"):
             if Document is None:
-                return "", "python-docx is not installed."
-            doc = Document(BytesIO(data))
-            text_parts = [p.text for p in doc.paragraphs if p.text.strip()]
-            for table in doc.tables:
-                for row in table.rows:
-                    row_text = " ".join(
-                        cell.text for cell in row.cells if cell.text.strip()
-                    )
-                    if row_text:
-                        text_parts.append(row_text)
-            text = "\n".join(text_parts).strip()
+                meta["transient"] = True
+                return "", "python-docx is not installed.", meta
+            text = run_isolated(_docx_text, data)
             text = repair_letter_spaced_text(text)
             if not text:
-                return "", "DOCX opened but no readable text found."
-            return text, ""
+                return "", "DOCX opened but no readable text found.", meta
+            return text, "", meta
 
         if name.endswith(".txt"):
             text = data.decode("utf-8", errors="ignore").strip()
-            return repair_letter_spaced_text(text), ""
+            return repair_letter_spaced_text(text), "", meta
+
+        if name.endswith(IMAGE_EXTENSIONS):
+            # Straight to the OCR pool — no PDF round-trip.
+            if pytesseract is None or Image is None:
+                meta["transient"] = True
+                return "", "OCR is not available (pytesseract / Pillow not installed).", meta
+            with Image.open(BytesIO(data)) as image:
+                frame_count = getattr(image, "n_frames", 1)
+            frames = list(range(1, min(frame_count, page_budget) + 1))
+            meta["page_count"] = frame_count
+            meta["pages_read"] = len(frames)
+
+            ocr_results = ocr_image_frames(data, frames)
+            texts = []
+            for frame in frames:
+                result = ocr_results.get(frame)
+                if result is None:
+                    meta["ocr_failed_pages"].append(frame)
+                    continue
+                texts.append(result["text"])
+                meta["ocr_pages"].append(frame)
+                meta["ocr_page_stats"].append({
+                    "page": frame,
+                    "dpi": result["dpi"],
+                    "confidence": result["confidence"],
+                })
+            text = repair_letter_spaced_text("\n".join(t for t in texts if t).strip())
+            if not text:
+                return "", "No readable text found in image (OCR failed or image is blank).", meta
+            return text, "", meta
 
-        return "", "Unsupported file type."
+        if name.endswith(LEGACY_EXTENSIONS):
+            text = run_isolated(legacy_document_text, file_name, data)
+            text = repair_letter_spaced_text(text.strip())
+            if not text:
+                return "", "Document opened but no readable text found.", meta
+            return text, "", meta
+
+        return "", "Unsupported file type.", meta
+    except ParseCrashed as exc:
+        meta["transient"] = True
+        return "", f"Skipped: {exc}.", meta
+    except ParseLimitExceeded as exc:
+        # Over the time or memory limit: the same bytes will be killed the
+        # same way next time, so this is cached like any other result
+        # (until EXTRACTOR_VERSION changes).
+        return "", f"Skipped: {exc}.", meta
     except Exception as exc:
-        return "", f"Could not read file: {exc}"
+        return "", f"Could not read file: {exc}", meta
+
+
+def read_uploaded_file(file_name: str, data: bytes) -> tuple[str, str]:
+    text, read_error, _meta = extract_uploaded_file(file_name, data)
+    return text, read_error
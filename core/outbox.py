@@ -0,0 +1,301 @@
+import smtplib
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from .constants import DATA_DIR
+from .email_log import already_logged, emailed_recipients, log_sent_email
+from .local_db import connect
+from .smtp_delivery import SMTP_POOL_SIZE, SmtpSessionPool, _is_transient, sender_bucket
+
+
+# ---------------------------------------------------------------------------
+# OUTBOX — durable, resumable candidate outreach.
+#
+# Campaigns used to be sent inline in the Streamlit request: closing the tab
+# or restarting the worker killed send_bulk_emails() halfway, and the only
+# record of what went out was the send log.
+#
+# Messages are now rendered up front and written to a SQLite outbox, one
+# row per (sender, recipient, role) — the same key as the send log, so a
+# recipient can't be queued twice. A background thread drains it:
+#
+#   queued ──> sending ──> sent
+#                 │   └──> failed     (5xx reply, or OUTBOX_MAX_ATTEMPTS)
+#                 └──────> queued     (transient error, retried with backoff)
+#
+#   - a claimed row carries a lease; if the process dies mid-send the lease
+#     runs out and the row is picked up again after a restart;
+#   - a row is marked sent (and logged) right after the server accepts it,
+#     and rows whose recipient is already in the send log are skipped;
+#   - App Passwords are only kept in memory. After a restart queued rows
+#     wait until the sender opens the app again (register_sender).
+#
+# SMTP host, port, STARTTLS and login come from smtp_delivery, so a local
+# stand-in server can be used for testing.
+# ---------------------------------------------------------------------------
+OUTBOX_DB_PATH = DATA_DIR / "outbox.sqlite3"
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_BACKOFF = 30  # seconds, doubled per attempt
+OUTBOX_MAX_BACKOFF = 1800
+OUTBOX_LEASE = 300  # seconds
+OUTBOX_IDLE_WAIT = 30  # seconds between polls when nothing is due
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id              INTEGER PRIMARY KEY AUTOINCREMENT,
+    campaign_id     TEXT NOT NULL,
+    sender          TEXT NOT NULL,
+    sender_name     TEXT NOT NULL DEFAULT '',
+    recipient       TEXT NOT NULL,
+    role_key        TEXT NOT NULL,
+    role            TEXT NOT NULL DEFAULT '',
+    candidate_name  TEXT NOT NULL DEFAULT '',
+    subject         TEXT NOT NULL,
+    body            TEXT NOT NULL,
+    status          TEXT NOT NULL DEFAULT 'queued',
+    attempts        INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL DEFAULT 0,
+    lease_until     REAL NOT NULL DEFAULT 0,
+    last_error      TEXT NOT NULL DEFAULT '',
+    created_at      TEXT NOT NULL,
+    updated_at      TEXT NOT NULL,
+    UNIQUE (sender, recipient, role_key)
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due
+    ON outbox (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_outbox_campaign
+    ON outbox (campaign_id);
+"""
+
+
+def _db():
+    return connect(OUTBOX_DB_PATH, _SCHEMA)
+
+
+def _norm(value) -> str:
+    return str(value or "").strip().lower()
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+# ---------------------------------------------------------------------------
+# Senders (credentials live in memory only)
+# ---------------------------------------------------------------------------
+_SENDERS_LOCK = threading.Lock()
+_POOLS: dict[str, SmtpSessionPool] = {}
+
+
+def register_sender(sender_email: str, password: str) -> None:
+    """Make `sender_email`'s queued messages sendable from this process."""
+    sender = _norm(sender_email)
+    if not sender or not password:
+        return
+    with _SENDERS_LOCK:
+        pool = _POOLS.get(sender)
+        if pool is None or pool.password != password:
+            if pool is not None:
+                pool.close()
+            _POOLS[sender] = SmtpSessionPool(sender, password)
+    start_outbox_worker()
+
+
+def _forget_sender(sender: str) -> None:
+    with _SENDERS_LOCK:
+        pool = _POOLS.pop(sender, None)
+    if pool is not None:
+        pool.close()
+
+
+def _pool(sender: str) -> SmtpSessionPool | None:
+    with _SENDERS_LOCK:
+        return _POOLS.get(sender)
+
+
+# ---------------------------------------------------------------------------
+# Enqueue / status
+# ---------------------------------------------------------------------------
+def enqueue_messages(sender_email: str, sender_name: str, role: str, messages: list[dict]) -> dict:
+    """Queue rendered messages ({"name", "recipient", "subject", "body"}).
+    Recipients already emailed for this role, or already queued, are left
+    alone; a failed row is re-queued with the new content. Returns
+    {"campaign_id", "queued": [recipients], "skipped": [recipients]}."""
+    sender = _norm(sender_email)
+    campaign_id = uuid.uuid4().hex
+    already_sent = emailed_recipients(sender, role)
+    queued, skipped = [], []
+    now = _now()
+    conn = _db()
+    with conn:
+        for message in messages:
+            recipient = _norm(message["recipient"])
+            if recipient in already_sent:
+                skipped.append(message["recipient"])
+                continue
+            cur = conn.execute(
+                "INSERT INTO outbox (campaign_id, sender, sender_name, recipient, role_key, role, "
+                "candidate_name, subject, body, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (sender, recipient, role_key) DO UPDATE SET "
+                "campaign_id = excluded.campaign_id, sender_name = excluded.sender_name, "
+                "candidate_name = excluded.candidate_name, subject = excluded.subject, "
+                "body = excluded.body, status = 'queued', attempts = 0, next_attempt_at = 0, "
+                "last_error = '', updated_at = excluded.updated_at "
+                "WHERE outbox.status = 'failed'",
+                (
+                    campaign_id, sender, sender_name or "", recipient, _norm(role),
+                    str(role or "").strip(), message.get("name", ""), message["subject"],
+                    message["body"], now, now,
+                ),
+            )
+            (queued if cur.rowcount else skipped).append(message["recipient"])
+    _WAKE.set()
+    return {"campaign_id": campaign_id, "queued": queued, "skipped": skipped}
+
+
+def outbox_status(sender_email: str, role: str | None = None, campaign_id: str | None = None) -> list[dict]:
+    """Per-candidate delivery status, newest first."""
+    where, params = ["sender = ?"], [_norm(sender_email)]
+    if role is not None:
+        where.append("role_key = ?")
+        params.append(_norm(role))
+    if campaign_id is not None:
+        where.append("campaign_id = ?")
+        params.append(campaign_id)
+    rows = _db().execute(
+        "SELECT candidate_name, recipient, role, status, attempts, last_error, updated_at "
+        f"FROM outbox WHERE {' AND '.join(where)} ORDER BY id DESC",
+        params,
+    ).fetchall()
+    return [
+        {
+            "Name": row["candidate_name"],
+            "Email": row["recipient"],
+            "Role": row["role"],
+            "Status": row["status"].title(),
+            "Attempts": row["attempts"],
+            "Last Error": row["last_error"],
+            "Updated": row["updated_at"],
+        }
+        for row in rows
+    ]
+
+
+def outbox_counts(sender_email: str, role: str | None = None, campaign_id: str | None = None) -> dict:
+    """{status: rows} for a sender, optionally one role or campaign."""
+    where, params = ["sender = ?"], [_norm(sender_email)]
+    if role is not None:
+        where.append("role_key = ?")
+        params.append(_norm(role))
+    if campaign_id is not None:
+        where.append("campaign_id = ?")
+        params.append(campaign_id)
+    return {
+        row[0]: row[1]
+        for row in _db().execute(
+            f"SELECT status, COUNT(*) FROM outbox WHERE {' AND '.join(where)} GROUP BY status", params
+        )
+    }
+
+
+# ---------------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------------
+def _claim(limit: int) -> list:
+    senders = list(_POOLS)
+    if not senders:
+        return []
+    now = time.time()
+    conn = _db()
+    with conn:
+        return conn.execute(
+            "UPDATE outbox SET status = 'sending', lease_until = ?, updated_at = ? "
+            "WHERE id IN ("
+            "  SELECT id FROM outbox "
+            "  WHERE ((status = 'queued' AND next_attempt_at <= ?) "
+            "     OR (status = 'sending' AND lease_until <= ?)) "
+            f"  AND sender IN ({', '.join('?' for _ in senders)}) "
+            "  ORDER BY id LIMIT ?"
+            ") RETURNING id, sender, sender_name, recipient, role, subject, body, attempts",
+            [now + OUTBOX_LEASE, _now(), now, now, *senders, limit],
+        ).fetchall()
+
+
+def _finish(job_id: int, status: str, attempts: int, error: str = "", retry_in: float = 0) -> None:
+    conn = _db()
+    with conn:
+        conn.execute(
+            "UPDATE outbox SET status = ?, attempts = ?, last_error = ?, lease_until = 0, "
+            "next_attempt_at = ?, updated_at = ? WHERE id = ?",
+            (status, attempts, error[:500], time.time() + retry_in, _now(), job_id),
+        )
+
+
+def _deliver(job) -> None:
+    from .emailer import build_email_message  # emailer imports the outbox
+
+    sender = job["sender"]
+    attempts = job["attempts"] + 1
+    if already_logged(sender, job["recipient"], job["role"]):
+        _finish(job["id"], "sent", job["attempts"], "already in the send log")
+        return
+    pool = _pool(sender)
+    if pool is None:
+        _finish(job["id"], "queued", job["attempts"], "waiting for the sender's App Password")
+        return
+
+    try:
+        # Built before waiting on the rate limit, so it overlaps the wait.
+        msg = build_email_message(sender, job["sender_name"], job["recipient"], job["subject"], job["body"])
+        sender_bucket(sender).take()
+        pool.send_message(msg)
+    except smtplib.SMTPAuthenticationError as exc:
+        _forget_sender(sender)
+        _finish(job["id"], "queued", job["attempts"], f"login rejected: {exc}")
+        return
+    except Exception as exc:
+        if _is_transient(exc) and attempts < OUTBOX_MAX_ATTEMPTS:
+            backoff = min(OUTBOX_MAX_BACKOFF, OUTBOX_BACKOFF * 2 ** (attempts - 1))
+            _finish(job["id"], "queued", attempts, str(exc), backoff)
+        else:
+            _finish(job["id"], "failed", attempts, str(exc))
+        return
+
+    _finish(job["id"], "sent", attempts)
+    try:
+        log_sent_email(sender, job["recipient"], job["subject"], job["role"])
+    except Exception as exc:
+        print(f"[outbox] sent but not logged ({job['recipient']}): {exc}")
+
+
+_WAKE = threading.Event()
+_WORKER_LOCK = threading.Lock()
+_WORKER = None
+
+
+def _work_forever() -> None:
+    with ThreadPoolExecutor(max_workers=SMTP_POOL_SIZE, thread_name_prefix="outbox-send") as executor:
+        while True:
+            try:
+                jobs = _claim(SMTP_POOL_SIZE * 2)
+                if jobs:
+                    list(executor.map(_deliver, jobs))
+                    continue
+            except Exception as exc:
+                print(f"[outbox] worker error: {exc}")
+            _WAKE.wait(timeout=OUTBOX_IDLE_WAIT)
+            _WAKE.clear()
+
+
+def start_outbox_worker() -> None:
+    global _WORKER
+    with _WORKER_LOCK:
+        if _WORKER is not None and _WORKER.is_alive():
+            _WAKE.set()
+            return
+        _WORKER = threading.Thread(target=_work_forever, name="outbox-worker", daemon=True)
+        _WORKER.start()
@@ -0,0 +1,194 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+try:
+    import resource
+except Exception:
+    resource = None
+
+
+# ---------------------------------------------------------------------------
+# ISOLATED PARSING — hard wall-clock and memory limits per file.
+#
+# A single malformed PDF can hang pdfplumber.open() forever, and a "resume"
+# with a 20,000 x 20,000 embedded image can eat every byte of RAM. Both
+# used to happen inline in the Streamlit script thread, stalling the batch
+# (and every other session on that worker) on the worst file.
+#
+# The parsing step now runs in a small set of long-lived worker processes.
+# The caller hands a job to an idle worker and watches it:
+#
+#   - wall clock: past PARSE_TIMEOUT seconds the worker is killed;
+#   - memory: its RSS is read from /proc every PARSE_POLL_SECONDS and the
+#     worker is killed once it crosses PARSE_MAX_RSS_MB. RLIMIT_AS inside the
+#     worker is the backstop for spikes between two polls;
+#   - crash: a worker that dies (segfault, OOM killer) is reported as such.
+#
+# A killed worker is replaced by a fresh one, the caller gets a
+# ParseLimitExceeded carrying a readable reason (it ends up in
+# read_errors), and the rest of the batch carries on. Jobs must be
+# module-level functions with picklable arguments.
+# ---------------------------------------------------------------------------
+PARSE_WORKERS = 4
+PARSE_TIMEOUT = 60  # seconds per file
+PARSE_MAX_RSS_MB = 1024
+PARSE_ADDRESS_SPACE_MB = PARSE_MAX_RSS_MB * 3  # virtual >> resident
+PARSE_POLL_SECONDS = 0.25
+
+
+class ParseLimitExceeded(Exception):
+    """A parse job was killed (time/memory limit) or its worker crashed."""
+
+
+class ParseCrashed(ParseLimitExceeded):
+    """The worker died on its own (segfault, OOM killer). Unlike a limit
+    kill this may not happen again, so callers shouldn't remember it."""
+
+
+def _worker_main(conn, address_space_mb: int) -> None:
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    if resource is not None and address_space_mb:
+        limit = address_space_mb * 1024 * 1024
+        try:
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ValueError, OSError):
+            pass
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+        fn, args, kwargs = job
+        try:
+            conn.send(("ok", fn(*args, **kwargs)))
+        except MemoryError:
+            conn.send(("error", f"ran out of memory (limit {address_space_mb} MB)"))
+        except Exception as exc:
+            conn.send(("error", f"{type(exc).__name__}: {exc}"))
+
+
+def _rss_mb(pid: int) -> float | None:
+    try:
+        with open(f"/proc/{pid}/status") as fh:
+            for line in fh:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    return None
+
+
+class _Worker:
+    def __init__(self):
+        ctx = multiprocessing.get_context("spawn")
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_worker_main,
+            args=(child_conn, PARSE_ADDRESS_SPACE_MB),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+
+    def kill(self) -> None:
+        try:
+            self.process.kill()
+            self.process.join(timeout=5)
+        except Exception:
+            pass
+        try:
+            self.conn.close()
+        except Exception:
+            pass
+
+    def run(self, fn, args, kwargs, timeout: float, max_rss_mb: float):
+        self.conn.send((fn, args, kwargs))
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.conn.poll(PARSE_POLL_SECONDS):
+                try:
+                    status, payload = self.conn.recv()
+                except (EOFError, OSError):
+                    self.process.join(timeout=1)
+                    raise ParseCrashed(
+                        f"parser crashed (exit code {self.process.exitcode})"
+                    )
+                if status == "ok":
+                    return payload
+                raise RuntimeError(payload)
+
+            if not self.process.is_alive():
+                raise ParseCrashed(
+                    f"parser crashed (exit code {self.process.exitcode})"
+                )
+            rss = _rss_mb(self.process.pid)
+            if rss is not None and rss > max_rss_mb:
+                raise ParseLimitExceeded(
+                    f"parser used {rss:.0f} MB, over the {max_rss_mb:.0f} MB limit"
+                )
+            if time.monotonic() > deadline:
+                raise ParseLimitExceeded(
+                    f"parser took longer than {timeout:.0f}s"
+                )
+
+
+_IDLE = queue.LifoQueue()
+_SLOTS = threading.BoundedSemaphore(PARSE_WORKERS)
+_DISABLED = False
+
+
+def _checkout() -> _Worker:
+    try:
+        worker = _IDLE.get_nowait()
+        if worker.process.is_alive():
+            return worker
+        worker.kill()
+    except queue.Empty:
+        pass
+    return _Worker()
+
+
+def run_isolated(
+    fn,
+    *args,
+    timeout: float = PARSE_TIMEOUT,
+    max_rss_mb: float = PARSE_MAX_RSS_MB,
+    **kwargs,
+):
+    """Run fn(*args, **kwargs) in a sandboxed worker process and return its
+    result. Raises ParseLimitExceeded if the job is killed, RuntimeError if
+    fn raised inside the worker. Falls back to running inline if worker
+    processes can't be started on this host."""
+    global _DISABLED
+    if _DISABLED:
+        return fn(*args, **kwargs)
+
+    with _SLOTS:
+        try:
+            worker = _checkout()
+        except (OSError, RuntimeError) as exc:
+            print(f"[parse_sandbox] can't start workers, parsing inline: {exc}")
+            _DISABLED = True
+            return fn(*args, **kwargs)
+
+        try:
+            result = worker.run(fn, args, kwargs, timeout, max_rss_mb)
+        except ParseLimitExceeded as exc:
+            print(f"[parse_sandbox] killed worker {worker.process.pid}: {exc}")
+            worker.kill()
+            raise
+        except RuntimeError:
+            _IDLE.put(worker)
+            raise
+        except BaseException:
+            # Broken pipe, interrupted wait, ... — don't reuse this worker.
+            worker.kill()
+            raise
+        _IDLE.put(worker)
+        return result
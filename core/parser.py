@@ -1,7 +1,9 @@
 import hashlib
 import re
 from collections import Counter
+from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 
 from .constants import (
     DATE_RANGE_REGEX,
@@ -13,6 +15,11 @@ from .constants import (
 )
 from .ai_client import chat_json
 
+# Part of the result cache's run fingerprint: bump it when a fix changes
+# what gets pulled out of a resume (experience, name, contact details,
+# skills), or cached rows keep the old values.
+PARSER_VERSION = "2"
+
 
 # ---------------------------------------------------------------------------
 # REAL SPACY NER LOADING — this was the #1 accuracy killer.
@@ -783,9 +790,8 @@ def explicit_years_of_experience(text: str) -> float:
 #   3. the 3-line context around it has no internship/traineeship signal.
 #
 # Falls back to the existing explicit_years_of_experience() statement
-# parser, then to the existing broad extract_year_ranges_simple() as a
-# last resort — both untouched, so nothing that depended on them elsewhere
-# breaks.
+# parser, then to a broad total over every date range found. The
+# section/context rules now run on the single-pass timeline below.
 # ---------------------------------------------------------------------------
 
 # ---------------------------------------------------------------------------
@@ -827,93 +833,174 @@ _EXP_DISTANCE_EDU = re.compile(
     re.IGNORECASE
 )
 
+# Whole month names and their abbreviations only, on word boundaries: a bare
+# prefix match read "Novartis", "Marketing", "Deccan" or "Junior" as months.
+_EXP_MONTH = (
+    r'\b(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|'
+    r'aug(?:ust)?|sept?(?:ember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\b\.?\s*'
+)
+
 _EXP_DATE_RANGE_RE = re.compile(
-    r'(?:(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s*)?'
+    r'(?:' + _EXP_MONTH + r')?'
     r'(\d{4})'
     r'\s*[-\u2013\u2014to]+\s*'
     r'(?:(present|current|till\s*date|now|ongoing)|'
-    r'(?:(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?\s*)?(\d{4}))',
+    r'(?:' + _EXP_MONTH + r')?(\d{4}))',
     re.IGNORECASE
 )
 
 
-def _find_highest_education_end_year(text: str) -> tuple[int, bool]:
-    """
-    Returns (latest_education_end_year, is_distance_education).
-    is_distance_education=True means the highest degree was done via distance/online
-    and therefore full-time work during those years is still valid.
-    """
-    text = (text or "").replace('\r\n', '\n').replace('\r', '\n')
-    lines = text.split('\n')
-    current_year = datetime.now().year
+# ---------------------------------------------------------------------------
+# SINGLE-PASS WORK TIMELINE
+#
+# The old flow walked every line twice with the five compiled regexes above
+# (_find_highest_education_end_year() inside _extract_full_time_experience()),
+# then the fallbacks rescanned the whole text again with DATE_RANGE_REGEX and
+# four more year-only patterns. It also threw away the month that the range
+# regex had already matched, so "Jul 2019 - Mar 2021" counted as 2 years.
+#
+# extract_work_timeline() now does ONE streaming pass: it tracks the current
+# section, flags each line once, and emits every date range as a typed span
+# with its start/end month. Experience years, the education end year and
+# career gaps are all derived from that one structure. The result is
+# immutable and memoized per (text, current month), so scoring, previews and
+# any later re-read of the same resume don't redo the regex work.
+#
+# Only a span with a month on both ends ("Present" counts as this month)
+# is measured in months, and its end month is inclusive: "Jan 2020 - Dec
+# 2020" is 12 months. Any other span ("2018 - 2020", "Sept 2019 - 2020")
+# keeps the old year arithmetic, so it scores exactly as before, and is
+# never used to place a career gap.
+# ---------------------------------------------------------------------------
+@dataclass(frozen=True)
+class TimelineSpan:
+    start_year: int
+    start_month: int
+    end_year: int
+    end_month: int
+    is_current: bool = False
+    has_months: bool = False
+    is_intern: bool = False
+    is_distance: bool = False
+    in_education_section: bool = False
+    is_education_line: bool = False
+
+    @property
+    def start(self) -> int:
+        return self.start_year * 12 + self.start_month
+
+    @property
+    def end(self) -> int:
+        return self.end_year * 12 + self.end_month + int(self.has_months)
+
+    @property
+    def months(self) -> int:
+        return max(0, self.end - self.start)
+
+
+@dataclass(frozen=True)
+class WorkTimeline:
+    spans: tuple[TimelineSpan, ...] = ()
+    education_end_year: int = 0
+    distance_education: bool = False
+    current_year: int = 0
+
+    @property
+    def full_time_roles(self) -> tuple[TimelineSpan, ...]:
+        """Spans that count as full-time, post-education work — the same
+        rules the old line scanner applied, evaluated on the stored flags."""
+        roles = []
+        for s in self.spans:
+            if s.is_education_line and not s.is_distance:
+                continue
+            if s.in_education_section and not self.distance_education:
+                continue
+            if s.is_intern:
+                continue
+            if not (1975 <= s.start_year <= self.current_year + 1):
+                continue
+            if s.end_year < s.start_year:
+                continue
+            # Only count experience that starts after (or very near)
+            # graduation; allow 1 year overlap for final-year joins. Distance
+            # education allows concurrent full-time work.
+            if (
+                self.education_end_year > 0
+                and not self.distance_education
+                and s.start_year < self.education_end_year - 1
+            ):
+                continue
+            roles.append(s)
+        return tuple(roles)
+
+    def full_time_years(self) -> float:
+        months = _merged_months(self.full_time_roles)
+        return round(min(max(months / 12, 0.0), 45.0), 1)
+
+    def gaps(self, min_months: int = 6) -> list[tuple[int, int, int, int, int]]:
+        """Breaks between merged full-time roles of at least `min_months`,
+        as (from_year, from_month, to_year, to_month, months)."""
+        roles = self.full_time_roles
+        merged = _merge_intervals(roles)
+        # Year-only ends carry a made-up month, so they can't bound a gap.
+        vague_ends = {s.end for s in roles if not s.has_months}
+        vague_starts = {s.start for s in roles if not s.has_months}
+        out = []
+        for (_, prev_end), (next_start, _) in zip(merged, merged[1:]):
+            if prev_end in vague_ends or next_start in vague_starts:
+                continue
+            gap = next_start - prev_end
+            if gap >= min_months:
+                out.append((
+                    (prev_end - 1) // 12, (prev_end - 1) % 12 + 1,
+                    (next_start - 1) // 12, (next_start - 1) % 12 + 1,
+                    gap,
+                ))
+        return out
+
+    def gap_summary(self, min_months: int = 6) -> str:
+        """Gaps as text for the results table, e.g. "Mar 2020 - Jan 2021 (10 mo)"."""
+        return "; ".join(
+            f"{_MONTH_LABELS[fm - 1]} {fy} - {_MONTH_LABELS[tm - 1]} {ty} ({months} mo)"
+            for fy, fm, ty, tm, months in self.gaps(min_months)
+        )
 
-    in_education = False
-    highest_end = 0
-    is_distance = False
 
-    for raw in lines:
-        line = raw.strip()
-        if not line:
-            continue
+_MONTH_LABELS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
 
-        if _EXP_EDU_SECTION_HEADER.match(line):
-            in_education = True
-            continue
-        if _EXP_WORK_SECTION_HEADER.match(line):
-            in_education = False
-            continue
 
-        if not (in_education or _EXP_EDU_CONTENT_LINE.search(line)):
-            continue
+def _merge_intervals(spans) -> list[list[int]]:
+    intervals = sorted({(s.start, s.end) for s in spans if s.end > s.start})
+    merged: list[list[int]] = []
+    for start, end in intervals:
+        if not merged or start > merged[-1][1]:
+            merged.append([start, end])
+        else:
+            merged[-1][1] = max(merged[-1][1], end)
+    return merged
 
-        # Check if this education entry is distance/online
-        if _EXP_DISTANCE_EDU.search(line):
-            is_distance = True
 
-        for m in _EXP_DATE_RANGE_RE.finditer(line):
-            start_match = re.search(r'\d{4}', m.group(1) or "")
-            if not start_match:
-                continue
-            start_yr = int(start_match.group())
-            if not (1985 <= start_yr <= current_year + 1):
-                continue
+def _merged_months(spans) -> int:
+    return sum(end - start for start, end in _merge_intervals(spans))
 
-            if m.group(2):  # present
-                end_yr = current_year
-            else:
-                end_match = re.search(r'\d{4}', m.group(3) or "")
-                if not end_match:
-                    continue
-                end_yr = int(end_match.group())
 
-            if end_yr >= start_yr:
-                if end_yr > highest_end:
-                    highest_end = end_yr
-                    # re-check distance on the winning line
-                    is_distance = bool(_EXP_DISTANCE_EDU.search(line))
+def _month_number(token: str | None, default: int) -> int:
+    return MONTH_MAP.get((token or "")[:3].lower(), default)
 
-    return highest_end, is_distance
 
-
-def _extract_full_time_experience(resume_text: str) -> float:
-    """
-    Strict full-time + post-education experience.
-    - Ignores internships / traineeships
-    - Cuts everything before highest education end year
-      (unless that education was distance/online → then concurrent work is allowed)
-    """
-    text = (resume_text or "").replace('\r\n', '\n').replace('\r', '\n')
-    lines = text.split('\n')
-    current_year = datetime.now().year
-
-    edu_end_year, is_distance_edu = _find_highest_education_end_year(text)
+@lru_cache(maxsize=512)
+def _build_work_timeline(text: str, current_year: int, current_month: int) -> WorkTimeline:
+    lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
 
     in_education = False
-    ft_ranges: list[tuple[int, int]] = []
-    seen: set[tuple[int, int]] = set()
+    highest_end = 0
+    is_distance = False
+    intern_flags: list[bool] = []
+    pending: list[tuple[int, dict]] = []
 
-    for i, raw_line in enumerate(lines):
-        line = raw_line.strip()
+    for i, raw in enumerate(lines):
+        line = raw.strip()
+        intern_flags.append(bool(line) and bool(_EXP_INTERN_SIGNALS.search(line)))
         if not line:
             continue
 
@@ -924,63 +1011,83 @@ def _extract_full_time_experience(resume_text: str) -> float:
             in_education = False
             continue
 
-        # Skip pure education content lines
-        if _EXP_EDU_CONTENT_LINE.search(line) and not _EXP_DISTANCE_EDU.search(line):
-            continue
-
-        if in_education and not is_distance_edu:
-            continue
-
-        # 3-line context for internship signals
-        context = ' '.join(l.strip() for l in lines[max(0, i-1):i+2])
-        if _EXP_INTERN_SIGNALS.search(context):
-            continue
+        edu_line = bool(_EXP_EDU_CONTENT_LINE.search(line))
+        distance_line = bool(_EXP_DISTANCE_EDU.search(line))
+        education_like = in_education or edu_line
+        if education_like and distance_line:
+            is_distance = True
 
         for m in _EXP_DATE_RANGE_RE.finditer(line):
-            start_match = re.search(r'\d{4}', m.group(1) or "")
-            if not start_match:
-                continue
-            start_yr = int(start_match.group())
-            if not (1975 <= start_yr <= current_year + 1):
-                continue
-
-            if m.group(2):
-                end_yr = current_year
+            start_month, start_yr, present, end_month, end_yr = m.groups()
+            start_yr = int(start_yr)
+            end_yr = current_year if present else int(end_yr)
+            has_months = bool(start_month) and bool(present or end_month)
+            if not has_months:
+                start_mo = end_mo = 1
             else:
-                end_match = re.search(r'\d{4}', m.group(3) or "")
-                if not end_match:
-                    continue
-                end_yr = int(end_match.group())
+                start_mo = _month_number(start_month, 1)
+                end_mo = current_month if present else _month_number(end_month, 1)
+
+            if (
+                education_like
+                and 1985 <= start_yr <= current_year + 1
+                and end_yr >= start_yr
+                and end_yr > highest_end
+            ):
+                highest_end = end_yr
+                # the winning degree decides whether concurrent work counts
+                is_distance = distance_line
+
+            pending.append((i, {
+                "start_year": start_yr,
+                "start_month": start_mo,
+                "end_year": end_yr,
+                "end_month": end_mo,
+                "is_current": bool(present),
+                "has_months": has_months,
+                "is_distance": distance_line,
+                "in_education_section": in_education,
+                "is_education_line": edu_line,
+            }))
+
+    # Internship signals look one line either side of the range, so they are
+    # resolved after the pass from the per-line flags instead of re-searching.
+    spans = tuple(
+        TimelineSpan(is_intern=any(intern_flags[max(0, i - 1):i + 2]), **fields)
+        for i, fields in pending
+    )
+    return WorkTimeline(
+        spans=spans,
+        education_end_year=highest_end,
+        distance_education=is_distance,
+        current_year=current_year,
+    )
 
-            if end_yr < start_yr:
-                continue
 
-            # ---------- POST-EDUCATION RULE ----------
-            if edu_end_year > 0 and not is_distance_edu:
-                # Only count experience that starts after (or very near) graduation
-                if start_yr < edu_end_year - 1:          # allow 1 year overlap for final-year joins
-                    continue
-            # If distance education → we allow concurrent full-time work
+def extract_work_timeline(text: str) -> WorkTimeline:
+    """Segment the resume once and return its typed date-range timeline."""
+    now = datetime.now()
+    return _build_work_timeline(text or "", now.year, now.month)
 
-            key = (start_yr, end_yr)
-            if key not in seen:
-                seen.add(key)
-                ft_ranges.append((start_yr, end_yr))
 
-    if not ft_ranges:
-        return 0.0
+def _find_highest_education_end_year(text: str) -> tuple[int, bool]:
+    """
+    Returns (latest_education_end_year, is_distance_education).
+    is_distance_education=True means the highest degree was done via distance/online
+    and therefore full-time work during those years is still valid.
+    """
+    timeline = extract_work_timeline(text)
+    return timeline.education_end_year, timeline.distance_education
 
-    # Merge overlapping ranges
-    ft_ranges.sort()
-    merged = []
-    for s, e in ft_ranges:
-        if not merged or s > merged[-1][1]:
-            merged.append([s, e])
-        else:
-            merged[-1][1] = max(merged[-1][1], e)
 
-    total_years = sum(e - s for s, e in merged)
-    return round(min(max(total_years, 0.0), 45.0), 1)
+def _extract_full_time_experience(resume_text: str) -> float:
+    """
+    Strict full-time + post-education experience.
+    - Ignores internships / traineeships
+    - Cuts everything before highest education end year
+      (unless that education was distance/online → then concurrent work is allowed)
+    """
+    return extract_work_timeline(resume_text).full_time_years()
 
 
 def extract_experience(text: str) -> float:
@@ -988,20 +1095,40 @@ def extract_experience(text: str) -> float:
     Extract FULL-TIME, post-education work experience in years.
 
     Priority:
-      1. Strict section + education-end-year + distance-aware scan (new)
+      1. Strict section + education-end-year + distance-aware timeline
       2. Explicit "X years of experience" statement
-      3. Broad fallback (last resort)
+      3. Broad fallback over every date range in the text (last resort)
+
+    Company names that start like a month are not read as months:
+
+    >>> extract_experience("Novartis 2018 - 2020")
+    2.0
+    >>> extract_experience("Marketing 2019 - 2021")
+    2.0
+    >>> extract_experience("Deccan Chronicle 2016 - 2019")
+    3.0
+    >>> extract_experience("Junior Analyst, Mayfair Marketing 2015 - 2020")
+    5.0
+    >>> extract_experience("Analyst Jul 2019 - Mar 2021")
+    1.8
+    >>> extract_experience("Engineer 2019 till 2022")
+    3.9
+
+    A range with a month on only one end keeps year arithmetic:
+
+    >>> extract_experience("Acme Sept 2019 - 2020")
+    1.0
     """
     if not text:
         return 0.0
 
-    lower = text.lower()
-
     # 1. Smart full-time + post-edu pass
-    ft_years = _extract_full_time_experience(text)
+    ft_years = extract_work_timeline(text).full_time_years()
     if ft_years > 0:
         return ft_years
 
+    lower = text.lower()
+
     # 2. Explicit statement
     explicit = explicit_years_of_experience(lower)
     if explicit > 0:
@@ -1018,6 +1145,18 @@ def extract_experience(text: str) -> float:
 
     return 0.0
 
+
+def career_gaps(text: str) -> str:
+    r"""Breaks of six months or more between full-time roles. Only ranges
+    with months on both sides can bound a gap:
+
+    >>> career_gaps("Acme\n2018 - 2020\nBeta\n2021 - 2023")
+    ''
+    >>> career_gaps("Acme\nJan 2015 - Mar 2018\nBeta\nJan 2019 - Dec 2021")
+    'Apr 2018 - Jan 2019 (9 mo)'
+    """
+    return extract_work_timeline(text or "").gap_summary()
+
 # ---------------------------------------------------------------------------
 # KEYWORD EXTRACTION
 # ---------------------------------------------------------------------------
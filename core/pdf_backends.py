@@ -0,0 +1,276 @@
+import difflib
+import re
+import sys
+import threading
+import time
+from io import BytesIO, StringIO
+from itertools import islice
+from pathlib import Path
+
+try:
+    import pypdfium2 as pdfium
+except Exception:
+    pdfium = None
+try:
+    from pdfminer.converter import TextConverter
+    from pdfminer.layout import LAParams
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdftypes import resolve1
+except Exception:
+    PDFPage = None
+try:
+    import pdfplumber
+except Exception:
+    pdfplumber = None
+
+
+# ---------------------------------------------------------------------------
+# PLUGGABLE PDF TEXT BACKENDS
+#
+# Every PDF used to go through pdfplumber, which builds a full character /
+# rect / curve object model for each page before it can hand back a single
+# line of text. For text-layer resumes that model is thrown away, and it
+# was the single biggest CPU cost in PASS 1.
+#
+# Text now comes from the fastest backend that is installed:
+#
+#   pypdfium2   PDFium's own text layer (C++). Both it and pdfminer.six are
+#               already pulled in by pdfplumber, so no new requirement.
+#   pdfminer    text-only conversion: no pdfplumber object model on top.
+#   pdfplumber  the old path, kept as the fallback.
+#
+# ocr.py re-reads with pdfplumber only the pages where the fast backend's
+# text fails _extraction_quality_ok() or looks like a table read one cell
+# per line (looks_tabular()), so layouts PDFium reads in a poor order still
+# get pdfplumber's line clustering before anything goes to OCR.
+#
+# Every backend returns (page_texts, total_pages) for at most `max_pages`
+# pages, reading them in order and stopping early as soon as the optional
+# `should_stop(page_texts_so_far)` callback returns True.
+#
+# Run `python -m core.pdf_backends <folder-of-pdfs>` to benchmark them
+# against pdfplumber on a real corpus.
+# ---------------------------------------------------------------------------
+PDF_BACKEND_ORDER = ("pypdfium2", "pdfminer", "pdfplumber")
+
+# PDFium is not thread-safe and PASS 1 reads files on a thread pool.
+_PDFIUM_LOCK = threading.Lock()
+
+
+def _normalize_newlines(text: str) -> str:
+    return (text or "").replace("\r\n", "\n").replace("\r", "\n").strip()
+
+
+def _pypdfium2_pages(data: bytes, max_pages: int, should_stop=None) -> tuple[list[str], int]:
+    texts = []
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(data)
+        try:
+            total = len(pdf)
+            for index in range(min(total, max_pages)):
+                page = pdf[index]
+                textpage = page.get_textpage()
+                try:
+                    texts.append(_normalize_newlines(textpage.get_text_range()))
+                finally:
+                    textpage.close()
+                    page.close()
+                if should_stop is not None and should_stop(texts):
+                    break
+        finally:
+            pdf.close()
+    return texts, total
+
+
+def _pdfminer_page_count(document) -> int:
+    """Page count from the page tree root, without parsing any page."""
+    try:
+        return int(resolve1(resolve1(document.catalog["Pages"]).get("Count", 0)))
+    except Exception:
+        return 0
+
+
+def _pdfminer_pages(data: bytes, max_pages: int, should_stop=None) -> tuple[list[str], int]:
+    resources = PDFResourceManager(caching=True)
+    laparams = LAParams()
+    document = PDFDocument(PDFParser(BytesIO(data)))
+    texts = []
+    # create_pages() is lazy: pages past the budget or the early stop are
+    # never parsed.
+    for page in islice(PDFPage.create_pages(document), max_pages):
+        out = StringIO()
+        device = TextConverter(resources, out, laparams=laparams)
+        try:
+            PDFPageInterpreter(resources, device).process_page(page)
+        finally:
+            device.close()
+        texts.append(_normalize_newlines(out.getvalue()))
+        if should_stop is not None and should_stop(texts):
+            break
+    return texts, max(_pdfminer_page_count(document), len(texts))
+
+
+def _pdfplumber_pages(data: bytes, max_pages: int, should_stop=None) -> tuple[list[str], int]:
+    texts = []
+    with pdfplumber.open(BytesIO(data)) as pdf:
+        total = len(pdf.pages)
+        for page in pdf.pages[:max_pages]:
+            texts.append((page.extract_text() or "").strip())
+            if should_stop is not None and should_stop(texts):
+                break
+    return texts, total
+
+
+def _available() -> dict:
+    backends = {}
+    if pdfium is not None:
+        backends["pypdfium2"] = _pypdfium2_pages
+    if PDFPage is not None:
+        backends["pdfminer"] = _pdfminer_pages
+    if pdfplumber is not None:
+        backends["pdfplumber"] = _pdfplumber_pages
+    return backends
+
+
+PDF_BACKENDS = _available()
+
+
+def fast_backend() -> str | None:
+    """Name of the preferred installed backend, or None if none is."""
+    for name in PDF_BACKEND_ORDER:
+        if name in PDF_BACKENDS:
+            return name
+    return None
+
+
+def extract_pdf_page_texts(
+    data: bytes, max_pages: int, backend: str | None = None, should_stop=None
+) -> tuple[list[str], int, str]:
+    """Text of the first `max_pages` pages (fewer if `should_stop` ends the
+    read). Returns (page_texts, total_pages, backend_used). If the chosen
+    backend can't open the file, the next one in PDF_BACKEND_ORDER is tried;
+    the last error is raised if all fail."""
+    order = [backend] if backend else []
+    order += [name for name in PDF_BACKEND_ORDER if name not in order]
+
+    last_error = None
+    for name in order:
+        reader = PDF_BACKENDS.get(name)
+        if reader is None:
+            continue
+        try:
+            texts, total = reader(data, max_pages, should_stop)
+            return texts, total, name
+        except Exception as exc:
+            print(f"[pdf_backends] {name} failed: {exc}")
+            last_error = exc
+    if last_error is not None:
+        raise last_error
+    raise RuntimeError("No PDF text backend is installed.")
+
+
+# Fast backends read a ruled table column by column, one cell per line,
+# which scatters a "Company | Role | Dates" row across the page.
+# pdfplumber clusters words into lines by position and keeps the row
+# together.
+TABULAR_MIN_LINES = 12
+TABULAR_SHORT_LINE_RATIO = 0.6
+
+
+def looks_tabular(text: str) -> bool:
+    """True if most lines are one or two words, as in table cells."""
+    lines = [line for line in (text or "").splitlines() if line.strip()]
+    if len(lines) < TABULAR_MIN_LINES:
+        return False
+    short = sum(1 for line in lines if len(line.split()) <= 2)
+    return short / len(lines) >= TABULAR_SHORT_LINE_RATIO
+
+
+def pdfplumber_page_texts(data: bytes, pages) -> dict[int, str]:
+    """Re-read specific 1-based pages with pdfplumber (the fallback)."""
+    pages = sorted(set(pages))
+    if pdfplumber is None or not pages:
+        return {}
+    with pdfplumber.open(BytesIO(data)) as pdf:
+        return {
+            number: (pdf.pages[number - 1].extract_text() or "").strip()
+            for number in pages
+            if number <= len(pdf.pages)
+        }
+
+
+# ---------------------------------------------------------------------------
+# Benchmark: pages/second per backend, and how often each backend's text is
+# equivalent to pdfplumber's (same words in the same order, ignoring
+# whitespace) at EQUIVALENCE_THRESHOLD or better.
+# ---------------------------------------------------------------------------
+EQUIVALENCE_THRESHOLD = 0.9
+
+
+def _words(text: str) -> list[str]:
+    return re.findall(r"\w+", (text or "").lower())
+
+
+def text_similarity(a: str, b: str) -> float:
+    wa, wb = _words(a), _words(b)
+    if not wa and not wb:
+        return 1.0
+    return difflib.SequenceMatcher(None, wa, wb, autojunk=False).ratio()
+
+
+def benchmark_pdf_backends(folder, max_pages: int = 8) -> dict[str, dict]:
+    paths = sorted(Path(folder).rglob("*.pdf"))
+    stats = {
+        name: {"files": 0, "pages": 0, "seconds": 0.0, "equivalent_pages": 0, "errors": 0}
+        for name in PDF_BACKENDS
+    }
+
+    for path in paths:
+        data = path.read_bytes()
+        outputs = {}
+        for name, reader in PDF_BACKENDS.items():
+            started = time.perf_counter()
+            try:
+                texts, _total = reader(data, max_pages)
+            except Exception as exc:
+                print(f"[benchmark] {name} failed on {path.name}: {exc}")
+                stats[name]["errors"] += 1
+                continue
+            stats[name]["seconds"] += time.perf_counter() - started
+            stats[name]["files"] += 1
+            stats[name]["pages"] += len(texts)
+            outputs[name] = texts
+
+        reference = outputs.get("pdfplumber")
+        if reference is None:
+            continue
+        for name, texts in outputs.items():
+            stats[name]["equivalent_pages"] += sum(
+                1
+                for ours, theirs in zip(texts, reference)
+                if text_similarity(ours, theirs) >= EQUIVALENCE_THRESHOLD
+            )
+
+    for row in stats.values():
+        row["pages_per_second"] = round(row["pages"] / row["seconds"], 1) if row["seconds"] else 0.0
+        row["equivalence_rate"] = (
+            round(row["equivalent_pages"] / row["pages"], 3) if row["pages"] else 0.0
+        )
+    return stats
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("usage: python -m core.pdf_backends <folder-of-pdfs> [max_pages]")
+        sys.exit(2)
+    max_pages = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    results = benchmark_pdf_backends(sys.argv[1], max_pages=max_pages)
+    print(f"{'backend':<12} {'files':>6} {'pages':>6} {'pages/s':>9} {'equiv':>7} {'errors':>7}")
+    for name, row in results.items():
+        print(
+            f"{name:<12} {row['files']:>6} {row['pages']:>6} "
+            f"{row['pages_per_second']:>9} {row['equivalence_rate']:>7.1%} {row['errors']:>7}"
+        )
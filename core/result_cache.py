@@ -0,0 +1,154 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+
+from .constants import CACHE_DIR
+from .local_db import connect, evict_lru
+
+
+# ---------------------------------------------------------------------------
+# SCORED-RESULT CACHE — re-screens without re-scoring.
+#
+# Recruiters re-run the same upload set against the same JD all the time
+# (after toggling a preview, re-opening the tab, a restart mid-batch).
+# Every re-run paid for the whole pipeline again: OCR, embeddings, the
+# name LLM, AI scoring, plus the JD's own role and requirements calls.
+#
+# Scored rows now go into a content-addressed cache next to the
+# extraction cache, which also serves as the per-file checkpoint for
+# interrupted runs and screening jobs:
+#
+#   - scored rows are keyed by the sha256 of the file bytes, the file name
+#     (name and industry detection fall back to it) and the run
+#     fingerprint: a hash of everything score_resume() sees besides the
+#     resume — JD, role, keywords, JD requirements, floors, client
+#     profile, model — plus the extractor, parser and scoring versions
+#     (EXTRACTOR_VERSION, PARSER_VERSION, SCORING_VERSION). A hit skips
+#     reading the file at all;
+#   - rows are stored as score_resume() left them, without the learning
+#     adjustments, which run_screening() re-applies on every run;
+#   - a row is written as soon as its file is scored, so a batch that
+#     died at resume 700 resumes at 701;
+#   - the JD analysis (role title and requirements, both LLM calls) is
+#     cached the same way, keyed by the JD text, role override and model.
+#
+# Bump the matching version whenever OCR/extraction, resume parsing or
+# scoring output changes; old entries stop matching and are evicted
+# least-recently-used once the file passes RESULT_CACHE_MAX_BYTES.
+# ---------------------------------------------------------------------------
+RESULT_CACHE_PATH = Path(CACHE_DIR) / "result_cache.sqlite3"
+RESULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scored_rows (
+    cache_key   TEXT PRIMARY KEY,
+    row         TEXT NOT NULL,
+    size_bytes  INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scored_rows_access
+    ON scored_rows (last_access);
+CREATE TABLE IF NOT EXISTS jd_analysis (
+    cache_key    TEXT PRIMARY KEY,
+    role         TEXT NOT NULL,
+    requirements TEXT NOT NULL,
+    last_access  REAL NOT NULL
+);
+"""
+
+_LOOKUP_CHUNK = 500
+
+
+def _db():
+    return connect(RESULT_CACHE_PATH, _SCHEMA)
+
+
+def run_fingerprint(**config) -> str:
+    """Stable hash of a run's scoring inputs (JSON-serialisable values)."""
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def result_key(file_hash: str, file_name: str, fingerprint: str) -> str:
+    return f"{file_hash}:{fingerprint}:{file_name}"
+
+
+def get_scored_rows(keys: list[str]) -> dict[str, dict]:
+    """Cached rows for whichever of `keys` are present."""
+    found = {}
+    try:
+        conn = _db()
+        for start in range(0, len(keys), _LOOKUP_CHUNK):
+            chunk = keys[start:start + _LOOKUP_CHUNK]
+            for row in conn.execute(
+                f"SELECT cache_key, row FROM scored_rows WHERE cache_key IN ({', '.join('?' for _ in chunk)})",
+                chunk,
+            ):
+                found[row["cache_key"]] = json.loads(row["row"])
+        if found:
+            now = time.time()
+            with conn:
+                conn.executemany(
+                    "UPDATE scored_rows SET last_access = ? WHERE cache_key = ?",
+                    [(now, key) for key in found],
+                )
+    except Exception as e:
+        print(f"[result_cache] read failed: {e}")
+        return {}
+    return found
+
+
+def put_scored_row(key: str, row: dict) -> None:
+    try:
+        payload = json.dumps(row, default=str)
+        conn = _db()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO scored_rows (cache_key, row, size_bytes, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload), time.time()),
+            )
+        _evict_if_needed(conn)
+    except Exception as e:
+        print(f"[result_cache] write failed: {e}")
+
+
+def _evict_if_needed(conn, max_bytes: int = RESULT_CACHE_MAX_BYTES) -> None:
+    evicted = evict_lru(conn, "scored_rows", max_bytes)
+    if not evicted:
+        return
+    with conn:
+        conn.execute(
+            "DELETE FROM jd_analysis WHERE last_access < "
+            "(SELECT COALESCE(MIN(last_access), 0) FROM scored_rows)"
+        )
+    print(f"[result_cache] evicted {evicted} entries")
+
+
+def get_jd_analysis(key: str) -> tuple[str, dict] | None:
+    try:
+        conn = _db()
+        row = conn.execute(
+            "SELECT role, requirements FROM jd_analysis WHERE cache_key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        with conn:
+            conn.execute("UPDATE jd_analysis SET last_access = ? WHERE cache_key = ?", (time.time(), key))
+        return row["role"], json.loads(row["requirements"])
+    except Exception as e:
+        print(f"[result_cache] read failed: {e}")
+        return None
+
+
+def put_jd_analysis(key: str, role: str, requirements: dict) -> None:
+    try:
+        conn = _db()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO jd_analysis (cache_key, role, requirements, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, role, json.dumps(requirements or {}, default=str), time.time()),
+            )
+    except Exception as e:
+        print(f"[result_cache] write failed: {e}")
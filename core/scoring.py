@@ -3,6 +3,7 @@ import re
 from .parser import (
     extract_email,
     extract_education_level,
+    career_gaps,
     extract_experience,
     extract_name,
     extract_phone,
@@ -280,6 +281,11 @@ def verdict_from_score(score: float) -> str:
 # ---------------------------------------------------------------------------
 # MAIN SCORING FUNCTION
 # ---------------------------------------------------------------------------
+# Bump whenever a change here alters scored rows, so the persistent result
+# cache (result_cache.py) stops serving rows scored by the old logic.
+SCORING_VERSION = "2"
+
+
 def score_resume(
     jd_text: str,
     role: str,
@@ -458,6 +464,7 @@ def score_resume(
         "Email": email,
         "Phone": phone,
         "Experience": exp,
+        "Career Gaps": career_gaps(resume_text),
         "Education": resume_edu_qual or "Not detected",
         "Keyword Score": kw_score,
         "Semantic Score": round(semantic_sc, 1),
@@ -1,23 +1,38 @@
-from typing import Dict, Tuple, Optional, List
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Tuple, Optional, List
 
 import pandas as pd
-import streamlit as st
 
-from core.ocr import read_uploaded_file
+from core.ocr import EXTRACTOR_VERSION, extract_uploaded_file
 from core.parser import (
+    PARSER_VERSION,
     detect_role_title,
     extract_jd_requirements_ai,
     extract_keywords,
     parse_min_experience,
     parse_required_education_level,
 )
-from core.scoring import score_resume, verdict_from_score
+from core.scoring import SCORING_VERSION, score_resume, verdict_from_score
 from core.history import load_history, save_history
+from core.learning_state import (
+    NEGATIVE_FEEDBACK,
+    POSITIVE_FEEDBACK,
+    learning_snapshot,
+    needs_rebuild,
+    rebuild_learning,
+)
 from core.semantic import semantic_similarity_scores_batch
+from core.extraction_cache import content_hash
+from core.result_cache import (
+    get_jd_analysis,
+    get_scored_rows,
+    put_jd_analysis,
+    put_scored_row,
+    result_key,
+    run_fingerprint,
+)
 
 
-POSITIVE_FEEDBACK = {"Interviewed", "Shortlisted", "Hired"}
-NEGATIVE_FEEDBACK = {"Rejected", "Do Not Consider"}
 DECIDED_FEEDBACK = POSITIVE_FEEDBACK | NEGATIVE_FEEDBACK
 
 
@@ -36,84 +51,22 @@ def get_learning_adjustments(user_key: str, client_company: str = ""):
     }
 
     try:
-        hist = load_history(user_key)
-    except Exception:
+        if needs_rebuild(user_key):
+            rebuild_learning(load_history(user_key), user_key)
+        state = learning_snapshot(user_key, client_company)
+    except Exception as e:
+        print(f"[get_learning_adjustments] learning state unavailable: {e}")
         return candidate_memory, client_bias, learned_profile
 
-    if hist is None or hist.empty:
-        return candidate_memory, client_bias, learned_profile
+    candidate_memory = state["candidate_memory"]
 
-    hist = hist.copy()
-    if "Feedback" not in hist.columns:
-        hist["Feedback"] = "Pending"
-    hist["Feedback"] = hist["Feedback"].fillna("Pending").astype(str).str.strip()
-
-    if "Profile Key" in hist.columns:
-        for _, row in hist.iterrows():
-            pk = _safe_str(row.get("Profile Key", ""))
-            fb = _safe_str(row.get("Feedback", "Pending"))
-            if pk and fb != "Pending":
-                candidate_memory[pk] = {
-                    "feedback": fb,
-                    "role": _safe_str(row.get("Role", "")),
-                    "client": _safe_str(row.get("Client", "")),
-                    "verdict": _safe_str(row.get("Verdict", "")),
-                    "industry": _safe_str(row.get("Candidate Industry", "")),
-                    "experience": row.get("Experience", None),
-                    "matched_keywords": _safe_str(row.get("Matched Keywords", "")),
-                }
-
-    if client_company and "Client" in hist.columns:
-        client_hist = hist[
-            hist["Client"].astype(str).str.lower() == client_company.strip().lower()
-        ].copy()
-    else:
-        client_hist = hist.copy()
-
-    if not client_hist.empty:
-        positive = int(client_hist["Feedback"].isin(POSITIVE_FEEDBACK).sum())
-        negative = int(client_hist["Feedback"].isin(NEGATIVE_FEEDBACK).sum())
-        total_decided = positive + negative
-
-        # Milder client bias (was *6)
-        if total_decided >= 3:
-            client_bias = round(((positive - negative) / total_decided) * 4.5, 2)
-
-        positive_hist = client_hist[client_hist["Feedback"].isin(POSITIVE_FEEDBACK)].copy()
-
-        if not positive_hist.empty:
-            if "Candidate Industry" in positive_hist.columns:
-                industry_counts = (
-                    positive_hist["Candidate Industry"]
-                    .fillna("")
-                    .astype(str)
-                    .str.strip()
-                    .replace("", pd.NA)
-                    .dropna()
-                    .value_counts()
-                )
-                learned_profile["preferred_industries"] = industry_counts.head(5).index.tolist()
-
-            if "Experience" in positive_hist.columns:
-                exp_series = pd.to_numeric(
-                    positive_hist["Experience"], errors="coerce"
-                ).dropna()
-                if not exp_series.empty:
-                    learned_profile["min_experience_hint"] = round(
-                        float(exp_series.quantile(0.25)), 1
-                    )
-                    learned_profile["max_experience_hint"] = round(
-                        float(exp_series.quantile(0.75)), 1
-                    )
+    total_decided = state["positive"] + state["negative"]
+    # Milder client bias (was *6)
+    if total_decided >= 3:
+        client_bias = round(((state["positive"] - state["negative"]) / total_decided) * 4.5, 2)
 
-            if "Matched Keywords" in positive_hist.columns:
-                keywords = []
-                for text in positive_hist["Matched Keywords"].fillna("").astype(str):
-                    keywords.extend([k.strip() for k in text.split(",") if k.strip()])
-                if keywords:
-                    learned_profile["good_fit_keywords"] = (
-                        pd.Series(keywords).value_counts().head(10).index.tolist()
-                    )
+    for field in learned_profile:
+        learned_profile[field] = state[field]
 
     return candidate_memory, client_bias, learned_profile
 
@@ -198,6 +151,54 @@ def _required_education_from_jd(jd_requirements: dict) -> Tuple[int, str]:
     return level, required_edu_label
 
 
+INGEST_WORKERS = 4
+INGEST_CHUNK_SIZE = 32
+
+
+# Candidates whose base verdict lands here are worth a full read when the
+# first (lazy) read stopped early — pages past the early stop could move
+# them either way.
+FULL_READ_VERDICTS = {"Review"}
+
+
+def _load_source(file) -> Tuple[bytes, str, str]:
+    """(bytes, content hash, error) for one upload."""
+    try:
+        data = file.getvalue()
+    except Exception as e:
+        return b"", "", str(e)
+    return data, content_hash(data), ""
+
+
+def _analyse_jd(jd_text: str, role_input: str, api_key: str, model: str) -> Tuple[str, dict]:
+    """Role title and AI requirements for the JD. With an AI key both are
+    LLM calls, so successful results are kept in the result cache."""
+    role_override = (role_input or "").strip()
+    if not api_key:
+        return role_override or detect_role_title(jd_text, role_input, api_key, model), {}
+
+    model = model or "gpt-4o-mini"
+    key = "jd:" + run_fingerprint(
+        jd_text=jd_text, role_input=role_override, model=model, scoring_version=SCORING_VERSION
+    )
+    cached = get_jd_analysis(key)
+    if cached is not None:
+        return cached
+
+    role = role_override or detect_role_title(jd_text, role_input, api_key, model)
+    jd_req = extract_jd_requirements_ai(jd_text, api_key, model)
+    if jd_req:
+        put_jd_analysis(key, role, jd_req)
+    return role, jd_req
+
+
+def _read_source(file, data: bytes, digest: str, full_read: bool = False) -> Tuple[str, str, dict]:
+    try:
+        return extract_uploaded_file(file.name, data, full_read=full_read, digest=digest)
+    except Exception as e:
+        return "", str(e), {}
+
+
 def run_screening(
     uploads,
     jd_text: str,
@@ -211,29 +212,28 @@ def run_screening(
     max_exp: float = 15,
     preferred_industries: Optional[List[str]] = None,
     save_results: bool = False,
+    progress: Optional[Callable[[float, str], None]] = None,
 ):
+    """Screen `uploads` against the JD. Returns (results, read_errors).
+
+    `progress(fraction, stage)` is called as the batch advances. Each row
+    is checkpointed to the result cache as soon as it's scored, so running
+    the same batch again after an interruption only reads and scores the
+    files that were missing.
+    """
     read_errors = []
     preferred_industries = preferred_industries or []
+    report = progress or (lambda fraction, stage: None)
 
     if not uploads:
-        st.error("No resumes uploaded")
+        read_errors.append("No resumes uploaded")
         return pd.DataFrame(), read_errors
 
     candidate_memory, client_bias, learned_profile = get_learning_adjustments(
         user_key, client_company
     )
 
-    role = (
-        role_input.strip()
-        if role_input and role_input.strip()
-        else detect_role_title(jd_text, role_input, api_key, model)
-    )
-
-    jd_req = (
-        extract_jd_requirements_ai(jd_text, api_key, model or "gpt-4o-mini")
-        if api_key
-        else {}
-    )
+    role, jd_req = _analyse_jd(jd_text, role_input, api_key, model)
 
     jd_min_exp = parse_min_experience(jd_text)
     effective_min_exp = jd_min_exp if jd_min_exp > 0 else float(min_exp or 0)
@@ -265,65 +265,146 @@ def run_screening(
         "preferred_colleges": "",
     }
 
-    progress_bar = st.progress(0)
+    # Everything score_resume() sees besides the resume: files already
+    # scored under the same fingerprint come from the result cache.
+    fingerprint = run_fingerprint(
+        extractor_version=EXTRACTOR_VERSION,
+        parser_version=PARSER_VERSION,
+        scoring_version=SCORING_VERSION,
+        jd_text=jd_text,
+        role=role,
+        keywords=keywords,
+        min_exp=effective_min_exp,
+        jd_requirements=jd_req,
+        required_edu=required_edu_label,
+        required_edu_level=required_edu_level,
+        client_company=client_company,
+        client_profile=client_profile,
+        model=(model or "gpt-4o-mini") if api_key else "",
+    )
+
     total = len(uploads)
+    report(0.0, "Reading resumes")
 
     # ---------- PASS 1: read every file ----------
+    # Files are read in bounded chunks on a few threads. Each file's bytes
+    # are pulled and hashed once; the hash keys the result-cache lookup and
+    # is handed to the extractor (persistent cache / OCR pool) along with
+    # the bytes, which are dropped with the chunk so only the extracted
+    # text outlives it. Files with a cached scored row are never extracted.
+    # Entries are (file, text, extract_meta, digest, cache_key, cached_row).
     file_entries = []
-    for i, file in enumerate(uploads):
-        try:
-            text, read_error = read_uploaded_file(file.name, file.getvalue())
+    done = 0
+    with ThreadPoolExecutor(max_workers=INGEST_WORKERS) as pool:
+        for chunk_start in range(0, total, INGEST_CHUNK_SIZE):
+            chunk = uploads[chunk_start : chunk_start + INGEST_CHUNK_SIZE]
+            loaded = list(pool.map(_load_source, chunk))
+            keys = [
+                result_key(digest, file.name, fingerprint) if digest else ""
+                for file, (_, digest, _) in zip(chunk, loaded)
+            ]
+            cached = get_scored_rows([key for key in keys if key])
+            to_read = [
+                (file, data, digest)
+                for file, (data, digest, error), key in zip(chunk, loaded, keys)
+                if not error and key not in cached
+            ]
+            extracted = iter(pool.map(lambda item: _read_source(*item), to_read))
+            for file, (_, digest, load_error), key in zip(chunk, loaded, keys):
+                if key in cached:
+                    file_entries.append((file, "", {}, digest, key, cached[key]))
+                else:
+                    text, read_error, extract_meta = (
+                        ("", load_error, {}) if load_error else next(extracted)
+                    )
+                    if read_error:
+                        read_errors.append(f"{file.name}: {read_error}")
+                    elif not text.strip():
+                        read_errors.append(f"{file.name}: no readable text found")
+                    else:
+                        file_entries.append((file, text, extract_meta, digest, key, None))
 
-            if read_error:
-                read_errors.append(f"{file.name}: {read_error}")
-            elif not text.strip():
-                read_errors.append(f"{file.name}: no readable text found")
-            else:
-                file_entries.append((file, text))
-        except Exception as e:
-            read_errors.append(f"{file.name}: {e}")
+                done += 1
+                report(done / max(total, 1) * 0.4, f"Read {done} of {total} resume(s)")
 
-        progress_bar.progress((i + 1) / max(total, 1) * 0.4)
+    pending = [idx for idx, entry in enumerate(file_entries) if entry[5] is None]
 
     # ---------- Batch semantic scoring ----------
-    # Neutral default raised to 55 to match the less-harsh score_resume
+    # Neutral default raised to 55 to match the less-harsh score_resume.
+    # Cached rows already carry their score, so only the rest is embedded.
     semantic_scores = [55.0] * len(file_entries)
-    if api_key and file_entries:
+    semantic_failed = False
+    if api_key and pending:
         try:
-            semantic_scores = semantic_similarity_scores_batch(
-                resume_texts=[text for _, text in file_entries],
+            pending_scores = semantic_similarity_scores_batch(
+                resume_texts=[file_entries[idx][1] for idx in pending],
                 jd_text=jd_text,
                 api_key=api_key,
             )
+            for idx, score in zip(pending, pending_scores):
+                semantic_scores[idx] = score
         except Exception as e:
-            st.warning(f"Batch semantic scoring failed, using neutral scores: {e}")
+            read_errors.append(f"Batch semantic scoring failed, using neutral scores: {e}")
             semantic_scores = [55.0] * len(file_entries)
+            semantic_failed = True
 
     # ---------- PASS 2: score each resume ----------
     results = []
-    for idx, (file, text) in enumerate(file_entries):
+    for idx, (file, text, extract_meta, digest, cache_key, cached_row) in enumerate(file_entries):
         try:
-            row = score_resume(
-                jd_text=jd_text,
-                role=role,
-                resume_text=text,
-                filename=file.name,
-                keywords=keywords,
-                min_exp=effective_min_exp,
-                api_key=api_key or "",
-                model=model or "gpt-4o-mini",
-                jd_requirements=jd_req,
-                required_edu=required_edu_label,
-                required_edu_level=required_edu_level,
-                use_semantic=True,
-                use_llm_keywords=bool(api_key),
-                client_company=client_company,
-                client_profile=client_profile,
-                precomputed_semantic_score=semantic_scores[idx] if api_key else None,
-            )
+            def _score(resume_text: str, semantic_score: float) -> dict:
+                return score_resume(
+                    jd_text=jd_text,
+                    role=role,
+                    resume_text=resume_text,
+                    filename=file.name,
+                    keywords=keywords,
+                    min_exp=effective_min_exp,
+                    api_key=api_key or "",
+                    model=model or "gpt-4o-mini",
+                    jd_requirements=jd_req,
+                    required_edu=required_edu_label,
+                    required_edu_level=required_edu_level,
+                    use_semantic=True,
+                    use_llm_keywords=bool(api_key),
+                    client_company=client_company,
+                    client_profile=client_profile,
+                    precomputed_semantic_score=semantic_score if api_key else None,
+                )
 
-            row["Client"] = client_company
-            row["Role"] = role
+            if cached_row is not None:
+                row = dict(cached_row)
+            else:
+                row = _score(text, semantic_scores[idx])
+
+                # Borderline and only partly read: read the rest and re-score,
+                # re-embedding the full text so the semantic sub-score moves
+                # with it. The corrected row is the one cached below.
+                if (
+                    extract_meta.get("stopped_early")
+                    and row.get("Verdict") in FULL_READ_VERDICTS
+                ):
+                    full_text, full_error, full_meta = _read_source(
+                        file, file.getvalue(), digest, full_read=True
+                    )
+                    if not full_error and full_text.strip() and full_text != text:
+                        full_semantic = semantic_scores[idx]
+                        if api_key and not semantic_failed:
+                            full_semantic = semantic_similarity_scores_batch(
+                                resume_texts=[full_text], jd_text=jd_text, api_key=api_key
+                            )[0]
+                        row = _score(full_text, full_semantic)
+                        extract_meta = full_meta
+
+                row["Client"] = client_company
+                row["Role"] = role
+                row["OCR Pages"] = ", ".join(
+                    str(page) for page in extract_meta.get("ocr_pages", [])
+                )
+                # Rows degraded by a provider failure aren't cached, so the
+                # re-run after an outage scores them properly.
+                if cache_key and not semantic_failed and (row.get("AI Used") or not api_key):
+                    put_scored_row(cache_key, row)
 
             memory_adj, memory_note, learning_status = apply_candidate_memory(
                 pd.Series(row), candidate_memory
@@ -361,10 +442,12 @@ def run_screening(
         except Exception as e:
             read_errors.append(f"{file.name}: {e}")
 
-        if file_entries:
-            progress_bar.progress(0.4 + (idx + 1) / len(file_entries) * 0.6)
+        report(
+            0.4 + (idx + 1) / len(file_entries) * 0.6,
+            f"Scored {idx + 1} of {len(file_entries)} resume(s)",
+        )
 
-    progress_bar.progress(1.0)
+    report(1.0, "Done")
 
     df = pd.DataFrame(results)
 
@@ -373,8 +456,8 @@ def run_screening(
 
     if save_results and not df.empty:
         try:
-            save_history(df=df, role=role, user_key=user_key, jd_text=jd_text)
+            save_history(df=df, role=role, user_key=user_key, jd_text=jd_text, background=True)
         except Exception as e:
-            st.error(f"Failed to save screening history: {e}")
+            read_errors.append(f"Failed to save screening history: {e}")
 
     return df, read_errors
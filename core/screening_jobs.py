@@ -0,0 +1,357 @@
+import json
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from .bulk_ingest import ResumeSource
+from .constants import DATA_DIR
+from .local_db import connect
+from .screening import run_screening
+
+
+# ---------------------------------------------------------------------------
+# SCREENING JOBS — batches that survive reruns, refreshes and restarts.
+#
+# run_screening() used to run inside the Streamlit script under
+# st.spinner: a widget click, a browser refresh or a dropped websocket
+# during a long batch threw the work away, and the next click started
+# from zero.
+#
+# "Screen resumes" now submits a job and returns:
+#
+#   - the job (params, progress, stage, errors) is a row in a local SQLite
+#     database; the playground polls it and re-attaches to the user's
+#     latest job after a refresh;
+#   - uploads are copied into SCREENING_JOBS_DIR/<job_id>/ by the job
+#     itself, so the files outlive the browser session and the process;
+#   - run_screening() checkpoints every scored row in the result cache
+#     (core/result_cache.py). A job whose process died is re-queued, and
+#     its re-run only reads and scores the files that were missing;
+#   - the finished results are stored with the job, one row per result;
+#   - jobs run one at a time on a worker thread (run_screening already
+#     parallelises inside a batch);
+#   - the AI key, like the SMTP password in the outbox, is only held in
+#     memory: after a restart an AI job waits until the app supplies it
+#     again (resume_screening_jobs).
+#
+# When a job finishes the playground claims its results once
+# (claim_job_results), post-processes and saves them to history, and the
+# staged files are removed.
+# ---------------------------------------------------------------------------
+SCREENING_JOBS_DB_PATH = DATA_DIR / "screening_jobs.sqlite3"
+SCREENING_JOBS_DIR = DATA_DIR / "screening_jobs"
+JOB_STALE_AFTER = 120  # seconds without a heartbeat before a running job is re-queued
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS screening_jobs (
+    job_id      TEXT PRIMARY KEY,
+    user_key    TEXT NOT NULL,
+    status      TEXT NOT NULL DEFAULT 'queued',
+    params      TEXT NOT NULL,
+    uses_ai     INTEGER NOT NULL DEFAULT 0,
+    total       INTEGER NOT NULL DEFAULT 0,
+    staged      INTEGER NOT NULL DEFAULT 0,
+    progress    REAL NOT NULL DEFAULT 0,
+    stage       TEXT NOT NULL DEFAULT '',
+    errors      TEXT NOT NULL DEFAULT '[]',
+    claimed     INTEGER NOT NULL DEFAULT 0,
+    heartbeat   REAL NOT NULL DEFAULT 0,
+    created_at  TEXT NOT NULL,
+    updated_at  TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_screening_jobs_user
+    ON screening_jobs (user_key, created_at);
+CREATE TABLE IF NOT EXISTS screening_job_results (
+    job_id      TEXT NOT NULL,
+    seq         INTEGER NOT NULL,
+    row         TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+CREATE TABLE IF NOT EXISTS screening_job_files (
+    job_id      TEXT NOT NULL,
+    seq         INTEGER NOT NULL,
+    source_name TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+def _migrate(conn) -> None:
+    # Per-file checkpoints keyed by source name, before the result cache
+    # took that over.
+    with conn:
+        conn.execute("DROP TABLE IF EXISTS screening_job_rows")
+
+
+def _db():
+    return connect(SCREENING_JOBS_DB_PATH, _SCHEMA, _migrate)
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _job_dir(job_id: str) -> Path:
+    return SCREENING_JOBS_DIR / job_id
+
+
+def _update(job_id: str, **fields) -> None:
+    fields["updated_at"] = _now()
+    fields["heartbeat"] = time.time()
+    conn = _db()
+    with conn:
+        conn.execute(
+            f"UPDATE screening_jobs SET {', '.join(f'{k} = ?' for k in fields)} WHERE job_id = ?",
+            [*fields.values(), job_id],
+        )
+
+
+# ---------------------------------------------------------------------------
+# In-memory side: uploads not yet staged and AI keys, per job
+# ---------------------------------------------------------------------------
+_LIVE_LOCK = threading.Lock()
+_LIVE: dict[str, dict] = {}
+_RUNNING: set[str] = set()
+
+
+def _live(job_id: str) -> dict:
+    with _LIVE_LOCK:
+        return _LIVE.setdefault(job_id, {})
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
+def submit_screening_job(user_key: str, sources: list, api_key: str = "", **params) -> str:
+    """Queue a screening run; `params` are run_screening's keyword
+    arguments apart from uploads, api_key and user_key. Returns the job id."""
+    job_id = uuid.uuid4().hex
+    now = _now()
+    conn = _db()
+    with conn:
+        conn.execute(
+            "INSERT INTO screening_jobs (job_id, user_key, params, uses_ai, total, stage, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, 'Queued', ?, ?)",
+            (job_id, user_key, json.dumps(params, default=str), int(bool(api_key)), len(sources), now, now),
+        )
+    with _LIVE_LOCK:
+        _LIVE[job_id] = {"sources": list(sources), "api_key": api_key}
+    _start_worker()
+    return job_id
+
+
+def _job_dict(row) -> dict:
+    return {
+        "job_id": row["job_id"],
+        "status": row["status"],
+        "params": json.loads(row["params"]),
+        "total": row["total"],
+        "progress": row["progress"],
+        "stage": row["stage"],
+        "errors": json.loads(row["errors"]),
+        "claimed": bool(row["claimed"]),
+        "created_at": row["created_at"],
+    }
+
+
+def job_status(job_id: str) -> dict | None:
+    row = _db().execute("SELECT * FROM screening_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return _job_dict(row) if row else None
+
+
+def unclaimed_screening_jobs(user_key: str) -> list[dict]:
+    """The user's jobs whose results haven't been claimed yet, oldest first."""
+    return [
+        _job_dict(row)
+        for row in _db().execute(
+            "SELECT * FROM screening_jobs WHERE user_key = ? AND claimed = 0 "
+            "ORDER BY created_at, rowid",
+            (user_key,),
+        )
+    ]
+
+
+def claim_job_results(job_id: str) -> tuple[pd.DataFrame, list[str]] | None:
+    """Results of a finished job, handed out once (None if another session
+    already took them or the job isn't finished)."""
+    conn = _db()
+    with conn:
+        row = conn.execute(
+            "UPDATE screening_jobs SET claimed = 1, updated_at = ? "
+            "WHERE job_id = ? AND claimed = 0 AND status IN ('done', 'failed') RETURNING errors",
+            (_now(), job_id),
+        ).fetchone()
+    if row is None:
+        return None
+    rows = [
+        json.loads(r[0])
+        for r in conn.execute(
+            "SELECT row FROM screening_job_results WHERE job_id = ? ORDER BY seq", (job_id,)
+        )
+    ]
+    df = pd.DataFrame(rows)
+    if not df.empty and "Final Score" in df.columns:
+        df = df.sort_values("Final Score", ascending=False).reset_index(drop=True)
+    return df, json.loads(row[0])
+
+
+def job_sources(job_id: str) -> list[ResumeSource]:
+    """The job's staged files, readable until release_job_files()."""
+    folder = _job_dir(job_id)
+    return [
+        ResumeSource(name, lambda path=folder / str(seq): path.read_bytes())
+        for seq, name in _db().execute(
+            "SELECT seq, source_name FROM screening_job_files WHERE job_id = ? ORDER BY seq", (job_id,)
+        )
+    ]
+
+
+def release_job_files(job_id: str) -> None:
+    shutil.rmtree(_job_dir(job_id), ignore_errors=True)
+    conn = _db()
+    with conn:
+        conn.execute("DELETE FROM screening_job_results WHERE job_id = ?", (job_id,))
+        conn.execute("DELETE FROM screening_job_files WHERE job_id = ?", (job_id,))
+    with _LIVE_LOCK:
+        _LIVE.pop(job_id, None)
+
+
+def resume_screening_jobs(user_key: str, api_key: str = "") -> None:
+    """Re-queue the user's jobs that an earlier process left unfinished,
+    and hand AI jobs the key they need to run."""
+    cutoff = time.time() - JOB_STALE_AFTER
+    conn = _db()
+    stale = [
+        row[0]
+        for row in conn.execute(
+            "SELECT job_id FROM screening_jobs WHERE user_key = ? AND claimed = 0 "
+            "AND (status = 'queued' OR (status = 'running' AND heartbeat < ?))",
+            (user_key, cutoff),
+        )
+        if row[0] not in _RUNNING
+    ]
+    if not stale:
+        return
+    with conn:
+        conn.executemany(
+            "UPDATE screening_jobs SET status = 'queued' WHERE job_id = ? AND status = 'running'",
+            [(job_id,) for job_id in stale],
+        )
+    for job_id in stale:
+        live = _live(job_id)
+        if api_key and not live.get("api_key"):
+            live["api_key"] = api_key
+    _start_worker()
+
+
+# ---------------------------------------------------------------------------
+# Worker
+# ---------------------------------------------------------------------------
+def _stage_files(job_id: str, total: int, staged: int) -> None:
+    """Copy the uploads into the job's folder, resuming at `staged`."""
+    if staged >= total:
+        return
+    sources = _live(job_id).get("sources")
+    if not sources:
+        raise RuntimeError("The app restarted before the uploads were saved; upload the files again.")
+    folder = _job_dir(job_id)
+    folder.mkdir(parents=True, exist_ok=True)
+    conn = _db()
+    for seq in range(staged, total):
+        source = sources[seq]
+        (folder / str(seq)).write_bytes(source.getvalue())
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO screening_job_files (job_id, seq, source_name) VALUES (?, ?, ?)",
+                (job_id, seq, source.name),
+            )
+        _update(job_id, staged=seq + 1, stage=f"Saving uploads ({seq + 1} of {total})")
+    _live(job_id).pop("sources", None)
+
+
+def _run_job(job_id: str) -> None:
+    row = _db().execute("SELECT * FROM screening_jobs WHERE job_id = ?", (job_id,)).fetchone()
+    params = json.loads(row["params"])
+    _stage_files(job_id, row["total"], row["staged"])
+
+    def _progress(fraction: float, stage: str) -> None:
+        _update(job_id, progress=round(fraction, 4), stage=stage)
+
+    results, errors = run_screening(
+        uploads=job_sources(job_id),
+        user_key=row["user_key"],
+        api_key=_live(job_id).get("api_key", ""),
+        progress=_progress,
+        **params,
+    )
+    conn = _db()
+    with conn:
+        conn.execute("DELETE FROM screening_job_results WHERE job_id = ?", (job_id,))
+        conn.executemany(
+            "INSERT INTO screening_job_results (job_id, seq, row) VALUES (?, ?, ?)",
+            [
+                (job_id, seq, json.dumps(scored, default=str))
+                for seq, scored in enumerate(results.to_dict("records"))
+            ],
+        )
+    _update(job_id, status="done", progress=1.0, stage="Done", errors=json.dumps(errors))
+
+
+def _next_job() -> str | None:
+    """Claim the oldest queued job that can run in this process."""
+    conn = _db()
+    for job_id, uses_ai in conn.execute(
+        "SELECT job_id, uses_ai FROM screening_jobs WHERE status = 'queued' ORDER BY created_at, rowid"
+    ).fetchall():
+        if uses_ai and not _live(job_id).get("api_key"):
+            continue
+        with conn:
+            claimed = conn.execute(
+                "UPDATE screening_jobs SET status = 'running', heartbeat = ?, updated_at = ? "
+                "WHERE job_id = ? AND status = 'queued'",
+                (time.time(), _now(), job_id),
+            ).rowcount
+        if claimed:
+            return job_id
+    return None
+
+
+_WAKE = threading.Event()
+_WORKER_LOCK = threading.Lock()
+_WORKER = None
+
+
+def _work_forever() -> None:
+    while True:
+        try:
+            job_id = _next_job()
+        except Exception as e:
+            print(f"❌ [screening_jobs] can't read the job queue: {e}")
+            job_id = None
+        if job_id is None:
+            _WAKE.wait(timeout=30)
+            _WAKE.clear()
+            continue
+        _RUNNING.add(job_id)
+        try:
+            _run_job(job_id)
+        except Exception as e:
+            print(f"❌ [screening_jobs] job {job_id} failed: {e}")
+            _update(job_id, status="failed", stage="Failed", errors=json.dumps([str(e)]))
+        finally:
+            _RUNNING.discard(job_id)
+
+
+def _start_worker() -> None:
+    global _WORKER
+    with _WORKER_LOCK:
+        if _WORKER is not None and _WORKER.is_alive():
+            _WAKE.set()
+            return
+        _WORKER = threading.Thread(target=_work_forever, name="screening-jobs", daemon=True)
+        _WORKER.start()
@@ -0,0 +1,252 @@
+import re
+import time
+
+import pandas as pd
+
+from .constants import DATA_DIR
+from .local_db import connect
+
+
+# ---------------------------------------------------------------------------
+# CANDIDATE SEARCH INDEX (SQLite FTS5, trigram tokenizer)
+#
+# search_candidates() and the History tab's search used to run
+# astype(str).str.lower().str.contains(q) over several columns of the full
+# history for every keystroke — linear in history size, and skills (which
+# the search box promises) weren't even among the searched columns.
+#
+# Every saved screening is now also a document in a persistent FTS5 index:
+# name, email, phone digits, profile key, role, skills, matched keywords,
+# plus industry / source file. The trigram tokenizer gives substring
+# matching ("sharm" finds "Sharma", "43210" finds a phone number) straight
+# from the index, and bm25 with per-column weights ranks name / email /
+# phone hits above a skill that merely mentions the query.
+#
+#   - save_history() indexes the rows it writes (incremental);
+#   - a user's history is back-filled on first search, and re-synced after
+#     SEARCH_INDEX_RESYNC seconds so rows saved by other hosts show up;
+#   - clear_history / clear_role_history drop the matching documents.
+#
+# The index lives in its own file and works the same whether history is
+# in Supabase or the local store; lookups return ranked profile keys.
+# Each document also carries its owner in an UNINDEXED user_key column, so
+# a search drops other users' documents in the FTS scan itself, before
+# anything is ranked or materialised.
+# ---------------------------------------------------------------------------
+SEARCH_INDEX_PATH = DATA_DIR / "search_index.sqlite3"
+SEARCH_INDEX_RESYNC = 24 * 3600  # seconds
+SEARCH_MAX_RESULTS = 100
+
+# FTS column -> history frame columns concatenated into it
+INDEXED_FIELDS = {
+    "name": ("Name",),
+    "email": ("Email",),
+    "phone": ("Phone",),
+    "profile": ("Profile Key",),
+    "role": ("Role",),
+    "skills": ("Skills",),
+    "keywords": ("Matched Keywords",),
+    "other": ("Candidate Industry", "Source File"),
+}
+# bm25 weights, same order as INDEXED_FIELDS, then 0 for user_key
+_WEIGHTS = (10.0, 8.0, 8.0, 5.0, 2.0, 1.0, 1.0, 0.5, 0.0)
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS search_docs (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_key    TEXT NOT NULL,
+    profile_key TEXT NOT NULL,
+    role        TEXT NOT NULL,
+    UNIQUE (user_key, profile_key, role)
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS candidate_search USING fts5(
+    {", ".join(INDEXED_FIELDS)},
+    user_key UNINDEXED,
+    tokenize = 'trigram'
+);
+CREATE TABLE IF NOT EXISTS search_index_state (
+    user_key  TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+def _migrate(conn) -> None:
+    """Indexes built before user_key was stored in candidate_search are
+    dropped; every user is back-filled again on their next search."""
+    if conn.execute("PRAGMA user_version").fetchone()[0] >= 1:
+        return
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(candidate_search)")}
+    with conn:
+        if "user_key" not in columns:
+            conn.execute("DROP TABLE candidate_search")
+            conn.execute("DELETE FROM search_docs")
+            conn.execute("DELETE FROM search_index_state")
+        conn.execute("PRAGMA user_version = 1")
+    if "user_key" not in columns:
+        conn.executescript(_SCHEMA)
+        print("[search_index] rebuilt the index with per-user documents")
+
+
+def _db():
+    return connect(SEARCH_INDEX_PATH, _SCHEMA, _migrate)
+
+
+def _digits(value) -> str:
+    return re.sub(r"\D", "", str(value or ""))
+
+
+def _field_values(df: pd.DataFrame) -> dict[str, list[str]]:
+    n = len(df)
+    values = {}
+    for field, columns in INDEXED_FIELDS.items():
+        parts = [
+            df[col].fillna("").astype(str).str.strip().replace("nan", "")
+            for col in columns
+            if col in df.columns
+        ]
+        if not parts:
+            values[field] = [""] * n
+            continue
+        joined = parts[0]
+        for part in parts[1:]:
+            joined = joined + " " + part
+        values[field] = joined.str.strip().tolist()
+    values["phone"] = [_digits(v) for v in values["phone"]]
+    return values
+
+
+def _write_docs(conn, df: pd.DataFrame, user_key: str) -> int:
+    keys = df["Profile Key"].fillna("").astype(str).str.strip().tolist()
+    roles = df["Role"].fillna("").astype(str).str.strip().tolist()
+    values = _field_values(df)
+    fields = list(INDEXED_FIELDS)
+    written = 0
+    for i, (key, role) in enumerate(zip(keys, roles)):
+        if not key:
+            continue
+        conn.execute(
+            "INSERT OR IGNORE INTO search_docs (user_key, profile_key, role) VALUES (?, ?, ?)",
+            (user_key, key, role),
+        )
+        doc_id = conn.execute(
+            "SELECT id FROM search_docs WHERE user_key = ? AND profile_key = ? AND role = ?",
+            (user_key, key, role),
+        ).fetchone()[0]
+        conn.execute("DELETE FROM candidate_search WHERE rowid = ?", (doc_id,))
+        conn.execute(
+            f"INSERT INTO candidate_search (rowid, {', '.join(fields)}, user_key) "
+            f"VALUES (?, {', '.join('?' for _ in fields)}, ?)",
+            (doc_id, *(values[f][i] for f in fields), user_key),
+        )
+        written += 1
+    return written
+
+
+def _indexable(df) -> bool:
+    return (
+        df is not None
+        and not df.empty
+        and "Profile Key" in df.columns
+        and "Role" in df.columns
+    )
+
+
+def index_history_rows(df: pd.DataFrame, user_key: str) -> int:
+    """Add or replace the documents for these history rows (needs Profile
+    Key and Role columns). Returns how many documents were written."""
+    if not _indexable(df):
+        return 0
+    conn = _db()
+    with conn:
+        return _write_docs(conn, df, user_key)
+
+
+def _drop_docs(conn, user_key: str, role: str | None = None) -> None:
+    where, params = "user_key = ?", [user_key]
+    if role is not None:
+        where += " AND role = ?"
+        params.append(str(role))
+    conn.execute(
+        f"DELETE FROM candidate_search WHERE rowid IN (SELECT id FROM search_docs WHERE {where})",
+        params,
+    )
+    conn.execute(f"DELETE FROM search_docs WHERE {where}", params)
+
+
+def drop_from_index(user_key: str, role: str | None = None) -> None:
+    conn = _db()
+    with conn:
+        _drop_docs(conn, user_key, role)
+
+
+def needs_sync(user_key: str) -> bool:
+    row = _db().execute(
+        "SELECT synced_at FROM search_index_state WHERE user_key = ?", (user_key,)
+    ).fetchone()
+    return row is None or time.time() - row[0] > SEARCH_INDEX_RESYNC
+
+
+def sync_index(df: pd.DataFrame, user_key: str) -> None:
+    """Rebuild a user's documents from their full history frame (dropping
+    rows deleted elsewhere) and mark the index synced."""
+    conn = _db()
+    with conn:
+        _drop_docs(conn, user_key)
+        if _indexable(df):
+            _write_docs(conn, df, user_key)
+        conn.execute(
+            "INSERT OR REPLACE INTO search_index_state (user_key, synced_at) VALUES (?, ?)",
+            (user_key, time.time()),
+        )
+
+
+def _match_expression(query: str) -> str | None:
+    query = (query or "").strip()
+    digits = _digits(query)
+    if len(digits) >= 3 and re.fullmatch(r"[\d\s()+.\-]+", query):
+        terms = [digits]
+    else:
+        terms = [t for t in re.split(r"\s+", query) if t]
+    if not terms or any(len(t) < 3 for t in terms):
+        return None
+    return " AND ".join('"' + t.replace('"', '""') + '"' for t in terms)
+
+
+def search_profile_keys(user_key: str, query: str, limit: int = SEARCH_MAX_RESULTS) -> list[str]:
+    """Profile keys matching `query`, best match first."""
+    conn = _db()
+    expression = _match_expression(query)
+    if expression is not None:
+        # bm25() can't sit inside an aggregate, so rank this user's
+        # matching documents first (MATERIALIZED stops SQLite flattening
+        # the CTE) and then keep each candidate's best-ranked role.
+        sql = (
+            "WITH hits AS MATERIALIZED ("
+            "  SELECT rowid, bm25(candidate_search, "
+            + ", ".join(str(w) for w in _WEIGHTS)
+            + ") AS rank FROM candidate_search "
+            "  WHERE candidate_search MATCH ? AND user_key = ?"
+            ") "
+            "SELECT d.profile_key, MIN(hits.rank) AS best "
+            "FROM hits JOIN search_docs d ON d.id = hits.rowid "
+            "GROUP BY d.profile_key ORDER BY best LIMIT ?"
+        )
+        params = (expression, user_key, limit)
+    else:
+        # Terms under 3 characters can't use trigrams: plain substring scan
+        # of this user's documents.
+        pattern = "%" + (query or "").strip().replace("%", r"\%").replace("_", r"\_") + "%"
+        if pattern == "%%":
+            return []
+        any_field = " OR ".join(
+            f"candidate_search.{field} LIKE ? ESCAPE '\\'" for field in INDEXED_FIELDS
+        )
+        sql = (
+            "SELECT d.profile_key FROM candidate_search "
+            "JOIN search_docs d ON d.id = candidate_search.rowid "
+            f"WHERE candidate_search.user_key = ? AND ({any_field}) "
+            "GROUP BY d.profile_key LIMIT ?"
+        )
+        params = (user_key, *([pattern] * len(INDEXED_FIELDS)), limit)
+    return [row[0] for row in conn.execute(sql, params)]
@@ -0,0 +1,199 @@
+import os
+import queue
+import smtplib
+import socket
+import threading
+import time
+
+
+# ---------------------------------------------------------------------------
+# SMTP DELIVERY — a few pooled sessions behind a per-sender rate limit.
+#
+# send_bulk_emails() used to push every message down one SMTP connection
+# with a random 1-2.4 s sleep before each: 500 emails took ~15 minutes,
+# mostly asleep, and a dropped connection failed every message after it.
+#
+#   - SmtpSessionPool keeps up to SMTP_POOL_SIZE logged-in sessions; a
+#     session the server dropped is reopened on the next send.
+#   - A token bucket per sender (SEND_RATE_PER_MINUTE, bursts of
+#     SEND_BURST) paces the whole process, however many sessions or
+#     campaigns are sending.
+#   - Disconnects, timeouts and 4xx replies are retried with backoff;
+#     5xx replies (bad address, policy rejection) fail that message only.
+#
+# Gmail publishes no per-minute cap for authenticated SMTP, only daily
+# sending limits: 2,000 messages a day for a Google Workspace user, 500
+# for a consumer account. Sending "too fast" is answered with a 421 4.7.x
+# deferral, which is retried below like any other 4xx. The rate is
+# therefore the daily quota spread over a send window:
+#
+#   SEND_RATE_PER_MINUTE = SMTP_DAILY_QUOTA / SMTP_SEND_WINDOW_MINUTES
+#                        = 2,000 / 10 = 200 messages a minute
+#
+# so a 500-email campaign is paced to about 2.5 minutes (the old loop took
+# ~15), provided the SMTP round trips keep up: at ~0.5-1 s a message per
+# session, the three pooled sessions manage 180-360 a minute, so a slow
+# server stretches that towards 3 minutes. Set SMTP_DAILY_QUOTA=500 for a consumer account
+# (50 a minute, 10 minutes for 500 emails), or SMTP_RATE_PER_MINUTE to
+# pin a provider's own per-minute cap (Microsoft 365, for example,
+# documents 30 messages a minute per mailbox).
+#
+# SMTP_HOST / SMTP_PORT / SMTP_STARTTLS / SMTP_LOGIN can be overridden from
+# the environment to point the app at a local stand-in server for testing:
+#
+#   python -m aiosmtpd -n -l localhost:8025
+#   SMTP_HOST=localhost SMTP_PORT=8025 SMTP_STARTTLS=0 SMTP_LOGIN=0 streamlit run playground.py
+# ---------------------------------------------------------------------------
+SMTP_HOST = os.getenv("SMTP_HOST", "smtp.gmail.com")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") != "0"
+SMTP_LOGIN = os.getenv("SMTP_LOGIN", "1") != "0"
+SMTP_TIMEOUT = 20  # seconds
+SMTP_POOL_SIZE = 3
+SMTP_DAILY_QUOTA = int(os.getenv("SMTP_DAILY_QUOTA", "2000"))
+SMTP_SEND_WINDOW_MINUTES = float(os.getenv("SMTP_SEND_WINDOW_MINUTES", "10"))
+SEND_RATE_PER_MINUTE = float(
+    os.getenv("SMTP_RATE_PER_MINUTE", "0") or 0
+) or SMTP_DAILY_QUOTA / SMTP_SEND_WINDOW_MINUTES
+SEND_BURST = int(os.getenv("SMTP_BURST", "10"))
+SEND_RETRIES = 3
+RETRY_BACKOFF = 2.0  # seconds, doubled on each attempt
+
+_TRANSIENT_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    socket.timeout,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `capacity`."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def take(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+_BUCKETS: dict[str, TokenBucket] = {}
+_BUCKETS_LOCK = threading.Lock()
+
+
+def sender_bucket(sender_email: str) -> TokenBucket:
+    key = (sender_email or "").strip().lower()
+    with _BUCKETS_LOCK:
+        bucket = _BUCKETS.get(key)
+        if bucket is None:
+            bucket = _BUCKETS[key] = TokenBucket(SEND_RATE_PER_MINUTE / 60.0, SEND_BURST)
+        return bucket
+
+
+def _is_transient(exc: Exception) -> bool:
+    if isinstance(exc, _TRANSIENT_ERRORS):
+        return True
+    code = getattr(exc, "smtp_code", None)
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        codes = [c for c, _msg in exc.recipients.values()]
+        return bool(codes) and all(400 <= c < 500 for c in codes)
+    return isinstance(code, int) and 400 <= code < 500
+
+
+class SmtpSessionPool:
+    def __init__(
+        self,
+        user: str,
+        password: str,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        size: int = SMTP_POOL_SIZE,
+    ):
+        self.user = user
+        self.password = password
+        self.host = host
+        self.port = port
+        self.size = max(1, size)
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._opened = []
+        self._lock = threading.Lock()
+
+    def _open(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+        server.ehlo()
+        if SMTP_STARTTLS:
+            server.starttls()
+            server.ehlo()
+        if SMTP_LOGIN:
+            server.login(self.user, self.password)
+        with self._lock:
+            self._opened.append(server)
+        return server
+
+    def _discard(self, server) -> None:
+        with self._lock:
+            if server in self._opened:
+                self._opened.remove(server)
+        try:
+            server.close()
+        except Exception:
+            pass
+
+    def open(self) -> None:
+        """Log in one session now, so bad credentials surface up front."""
+        self._idle.put(self._open())
+
+    def send_message(self, msg, retries: int = SEND_RETRIES) -> None:
+        """Send one message on a pooled session, reconnecting and retrying
+        transient failures. Raises the last error otherwise."""
+        with self._slots:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                server = None
+            try:
+                for attempt in range(retries):
+                    try:
+                        if server is None:
+                            server = self._open()
+                        server.send_message(msg)
+                        return
+                    except smtplib.SMTPAuthenticationError:
+                        raise
+                    except Exception as exc:
+                        if isinstance(exc, _TRANSIENT_ERRORS) and server is not None:
+                            self._discard(server)
+                            server = None
+                        if not _is_transient(exc) or attempt == retries - 1:
+                            raise
+                        time.sleep(RETRY_BACKOFF * 2 ** attempt)
+            finally:
+                if server is not None:
+                    self._idle.put(server)
+
+    def close(self) -> None:
+        with self._lock:
+            servers, self._opened = self._opened, []
+        for server in servers:
+            try:
+                server.quit()
+            except Exception:
+                try:
+                    server.close()
+                except Exception:
+                    pass
@@ -4,6 +4,8 @@ from supabase import create_client, Client
 import pandas as pd
 from typing import Optional
 
+from core.history_writer import build_history_records, insert_history_records
+
 @st.cache_resource
 def get_supabase() -> Client:
     url = st.secrets["SUPABASE_URL"]
@@ -13,36 +15,11 @@ def get_supabase() -> Client:
 def save_history_to_supabase(df: pd.DataFrame, role: str, user_key: str, jd_text: str = ""):
     if df is None or df.empty:
         return False
-    
-    supabase = get_supabase()
-    records = []
-    
-    for _, row in df.iterrows():
-        records.append({
-            "user_key": user_key,
-            "role": role,
-            "profile_key": str(row.get("Profile Key", "")),
-            "name": str(row.get("Name", "")),
-            "email": str(row.get("Email", "")),
-            "phone": str(row.get("Phone", "")),
-            "experience": float(row.get("Experience", 0) or 0),
-            "education": str(row.get("Education", "")),
-            "final_score": float(row.get("Final Score", 0) or 0),
-            "verdict": str(row.get("Verdict", "")),
-            "industry_match": str(row.get("Industry Match", "")),
-            "candidate_industry": str(row.get("Candidate Industry", "")),
-            "matched_keywords": str(row.get("Matched Keywords", "")),
-            "missing_keywords": str(row.get("Missing Keywords", "")),
-            "skills": str(row.get("Skills", "")),
-            "reason": str(row.get("Reason", "")),
-            "feedback": str(row.get("Feedback", "Pending")),
-            "client": str(row.get("Client", "")),
-            "source_file": str(row.get("Source File", "")),
-            "jd": jd_text[:5000] if jd_text else "",
-        })
-    
+
+    # Same records, chunking and retries as core.history.save_history.
+    records = build_history_records(df, role, user_key, jd_text)
     try:
-        supabase.table("screening_history").insert(records).execute()
+        insert_history_records(get_supabase(), records)
         return True
     except Exception as e:
         st.error(f"Failed to save history: {e}")
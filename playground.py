@@ -12,8 +12,11 @@ from cryptography.fernet import Fernet
 
 from core.constants import APP_NAME, DEFAULT_COMPANY, DATA_DIR
 from core.client_profile import load_client_profile, save_client_profile, list_client_companies
-from core.emailer import build_email_body, send_bulk_emails
+from core.emailer import build_email_body, normalize_app_password, queue_bulk_emails
+from core.outbox import outbox_counts, outbox_status, register_sender
 from core.history import (
+    get_history_jd,
+    history_summary,
     load_history,
     load_jd_library,
     save_jd,
@@ -21,17 +24,25 @@ from core.history import (
     confirm_delete_role_history,
     confirm_delete_all_history,
     confirm_delete_jd,
-    update_feedback,
-    update_feedback_by_id,
+    update_feedback_bulk,
     search_candidates,
+    pending_history_writes,
 )
-from core.ocr import read_uploaded_file
+from core.bulk_ingest import expand_uploads, iter_directory_sources
+from core.ocr import SUPPORTED_EXTENSIONS, read_uploaded_file
 from core.parser import extract_role_from_jd, detect_role_title, extract_keywords, parse_min_experience
-from core.screening import run_screening
+from core.screening_jobs import (
+    claim_job_results,
+    job_sources,
+    job_status,
+    release_job_files,
+    resume_screening_jobs,
+    submit_screening_job,
+    unclaimed_screening_jobs,
+)
 from core.persona_options import INDUSTRY_OPTIONS, LANGUAGE_OPTIONS, merge_with_custom
 from core.utils import (
     format_experience_years,
-    filter_history_by_search,
     get_secret,
     init_state,
     inject_elite_theme,
@@ -160,6 +171,38 @@ def enrich_linkedin_profile(linkedin_url: str) -> dict:
         return {}
 
 
+# ============================================================
+# Background screening progress
+# ============================================================
+@st.fragment(run_every=2)
+def show_screening_progress(job_id: str) -> None:
+    """Polls the running job; a full rerun picks up its results."""
+    job = job_status(job_id)
+    if job is None or job["status"] not in ("queued", "running"):
+        st.rerun()
+    st.progress(job["progress"], text=f"Screening {job['total']} resume(s): {job['stage']}")
+    st.caption("Screening continues in the background; you can refresh or leave this page.")
+
+
+# ============================================================
+# Outbox status
+# ============================================================
+def render_outbox_status(sender_email: str, role: str, key: str) -> None:
+    """Per-candidate delivery status of queued outreach for one role."""
+    rows = outbox_status(sender_email, role)
+    if not rows:
+        return
+    with st.expander("Email delivery status", expanded=True):
+        counts = outbox_counts(sender_email, role)
+        c1, c2, c3, c4 = st.columns(4)
+        c1.metric("Queued", counts.get("queued", 0) + counts.get("sending", 0))
+        c2.metric("Sent", counts.get("sent", 0))
+        c3.metric("Failed", counts.get("failed", 0))
+        if c4.button("Refresh", key=f"{key}_refresh", use_container_width=True):
+            st.rerun()
+        st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+
+
 st.set_page_config(page_title=f"{APP_NAME} AI Recruiter", page_icon="J", layout="wide")
 
 inject_elite_theme()
@@ -228,6 +271,10 @@ if not st.session_state.sender_password:
     if saved_pw:
         st.session_state.sender_password = saved_pw
 
+# Lets the outbox worker resume this sender's queued emails after a restart.
+if st.session_state.sender_password:
+    register_sender(st.session_state.sender_email, normalize_app_password(st.session_state.sender_password))
+
 st.markdown(
     """
     <section class="hero">
@@ -301,6 +348,7 @@ with st.sidebar:
     st.caption(ai_status)
 
     user_key = st.session_state.sender_email or "local"
+    resume_screening_jobs(user_key, ai_api_key)
     if st.button("Clear current results", use_container_width=True):
         st.session_state.results_df = pd.DataFrame()
         st.session_state.email_results = []
@@ -515,115 +563,179 @@ with screen_tab:
 
     uploads = st.file_uploader(
         "Upload resumes",
-        type=["pdf", "docx", "txt"],
+        type=[ext.lstrip(".") for ext in SUPPORTED_EXTENSIONS] + ["zip"],
         accept_multiple_files=True,
         key=f"resume_uploads_{st.session_state.upload_session}",
+        help="Drop individual resumes or ZIP archives of resumes (campus drives).",
     )
 
+    # Server-side bulk folders, only when the deployment opts in with a root
+    # directory — never an arbitrary path typed by a user.
+    bulk_root = get_secret("BULK_INGEST_DIR", "")
+    bulk_folder = ""
+    if bulk_root and Path(bulk_root).is_dir():
+        folder_options = [""] + sorted(p.name for p in Path(bulk_root).iterdir() if p.is_dir())
+        bulk_folder = st.selectbox(
+            "Or screen a server folder",
+            options=folder_options,
+            format_func=lambda v: v or "—",
+            key=f"bulk_folder_{st.session_state.upload_session}",
+        )
+
+    # One screening job per user at a time, so results are always claimed
+    # in the order the batches were submitted.
+    screening_busy = any(
+        job["status"] in ("queued", "running") for job in unclaimed_screening_jobs(user_key)
+    )
     run_col, _ = st.columns([1, 4])
     with run_col:
-        run_clicked = st.button("Screen resumes", type="primary", use_container_width=True)
+        run_clicked = st.button(
+            "Screen resumes",
+            type="primary",
+            use_container_width=True,
+            disabled=screening_busy,
+            help="Wait for the current screening job to finish." if screening_busy else None,
+        )
 
     if run_clicked:
-        if not uploads:
+        resume_sources, ingest_errors = expand_uploads(uploads)
+        if bulk_folder:
+            resume_sources.extend(
+                iter_directory_sources(Path(bulk_root) / bulk_folder, {f.name for f in resume_sources})
+            )
+        for error in ingest_errors:
+            st.warning(error)
+
+        if not resume_sources:
             st.error("Upload at least one resume.")
         elif not role_input.strip() and not jd_text.strip():
             st.error("Upload or paste a JD, or add a role override in Optional screening controls.")
         else:
-            with st.spinner("Screening resumes..."):
-                results, read_errors = run_screening(
-                    uploads=uploads,
-                    jd_text=jd_text,
-                    role_input=role_input,
-                    extra_keywords=extra_keywords,
-                    api_key=ai_api_key,
-                    model=ai_model,
-                    user_key=user_key,
-                    client_company=client_company_input,
-                    min_exp=persona_min_exp,
-                    max_exp=persona_max_exp,
-                    preferred_industries=persona_industries,
-                )
+            st.session_state.results_df = pd.DataFrame()
+            submit_screening_job(
+                user_key,
+                resume_sources,
+                api_key=ai_api_key,
+                jd_text=jd_text,
+                role_input=role_input,
+                extra_keywords=extra_keywords,
+                model=ai_model,
+                client_company=client_company_input,
+                min_exp=persona_min_exp,
+                max_exp=persona_max_exp,
+                preferred_industries=persona_industries,
+            )
 
-            if results is not None and not results.empty:
-                results = results.reset_index(drop=True)
-
-                # ---------- Save resume files for permanent download ----------
-                file_map = {f.name: f.getvalue() for f in uploads}
-                resume_paths = []
-                for _, row in results.iterrows():
-                    src = str(row.get("Source File", ""))
-                    if src in file_map:
-                        rel = save_resume_file(user_key, src, file_map[src])
-                        resume_paths.append(rel)
-                    else:
-                        resume_paths.append("")
-                results["Resume Path"] = resume_paths
-
-                if "Candidate Industry" in results.columns:
-                    results["Candidate Industry"] = (
-                        results["Candidate Industry"]
-                        .fillna("")
-                        .astype(str)
-                        .replace({"": "Others / Not Detected", "nan": "Others / Not Detected"})
-                    )
-                if "Industry Match" in results.columns:
-                    results["Industry Match"] = (
-                        results["Industry Match"]
-                        .fillna("NA")
-                        .astype(str)
-                        .replace({"": "NA", "nan": "NA"})
-                    )
-                if "Reason" in results.columns:
-                    results["Reason"] = (
-                        results["Reason"]
-                        .fillna("")
-                        .astype(str)
-                        .replace({"nan": ""})
-                    )
-                if "Rank" not in results.columns:
-                    results.insert(0, "Rank", range(1, len(results) + 1))
-                if "Send" not in results.columns:
-                    results.insert(1, "Send", False)
-                if "LinkedIn URL" not in results.columns:
-                    results["LinkedIn URL"] = ""
-
-                detected_role = (
-                    results["Role"].iloc[0]
-                    if "Role" in results.columns and results["Role"].notna().any()
-                    else (role_input.strip() or detect_role_title(jd_text) or "Open Role")
+    # Screening runs as a background job (core/screening_jobs.py). Finished
+    # jobs are claimed once each, oldest first, so every batch's history is
+    # saved and the newest batch is the one left on screen; a job still
+    # running shows its progress.
+    screening_jobs = unclaimed_screening_jobs(user_key)
+    for screening_job in screening_jobs:
+        if screening_job["status"] in ("queued", "running"):
+            continue
+        claimed = claim_job_results(screening_job["job_id"])
+        if claimed is None:
+            continue
+        if screening_job["status"] == "failed":
+            release_job_files(screening_job["job_id"])
+            st.error("Screening failed: " + "; ".join(screening_job["errors"]))
+            continue
+
+        job_id = screening_job["job_id"]
+        results, read_errors = claimed
+        job_jd_text = screening_job["params"].get("jd_text", "")
+        job_role_input = screening_job["params"].get("role_input", "")
+
+        if results is not None and not results.empty:
+            results = results.reset_index(drop=True)
+
+            # ---------- Save resume files for permanent download ----------
+            # Map names to sources, not bytes: each file is read only
+            # when its row is saved, so big ZIP batches never sit in
+            # memory twice.
+            source_map = {f.name: f for f in job_sources(job_id)}
+            resume_paths = []
+            for _, row in results.iterrows():
+                src = str(row.get("Source File", ""))
+                if src in source_map:
+                    rel = save_resume_file(user_key, src, source_map[src].getvalue())
+                    resume_paths.append(rel)
+                else:
+                    resume_paths.append("")
+            results["Resume Path"] = resume_paths
+
+            if "Candidate Industry" in results.columns:
+                results["Candidate Industry"] = (
+                    results["Candidate Industry"]
+                    .fillna("")
+                    .astype(str)
+                    .replace({"": "Others / Not Detected", "nan": "Others / Not Detected"})
                 )
+            if "Industry Match" in results.columns:
+                results["Industry Match"] = (
+                    results["Industry Match"]
+                    .fillna("NA")
+                    .astype(str)
+                    .replace({"": "NA", "nan": "NA"})
+                )
+            if "Reason" in results.columns:
+                results["Reason"] = (
+                    results["Reason"]
+                    .fillna("")
+                    .astype(str)
+                    .replace({"nan": ""})
+                )
+            if "Rank" not in results.columns:
+                results.insert(0, "Rank", range(1, len(results) + 1))
+            if "Send" not in results.columns:
+                results.insert(1, "Send", False)
+            if "LinkedIn URL" not in results.columns:
+                results["LinkedIn URL"] = ""
+
+            detected_role = (
+                results["Role"].iloc[0]
+                if "Role" in results.columns and results["Role"].notna().any()
+                else (job_role_input.strip() or detect_role_title(job_jd_text) or "Open Role")
+            )
 
-                st.session_state.results_df = results
-                st.session_state.last_role = detected_role
-                st.session_state.last_jd = jd_text
+            st.session_state.results_df = results
+            st.session_state.last_role = detected_role
+            st.session_state.last_jd = job_jd_text
 
-                try:
-                    ok = save_history(results, detected_role, user_key, jd_text)
-                    if not ok:
-                        st.warning(
-                            "Screening finished, but history was **not** saved. "
-                            "Check logs / Supabase."
-                        )
-                except Exception as _hist_err:
-                    st.warning(f"History save failed: {_hist_err}")
-            else:
-                st.session_state.results_df = pd.DataFrame()
-                st.session_state.last_role = role_input.strip() or detect_role_title(jd_text) or "Open Role"
-                st.session_state.last_jd = jd_text
-
-            st.success(f"Screened {len(results) if results is not None else 0} resume(s) for {st.session_state.last_role}.")
-            for error in read_errors:
-                st.warning(error)
-
-            if (
-                ai_api_key and results is not None and not results.empty
-                and "AI Used" in results.columns and not results["AI Used"].any()
-            ):
-                st.warning(
-                    f"A {provider_label} key is set, but AI scoring failed for every resume in this batch "
-                    "(Industry Match will show N/A). Check the key and model in your secrets."
-                )
+            try:
+                ok = save_history(results, detected_role, user_key, job_jd_text, background=True)
+                if not ok:
+                    st.warning(
+                        "Screening finished, but history was **not** saved. "
+                        "Check logs / Supabase."
+                    )
+            except Exception as _hist_err:
+                st.warning(f"History save failed: {_hist_err}")
+        else:
+            st.session_state.results_df = pd.DataFrame()
+            st.session_state.last_role = job_role_input.strip() or detect_role_title(job_jd_text) or "Open Role"
+            st.session_state.last_jd = job_jd_text
+        release_job_files(job_id)
+
+        st.success(f"Screened {len(results) if results is not None else 0} resume(s) for {st.session_state.last_role}.")
+        for error in read_errors:
+            st.warning(error)
+
+        if (
+            ai_api_key and results is not None and not results.empty
+            and "AI Used" in results.columns and not results["AI Used"].any()
+        ):
+            st.warning(
+                f"A {provider_label} key is set, but AI scoring failed for every resume in this batch "
+                "(Industry Match will show N/A). Check the key and model in your secrets."
+            )
+
+    running_job = next(
+        (job for job in screening_jobs if job["status"] in ("queued", "running")), None
+    )
+    if running_job:
+        show_screening_progress(running_job["job_id"])
 
     if not st.session_state.results_df.empty:
         st.divider()
@@ -632,7 +744,7 @@ with screen_tab:
 
         display_cols = [
             c for c in [
-                "Rank", "Name", "Email", "Phone", "Experience",
+                "Rank", "Name", "Email", "Phone", "Experience", "Career Gaps",
                 "Final Score", "Verdict", "Industry Match", "Matched Keywords", "LinkedIn URL"
             ] if c in st.session_state.results_df.columns
         ]
@@ -717,7 +829,7 @@ with email_tab:
             disabled=[
                 "Rank", "Phone", "Experience", "Keyword Score", "Final Score",
                 "Verdict", "Industry Match", "Candidate Industry", "Matched Keywords",
-                "Missing Keywords", "Skills", "Source File", "AI Used", "LinkedIn URL",
+                "Missing Keywords", "Skills", "Source File", "AI Used", "OCR Pages", "LinkedIn URL",
             ],
             column_config={
                 "Send": st.column_config.CheckboxColumn("Send"),
@@ -798,10 +910,8 @@ with email_tab:
                 st.error("Fix missing candidate email addresses first.")
             else:
                 custom_email_body = st.session_state.get("edited_email_preview", "").strip()
-                with st.spinner("Sending emails..."):
-                    progress = st.progress(0)
-                    status = st.empty()
-                    email_results = send_bulk_emails(
+                with st.spinner("Queueing emails..."):
+                    email_results = queue_bulk_emails(
                         selected_df=st.session_state.selected_candidates,
                         role=st.session_state.last_role,
                         sender_email=st.session_state.sender_email,
@@ -813,24 +923,32 @@ with email_tab:
                         extra_note=extra_note,
                         custom_body=custom_email_body,
                     )
-                    progress.progress(1.0)
-                    status.write(f"Processed {len(st.session_state.selected_candidates)} email(s)")
-                    st.session_state.email_results = email_results
-                    sent_count = sum(1 for item in email_results if item["Success"])
-                    st.success(f"Sent {sent_count} of {len(email_results)} email(s).")
-                    st.dataframe(pd.DataFrame(email_results), use_container_width=True, hide_index=True)
+                st.session_state.email_results = email_results
+                queued_count = sum(1 for item in email_results if item["Success"])
+                st.success(
+                    f"Queued {queued_count} of {len(email_results)} email(s). "
+                    "They keep sending in the background; check progress below."
+                )
+                st.dataframe(pd.DataFrame(email_results), use_container_width=True, hide_index=True)
+
+        if st.session_state.sender_email and st.session_state.last_role:
+            render_outbox_status(st.session_state.sender_email, st.session_state.last_role, "results_outbox")
 
 with history_tab:
     st.subheader("History")
-    hist = load_history(user_key)
+    summary = history_summary(user_key)
 
-    if hist.empty:
+    if not summary["total"]:
         st.info("No saved screenings yet.")
     else:
         c1, c2, c3 = st.columns(3)
-        c1.metric("Candidates", len(hist))
-        c2.metric("Strong Fit", int((hist["Verdict"] == "Strong Fit").sum()) if "Verdict" in hist.columns else 0)
-        c3.metric("Roles", hist["Role"].nunique() if "Role" in hist.columns else 0)
+        c1.metric("Candidates", summary["total"])
+        c2.metric("Strong Fit", summary["strong_fit"])
+        c3.metric("Roles", len(summary["roles"]))
+
+        syncing = pending_history_writes(user_key)
+        if syncing:
+            st.caption(f"{syncing} row(s) still being saved to cloud history in the background.")
 
         search_query = st.text_input(
             "Search all candidates",
@@ -840,22 +958,23 @@ with history_tab:
 
         selected_role = "all"
         if search_query.strip():
-            shown = filter_history_by_search(hist, search_query)
+            shown = search_candidates(user_key, search_query)
             st.caption(f"{len(shown)} match(es) across all roles for \"{search_query.strip()}\"")
-        elif "Role" in hist.columns:
-            roles = ["all"] + sorted(hist["Role"].dropna().unique().tolist())
+        elif summary["roles"]:
+            roles = ["all"] + summary["roles"]
             selected_role = st.selectbox("Role filter", roles)
 
             show_limit = st.slider("Show last records", min_value=50, max_value=500, value=150, step=50)
 
-            shown = hist if selected_role == "all" else hist[hist["Role"] == selected_role]
-            shown = shown.tail(show_limit) if len(shown) > show_limit else shown
+            shown = load_history(
+                user_key,
+                role=None if selected_role == "all" else selected_role,
+                limit=show_limit,
+            )
 
-            if selected_role != "all" and "JD" in shown.columns:
-                saved_jds = shown["JD"].dropna().astype(str)
-                saved_jds = saved_jds[saved_jds.str.strip() != ""]
-                if not saved_jds.empty:
-                    latest_jd = saved_jds.iloc[-1]
+            if selected_role != "all":
+                latest_jd = get_history_jd(user_key, selected_role)
+                if latest_jd.strip():
                     already_loaded = (
                         st.session_state.get("_history_loaded_role") == selected_role
                         and st.session_state.get("_history_loaded_jd") == latest_jd
@@ -898,7 +1017,7 @@ with history_tab:
                                 confirm_delete_all_history(user_key)
                     delete_all_dialog()
         else:
-            shown = hist
+            shown = load_history(user_key)
 
         history_editable = shown.copy()
         if "Candidate Industry" in history_editable.columns:
@@ -986,8 +1105,7 @@ with history_tab:
                 st.error(f"Could not compare feedback changes: {diff_err}")
                 changed = pd.DataFrame()
         
-            saved_count = 0
-            failed = []
+            feedback_changes = []
             for idx in changed.index:
                 row = he_new.loc[idx]
                 # Always pull Row ID from the untouched `shown` frame by position —
@@ -995,19 +1113,22 @@ with history_tab:
                 row_id = None
                 if idx < len(shown_reset) and "Row ID" in shown_reset.columns:
                     row_id = shown_reset.loc[idx, "Row ID"]
+                # Profile key/role are only used when Row ID is unavailable
+                row_role = row.get("Role", selected_role if selected_role != "all" else "")
+                pkey = row.get("Profile Key", "")
+                if not pkey and idx < len(shown_reset):
+                    pkey = shown_reset.loc[idx].get("Profile Key", "")
+                feedback_changes.append({
+                    "row_id": row_id,
+                    "profile_key": pkey,
+                    "role": row_role,
+                    "feedback": row["Feedback"],
+                    "name": row.get("Name", f"row {idx}"),
+                })
         
-                if row_id is not None and update_feedback_by_id(row_id, row["Feedback"]):
-                    saved_count += 1
-                else:
-                    # Fallback to the old profile_key/role method only if Row ID is unavailable
-                    row_role = row.get("Role", selected_role if selected_role != "all" else "")
-                    pkey = row.get("Profile Key", "")
-                    if not pkey and idx < len(shown_reset):
-                        pkey = shown_reset.loc[idx].get("Profile Key", "")
-                    if update_feedback(user_key, pkey, row_role, row["Feedback"]):
-                        saved_count += 1
-                    else:
-                        failed.append(row.get("Name", f"row {idx}"))
+            feedback_results = update_feedback_bulk(user_key, feedback_changes)
+            saved_count = sum(1 for r in feedback_results if r["ok"])
+            failed = [r["name"] for r in feedback_results if not r["ok"]]
         
             if saved_count:
                 st.success(f"Saved feedback for {saved_count} candidate(s).")
@@ -1092,8 +1213,8 @@ with history_tab:
 
             if send_history:
                 custom_body = st.session_state.get("history_email_preview", "").strip()
-                with st.spinner("Sending emails from history..."):
-                    history_results = send_bulk_emails(
+                with st.spinner("Queueing emails from history..."):
+                    history_results = queue_bulk_emails(
                         selected_df=st.session_state.selected_history,
                         role=history_role,
                         sender_email=st.session_state.sender_email,
@@ -1105,10 +1226,16 @@ with history_tab:
                         extra_note=history_note,
                         custom_body=custom_body,
                     )
-                sent_count = sum(1 for item in history_results if item["Success"])
-                st.success(f"Sent {sent_count} of {len(history_results)} email(s).")
+                queued_count = sum(1 for item in history_results if item["Success"])
+                st.success(
+                    f"Queued {queued_count} of {len(history_results)} email(s). "
+                    "They keep sending in the background; check progress below."
+                )
                 st.dataframe(pd.DataFrame(history_results), use_container_width=True, hide_index=True)
 
+            if st.session_state.sender_email:
+                render_outbox_status(st.session_state.sender_email, history_role, "history_outbox")
+
 with jd_tab:
     col1, col2 = st.columns([8.5, 1.5], vertical_alignment="center")
     with col1: